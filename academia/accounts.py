@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from .models import User
+from .notifications import LOCAL_CACHE_TIMEOUT, is_local_cache
+
+# Snapshot da conta principal e dos seus dependentes, usado pelo menu de troca de
+# conta em todas as páginas. Invalidado pelos sinais de User (ver signals.py).
+# Altere SNAPSHOT_VERSION ao mudar o formato do snapshot.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+def snapshot_key(main_user_id):
+    return f'accounts:snapshot:v{SNAPSHOT_VERSION}:{main_user_id}'
+
+def build_account_snapshot(main_user_id):
+    main_user = User.objects.filter(id=main_user_id).values('id', 'first_name', 'last_name').first()
+    if not main_user:
+        return None
+
+    dependents = []
+    for dependent in User.objects.filter(responsible_id=main_user_id).only('id', 'first_name', 'last_name', 'status', 'photo'):
+        dependents.append({
+            'id': dependent.id,
+            'name': dependent.get_full_name(),
+            'status': dependent.status,
+            'photo_url': dependent.photo.url if dependent.photo else '',
+        })
+
+    return {
+        'responsible': {
+            'id': main_user['id'],
+            'name': f"{main_user['first_name']} {main_user['last_name']}".strip(),
+        },
+        'dependents': dependents,
+    }
+
+def get_account_snapshot(main_user_id):
+    """
+    Retorna {'responsible': {...}, 'dependents': [...]} da conta principal,
+    ou None se ela não existir. Só consulta o banco quando o cache está vazio.
+    """
+    key = snapshot_key(main_user_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_account_snapshot(main_user_id)
+        if snapshot is None:
+            return None
+        # Com cache local, os outros workers não recebem a invalidação
+        cache.set(key, snapshot, LOCAL_CACHE_TIMEOUT if is_local_cache() else SNAPSHOT_TIMEOUT)
+    return snapshot
+
+def invalidate_account_snapshot(*main_user_ids):
+    cache.delete_many([snapshot_key(user_id) for user_id in main_user_ids if user_id])
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     User, Turma, TurmaAluno,
-    PlanoAula, ItemPlanoAula, Ranking, PosicaoRanking, Pedido, Item, Log
+    PlanoAula, ItemPlanoAula, Ranking, PosicaoRanking, Pedido, Item, Log, LogArchive, StockMovement
 )
 
 
@@ -80,10 +80,40 @@ class PedidoAdmin(admin.ModelAdmin):
 
 @admin.register(Log)
 class LogAdmin(admin.ModelAdmin):
-    list_display = ('user', 'action', 'timestamp')
-    list_filter = ('timestamp', 'user')
-    search_fields = ('user__username', 'action')
-    readonly_fields = ('user', 'action', 'timestamp')
+    list_display = ('user', 'action', 'status_code', 'duration_ms', 'timestamp')
+    list_filter = ('timestamp', 'status', 'method')
+    list_select_related = ('user',)
+    search_fields = ('user__username', 'url_name', 'action')
+    readonly_fields = ('user', 'acting_user', 'action', 'method', 'path', 'url_name', 'status_code', 'duration_ms', 'status', 'timestamp')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LogArchive)
+class LogArchiveAdmin(admin.ModelAdmin):
+    list_display = ('month', 'row_count', 'size_bytes', 'file_path', 'created_at')
+    readonly_fields = ('month', 'file_path', 'row_count', 'first_timestamp', 'last_timestamp', 'size_bytes', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('timestamp', 'item', 'kind', 'quantity', 'balance', 'pedido')
+    list_filter = ('kind', 'item', 'timestamp')
+    list_select_related = ('item', 'pedido')
+    readonly_fields = ('item', 'pedido', 'kind', 'quantity', 'balance', 'timestamp')
 
     def has_add_permission(self, request):
         return False
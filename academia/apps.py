@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class AcademiaConfig(AppConfig):
+    name = 'academia'
+
+    def ready(self):
+        # Registra os receivers de sinais (invalidação de cache, etc.)
+        from . import signals  # noqa: F401
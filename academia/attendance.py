@@ -0,0 +1,262 @@
+from django.db.models import Case, Count, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, ExtractWeekDay
+from .models import AttendanceDailySummary, AttendanceRequest, Meta as MetaModel, TurmaAluno, User
+from .rankings import update_rankings_for_attendance
+
+# ExtractWeekDay segue o padrão do Django: 1 = domingo ... 3 = terça-feira
+TUESDAY = 3
+
+CLASS_DESCRIPTIONS = {'BOTH': 'Integral', 'GI': 'Gi', 'NOGI': 'NoGi'}
+STATUS_NAMES = dict(AttendanceRequest.STATUS_CHOICES)
+
+# Limite superior (exclusivo) do percentual, classificação e cor do Bootstrap
+FREQUENCY_LEVELS = [
+    (20, 'Insatisfatório', 'danger'),
+    (40, 'Regular', 'warning'),
+    (60, 'Bom', 'info'),
+    (80, 'Satisfatório', 'primary'),
+]
+
+ROSTER_ORDERING = {
+    'nome': ('first_name', 'last_name', 'id'),
+    '-nome': ('-first_name', '-last_name', '-id'),
+    'presencas': ('total_presencas', 'first_name', 'last_name', 'id'),
+    '-presencas': ('-total_presencas', 'first_name', 'last_name', 'id'),
+}
+
+def consolidate_attendance(queryset, by_turma=False):
+    """
+    Consolida as solicitações de presença por (aluno, data) no banco.
+
+    Cada linha traz student_id, attendance_date, nome do aluno, contagens por
+    status/tipo de aula, a quantidade de aulas creditadas (qty: terça com as
+    duas aulas vale 2) e o status final. O queryset recebido já deve estar
+    filtrado (período, turma, aluno) e sem as canceladas. Com by_turma a
+    consolidação é por (aluno, turma, data).
+    """
+    approved = Q(status='APR')
+    is_tuesday = Q(week_day=TUESDAY)
+    group_by = ['student_id', 'attendance_date', 'week_day', 'student__first_name', 'student__last_name']
+    if by_turma:
+        group_by.append('turma_id')
+
+    return (
+        queryset
+        .annotate(week_day=ExtractWeekDay('attendance_date'))
+        .values(*group_by)
+        .annotate(
+            apr_count=Count('id', filter=approved),
+            rej_count=Count('id', filter=Q(status='REJ')),
+            apr_both=Count('id', filter=approved & Q(class_type='BOTH')),
+            apr_gi=Count('id', filter=approved & Q(class_type='GI')),
+            apr_nogi=Count('id', filter=approved & Q(class_type='NOGI')),
+            first_class_type=Min('class_type'),
+            apr_class_type=Min('class_type', filter=approved),
+            rejection_reason=Max('rejection_reason', filter=Q(status='REJ')),
+        )
+        .annotate(
+            qty=Case(
+                When(apr_count=0, then=Value(0)),
+                When(is_tuesday & (Q(apr_both__gt=0) | (Q(apr_gi__gt=0) & Q(apr_nogi__gt=0))), then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            final_status=Case(
+                When(apr_count__gt=0, then=Value('APR')),
+                When(rej_count__gt=0, then=Value('REJ')),
+                default=Value('PEN'),
+            ),
+        )
+    )
+
+def order_consolidated(consolidated, order='desc', by_student=True):
+    fields = ['attendance_date']
+    if by_student:
+        fields += ['student__first_name', 'student__last_name']
+    if order == 'desc':
+        fields = [f'-{field}' for field in fields]
+    return consolidated.order_by(*fields, 'student_id')
+
+def total_credited_classes(queryset):
+    """Soma das aulas creditadas (qty) das solicitações aprovadas do queryset."""
+    return consolidate_attendance(queryset.filter(status='APR')).aggregate(total=Sum('qty'))['total'] or 0
+
+# --- RESUMO DIÁRIO ---
+
+def refresh_daily_summary(student_id, turma_id, date):
+    """
+    Recalcula o AttendanceDailySummary de (aluno, turma, data) a partir das
+    solicitações existentes e, se as aulas creditadas mudaram, atualiza os
+    rankings afetados. Roda na transação de quem alterou a presença.
+    """
+    # Sem .first(): a ordenação por pk desfaria o agrupamento
+    rows = list(consolidate_attendance(
+        AttendanceRequest.objects.filter(student_id=student_id, turma_id=turma_id, attendance_date=date).exclude(status='CAN')
+    ).order_by()[:1])
+
+    previous_qty = AttendanceDailySummary.objects.filter(
+        student_id=student_id, turma_id=turma_id, date=date
+    ).values_list('qty', flat=True).first() or 0
+
+    if not rows:
+        AttendanceDailySummary.objects.filter(student_id=student_id, turma_id=turma_id, date=date).delete()
+        summary = None
+    else:
+        summary, _ = AttendanceDailySummary.objects.update_or_create(
+            student_id=student_id, turma_id=turma_id, date=date,
+            defaults={'qty': rows[0]['qty'], 'status': rows[0]['final_status']},
+        )
+
+    if (summary.qty if summary else 0) != previous_qty:
+        update_rankings_for_attendance({(student_id, turma_id, date)})
+    return summary
+
+def refresh_daily_summaries(requests):
+    """
+    Recalcula o resumo das chaves afetadas por update()/bulk_update()/bulk_create()
+    de solicitações, com poucas consultas independentemente da quantidade.
+    """
+    keys = {(r.student_id, r.turma_id, r.attendance_date) for r in requests}
+    if not keys:
+        return
+    student_ids = {key[0] for key in keys}
+    turma_ids = {key[1] for key in keys}
+    dates = {key[2] for key in keys}
+
+    rows = consolidate_attendance(
+        AttendanceRequest.objects.filter(student_id__in=student_ids, turma_id__in=turma_ids, attendance_date__in=dates).exclude(status='CAN'),
+        by_turma=True,
+    ).order_by()
+    computed = {
+        (row['student_id'], row['turma_id'], row['attendance_date']): row
+        for row in rows
+        if (row['student_id'], row['turma_id'], row['attendance_date']) in keys
+    }
+    existing = {
+        (summary.student_id, summary.turma_id, summary.date): summary
+        for summary in AttendanceDailySummary.objects.filter(student_id__in=student_ids, turma_id__in=turma_ids, date__in=dates)
+        if (summary.student_id, summary.turma_id, summary.date) in keys
+    }
+
+    to_create, to_update, to_delete = [], [], []
+    qty_changed = set()
+    for key in keys:
+        row, summary = computed.get(key), existing.get(key)
+        if (row['qty'] if row else 0) != (summary.qty if summary else 0):
+            qty_changed.add(key)
+        if row is None:
+            if summary is not None:
+                to_delete.append(summary.pk)
+        elif summary is None:
+            to_create.append(AttendanceDailySummary(student_id=key[0], turma_id=key[1], date=key[2], qty=row['qty'], status=row['final_status']))
+        elif (summary.qty, summary.status) != (row['qty'], row['final_status']):
+            summary.qty, summary.status = row['qty'], row['final_status']
+            to_update.append(summary)
+
+    if to_delete:
+        AttendanceDailySummary.objects.filter(pk__in=to_delete).delete()
+    if to_create:
+        AttendanceDailySummary.objects.bulk_create(to_create)
+    if to_update:
+        AttendanceDailySummary.objects.bulk_update(to_update, ['qty', 'status'])
+
+    update_rankings_for_attendance(qty_changed)
+
+def credited_classes(student, start_date, end_date):
+    """Total de aulas creditadas do aluno no período, lido do resumo diário."""
+    return AttendanceDailySummary.objects.filter(
+        student=student, date__range=[start_date, end_date]
+    ).aggregate(total=Sum('qty'))['total'] or 0
+
+def describe_consolidated(row):
+    """
+    Converte uma linha consolidada no formato usado pelos relatórios
+    (data, aluno, status, motivo, qty), aplicando as regras de texto da terça.
+    """
+    is_tuesday = row['week_day'] == TUESDAY
+    status = row['final_status']
+    reason = row['rejection_reason']
+
+    if is_tuesday:
+        if status == 'APR':
+            if row['qty'] == 2:
+                motivo = "Integral"
+            elif row['apr_gi']:
+                motivo = "Presente apenas na aula com Kimono"
+            elif row['apr_nogi']:
+                motivo = "Presente apenas na aula sem Kimono"
+            else:
+                motivo = CLASS_DESCRIPTIONS.get(row['apr_class_type'], '-')
+        else:
+            motivo = "Aluno ausente neste dia"
+            if status == 'REJ' and reason:
+                motivo += f" ({reason})"
+    else:
+        descricao_aula = CLASS_DESCRIPTIONS.get(row['first_class_type'], '-')
+        if status == 'REJ':
+            motivo = f"{descricao_aula} - Ausente ({reason})" if reason else f"{descricao_aula} - Ausente"
+        else:
+            motivo = descricao_aula
+
+    return {
+        'data': row['attendance_date'],
+        'aluno': f"{row['student__first_name']} {row['student__last_name']}".strip(),
+        'student_id': row['student_id'],
+        'status': STATUS_NAMES.get(status, status),
+        'motivo': motivo,
+        'qty': row['qty'],
+    }
+
+# --- FREQUÊNCIA ---
+
+def classify_frequency(porcentagem):
+    """Classificação e cor de um percentual de frequência."""
+    for limit, situacao, cor in FREQUENCY_LEVELS:
+        if porcentagem < limit:
+            return situacao, cor
+    return 'Excelente', 'success'
+
+def frequency_stats(total_presencas, meta):
+    """Total de aulas, presenças, ausências, percentual e situação frente à meta."""
+    if meta is None:
+        return {'total_aulas': 0, 'total_presencas': total_presencas, 'total_ausencias': 0, 'porcentagem': 0, 'situacao': 'N/A', 'cor': 'secondary'}
+
+    total_aulas = meta.meta_aulas
+    porcentagem = (total_presencas / total_aulas) * 100 if total_aulas > 0 else 0
+    situacao, cor = classify_frequency(porcentagem)
+    return {
+        'total_aulas': total_aulas,
+        'total_presencas': total_presencas,
+        'total_ausencias': max(total_aulas - total_presencas, 0),
+        'porcentagem': round(porcentagem, 1),
+        'situacao': situacao,
+        'cor': cor,
+    }
+
+def roster_frequency(meta, turma=None, order='nome'):
+    """
+    Frequência de todos os alunos ativos (ou dos aprovados em uma turma) no
+    período da meta, somando o resumo diário em uma única consulta agregada.
+    """
+    students = User.objects.filter(group_role='STD', status='ATIVO')
+    summary_filter = Q(attendance_summaries__date__range=[meta.data_inicio, meta.data_fim])
+    if turma is not None:
+        students = students.filter(id__in=TurmaAluno.objects.filter(turma=turma, status='APRO').values('aluno_id'))
+        summary_filter &= Q(attendance_summaries__turma=turma)
+
+    students = students.annotate(
+        total_presencas=Coalesce(Sum('attendance_summaries__qty', filter=summary_filter), 0)
+    ).order_by(*ROSTER_ORDERING.get(order, ROSTER_ORDERING['nome']))
+
+    return [{'student': student, **frequency_stats(student.total_presencas, meta)} for student in students]
+
+def get_student_stats(student, start_date, end_date):
+    """Estatísticas de frequência do aluno no período, frente à meta que o cobre."""
+    total_presencas = credited_classes(student, start_date, end_date)
+
+    meta = MetaModel.objects.filter(
+        data_inicio__lte=end_date,
+        data_fim__gte=start_date
+    ).first()
+
+    return frequency_stats(total_presencas, meta)
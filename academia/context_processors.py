@@ -1,9 +1,11 @@
 from django.core.exceptions import ObjectDoesNotExist
-from .models import AttendanceRequest, User
+from .accounts import get_account_snapshot
+from .notifications import approved_attendance_count, pending_attendance_count, pending_users_count
 
 def notifications_context(request):
     """
     Fornece notificações granulares para o sistema de toasts múltiplos.
+    Os contadores vêm do cache (academia.notifications), sem consultas no caso comum.
     """
     if not request.user.is_active:
         return {}
@@ -16,9 +18,8 @@ def notifications_context(request):
 
     # Para Alunos
     if user.is_student():
-        approved_attendances = AttendanceRequest.objects.filter(student=user, status='APR', notified=False)
-        if approved_attendances.exists():
-            count = approved_attendances.count()
+        count = approved_attendance_count(user.pk)
+        if count:
             total_count += count
             notifications.append({
                 'title': 'Presença Aprovada',
@@ -29,9 +30,8 @@ def notifications_context(request):
 
     # Para Professores e Admins
     if user.is_professor_or_admin():
-        pending_attendances = AttendanceRequest.objects.filter(status='PEN')
-        if pending_attendances.exists():
-            count = pending_attendances.count()
+        count = pending_attendance_count()
+        if count:
             total_count += count
             notifications.append({
                 'title': 'Solicitação de Presença',
@@ -40,9 +40,8 @@ def notifications_context(request):
                 'type': 'warning'
             })
 
-        pending_users = User.objects.filter(status='PENDENTE')
-        if pending_users.exists():
-            count = pending_users.count()
+        count = pending_users_count()
+        if count:
             total_count += count
             notifications.append({
                 'title': 'Novos Usuários',
@@ -104,22 +103,21 @@ def notifications_context(request):
     return {}
 
 def account_management_context(request):
+    """
+    Conta principal e dependentes para o menu de troca de conta, lidos do
+    snapshot em cache (academia.accounts).
+    """
     original_user_id = request.session.get('original_user_id')
-    main_user = None
-    
-    if original_user_id:
-        try:
-            main_user = User.objects.get(id=original_user_id)
-        except User.DoesNotExist:
-            request.session.pop('original_user_id', None)
-    else:
-        main_user = request.user
+    main_user_id = original_user_id or request.user.id
 
-    dependents = main_user.dependents.all() if main_user and main_user.dependents.exists() else []
+    snapshot = get_account_snapshot(main_user_id)
+    if snapshot is None and original_user_id:
+        request.session.pop('original_user_id', None)
+        original_user_id = None
 
     return {
         'original_user_id': original_user_id,
-        'dependents_list': dependents,
+        'dependents_list': snapshot['dependents'] if snapshot else [],
     }
 
 def global_context(request):
@@ -0,0 +1,61 @@
+import os
+import tempfile
+from io import BytesIO
+import openpyxl
+from openpyxl.utils import get_column_letter
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse
+from .report_cache import single_flight
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Até este tamanho o arquivo gerado fica em memória; acima disso vai para o disco
+XLSX_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+
+def write_xlsx(title, headers, rows, column_width=25):
+    """
+    Grava `rows` (qualquer iterável, de preferência um gerador sobre
+    `queryset.iterator()`) em XLSX no modo write-only do openpyxl, que grava
+    linha a linha sem manter as células em memória. Devolve o arquivo em um
+    SpooledTemporaryFile posicionado no início.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=title[:31])
+    for col_num in range(1, len(headers) + 1):
+        worksheet.column_dimensions[get_column_letter(col_num)].width = column_width
+
+    worksheet.append(headers)
+    for row in rows:
+        if len(row) != len(headers):
+            raise ValueError(f'Linha com {len(row)} coluna(s) para {len(headers)} cabeçalho(s): {row!r}')
+        worksheet.append(row)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_MAX_SIZE)
+    workbook.save(spool)
+    spool.seek(0)
+    return spool
+
+def xlsx_response(filename, title, headers, rows, column_width=25, cache_key=None):
+    """
+    Exporta `rows` para XLSX (ver write_xlsx) e envia o arquivo em blocos pelo
+    FileResponse.
+
+    Com `cache_key`, arquivos de até XLSX_SPOOL_MAX_SIZE ficam no cache e
+    `rows` nem é percorrido enquanto a entrada existir; pedidos idênticos
+    simultâneos recebem um 202 enquanto a primeira geração não termina
+    (single-flight).
+    """
+    if not cache_key:
+        return FileResponse(write_xlsx(title, headers, rows, column_width), as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+    with single_flight(cache_key) as content:
+        if content is None:
+            spool = write_xlsx(title, headers, rows, column_width)
+            size = spool.seek(0, os.SEEK_END)
+            spool.seek(0)
+            if size > XLSX_SPOOL_MAX_SIZE:
+                return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+            content = spool.read()
+            cache.set(cache_key, content, settings.REPORT_CACHE_TIMEOUT)
+    return FileResponse(BytesIO(content), as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Item, Pedido, Turma, User, Meta as MetaModel, Graduation
+from .models import Item, Pedido, Turma, User, Meta as MetaModel, Graduation, Ranking
 from django.contrib.auth.forms import PasswordResetForm
 import datetime
 
@@ -216,6 +216,15 @@ class ItemForm(forms.ModelForm):
             'quantidade': forms.NumberInput(attrs={'class': 'form-control'}),
         }
 
+    # Saldo exibido ao abrir o formulário: a edição grava só a diferença
+    # digitada, sem desfazer reservas feitas nesse meio tempo (ver stock.adjust)
+    quantidade_exibida = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['quantidade_exibida'].initial = self.instance.quantidade
+
 class PedidoForm(forms.ModelForm):
     class Meta:
         model = Pedido
@@ -251,6 +260,19 @@ class TurmaForm(forms.ModelForm):
             'ativa': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
+class RankingForm(forms.ModelForm):
+    class Meta:
+        model = Ranking
+        fields = ['titulo', 'tipo', 'turma', 'data_inicio', 'data_fim', 'ativo']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        data_inicio = cleaned_data.get('data_inicio')
+        data_fim = cleaned_data.get('data_fim')
+        if data_inicio and data_fim and data_fim < data_inicio:
+            self.add_error('data_fim', 'A data de término deve ser posterior à data de início.')
+        return cleaned_data
+
 class MetaForm(forms.ModelForm):
     class Meta:
         model = MetaModel
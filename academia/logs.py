@@ -1,5 +1,26 @@
+import atexit
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
 from .models import Log, User
 
+logger = logging.getLogger(__name__)
+
+# Campos estruturados aceitos por create_log/AuditLogBuffer; demais kwargs são ignorados.
+LOG_DETAIL_FIELDS = ('method', 'path', 'url_name', 'status_code', 'duration_ms', 'acting_user_id')
+
+def _log_details(kwargs):
+    details = {field: kwargs[field] for field in LOG_DETAIL_FIELDS if kwargs.get(field) is not None}
+    if 'path' in details:
+        details['path'] = details['path'][:255]
+    acting_user = kwargs.get('acting_user')
+    if isinstance(acting_user, User):
+        details['acting_user_id'] = acting_user.pk
+    return details
+
 def create_log(user, action, status='SUCESSO', **kwargs):
     """
     Cria um registro de log para uma ação.
@@ -7,5 +28,133 @@ def create_log(user, action, status='SUCESSO', **kwargs):
     Log.objects.create(
         user=user if isinstance(user, User) else None,
         action=action,
-        status=status
+        status=status,
+        **_log_details(kwargs)
     )
+
+class AuditLogBuffer:
+    """
+    Fila em memória para os logs de auditoria gerados a cada requisição.
+
+    Os registros são acumulados no processo e gravados com um único
+    `bulk_create` quando a fila atinge AUDIT_LOG_BATCH_SIZE itens, quando
+    AUDIT_LOG_FLUSH_INTERVAL segundos se passam ou quando o worker encerra.
+    Com AUDIT_LOG_SYNC ativo (ex.: testes) cada registro é gravado na hora.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._last_actions = {}
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    @property
+    def sync(self):
+        return getattr(settings, 'AUDIT_LOG_SYNC', False)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 50)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 5)
+
+    def _stored_action(self, user_id):
+        last_log = Log.objects.filter(user_id=user_id).order_by('-timestamp').values_list('action', 'status').first()
+        return tuple(last_log) if last_log else None
+
+    def enqueue(self, user, action, status='SUCESSO', **kwargs):
+        """
+        Enfileira um log. Retorna False se for idêntico à última ação do usuário.
+        Aceita os mesmos campos estruturados de create_log.
+        """
+        user_id = user.pk if isinstance(user, User) else None
+
+        # Na primeira ação do usuário neste processo, busca o último log gravado
+        # para manter a deduplicação entre reinícios do worker. No modo síncrono
+        # o banco é sempre consultado, como antes do buffer. A consulta fica fora
+        # do lock para não fazer as demais requisições esperarem por ela.
+        stored = None
+        query_db = user_id is not None and (self.sync or user_id not in self._last_actions)
+        if query_db:
+            stored = self._stored_action(user_id)
+
+        with self._lock:
+            if user_id is not None:
+                if query_db and (self.sync or user_id not in self._last_actions):
+                    self._last_actions[user_id] = stored
+                if self._last_actions[user_id] == (action, status):
+                    return False
+                self._last_actions[user_id] = (action, status)
+
+            self._pending.append(Log(user_id=user_id, action=action, status=status, timestamp=timezone.now(), **_log_details(kwargs)))
+            should_flush = (
+                self.sync
+                or len(self._pending) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+
+        if should_flush:
+            self.flush()
+        else:
+            self._schedule_flush()
+        return True
+
+    def flush(self):
+        """
+        Grava todos os logs pendentes. Retorna a quantidade gravada.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not pending:
+            return 0
+
+        try:
+            with transaction.atomic():
+                Log.objects.bulk_create(pending, batch_size=self.batch_size)
+            return len(pending)
+        except Exception:
+            logger.warning('Falha ao gravar %d log(s) de auditoria em lote; gravando um a um.', len(pending), exc_info=True)
+
+        # Um registro inválido (ex.: usuário excluído nesse meio tempo) não
+        # derruba o lote inteiro: só ele é descartado.
+        saved = 0
+        for log in pending:
+            log.pk = None
+            try:
+                with transaction.atomic():
+                    log.save(force_insert=True)
+                saved += 1
+            except Exception:
+                logger.exception(
+                    'Log de auditoria descartado: user_id=%s acting_user_id=%s status=%s action=%r',
+                    log.user_id, log.acting_user_id, log.status, log.action,
+                )
+        return saved
+
+    def _schedule_flush(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # A thread do timer abre a sua própria conexão; não a deixamos aberta.
+            connections.close_all()
+
+audit_buffer = AuditLogBuffer()
+atexit.register(audit_buffer.flush)
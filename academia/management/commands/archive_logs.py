@@ -0,0 +1,195 @@
+import datetime
+import gzip
+import json
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from academia.models import Log, LogArchive, User
+
+ARCHIVE_FIELDS = (
+    'id', 'timestamp', 'user_id', 'acting_user_id', 'action', 'status',
+    'method', 'path', 'url_name', 'status_code', 'duration_ms',
+)
+
+def month_bounds(month):
+    """Retorna o início do mês e do mês seguinte como datetimes no fuso local."""
+    start = timezone.make_aware(datetime.datetime(month.year, month.month, 1))
+    if month.month == 12:
+        end = timezone.make_aware(datetime.datetime(month.year + 1, 1, 1))
+    else:
+        end = timezone.make_aware(datetime.datetime(month.year, month.month + 1, 1))
+    return start, end
+
+def parse_month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Mês inválido "{value}". Use AAAA-MM.')
+
+class Command(BaseCommand):
+    help = 'Move logs antigos para arquivos JSONL compactados, com índice para busca e restauração.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.LOG_RETENTION_DAYS, help='Mantém no banco apenas os logs dos últimos N dias.')
+        parser.add_argument('--archive-dir', default=settings.LOG_ARCHIVE_DIR, help='Diretório dos arquivos compactados.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Quantidade de registros lidos/excluídos por vez.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas informa o que seria arquivado.')
+        parser.add_argument('--loop', action='store_true', help='Executa continuamente, a cada --interval segundos.')
+        parser.add_argument('--interval', type=int, default=86400, help='Intervalo entre execuções no modo --loop (segundos).')
+        parser.add_argument('--list', action='store_true', help='Lista os meses arquivados.')
+        parser.add_argument('--search', help='Procura um texto (ação ou caminho) nos logs arquivados.')
+        parser.add_argument('--user', type=int, help='Restringe a busca a um usuário (id).')
+        parser.add_argument('--month', help='Restringe a busca a um mês (AAAA-MM).')
+        parser.add_argument('--restore', metavar='AAAA-MM', help='Restaura para o banco os logs arquivados de um mês.')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self.list_archives()
+        if options['search'] is not None or options['user'] is not None:
+            return self.search(options)
+        if options['restore']:
+            return self.restore(parse_month(options['restore']), options['chunk_size'])
+
+        while True:
+            self.archive(options)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    # --- ARQUIVAMENTO ---
+
+    def archive(self, options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['days'])
+        months = Log.objects.filter(timestamp__lt=cutoff).dates('timestamp', 'month')
+
+        if not months:
+            self.stdout.write(self.style.SUCCESS('Nenhum log para arquivar.'))
+            return
+
+        os.makedirs(options['archive_dir'], exist_ok=True)
+        total = 0
+        for month in months:
+            start, end = month_bounds(month)
+            queryset = Log.objects.filter(timestamp__gte=start, timestamp__lt=min(end, cutoff))
+
+            if options['dry_run']:
+                count = queryset.count()
+                total += count
+                self.stdout.write(f'{month.strftime("%m/%Y")}: {count} log(s) seriam arquivados.')
+                continue
+
+            archive = self.write_month(month, queryset, options['archive_dir'], options['chunk_size'])
+            self.delete_archived(queryset, options['chunk_size'])
+            total += archive.row_count
+            self.stdout.write(f'{month.strftime("%m/%Y")}: {archive.row_count} log(s) arquivados em {archive.file_path}.')
+
+        verb = 'seriam arquivados' if options['dry_run'] else 'arquivados'
+        self.stdout.write(self.style.SUCCESS(f'Operação concluída. {total} log(s) {verb}.'))
+
+    def write_month(self, month, queryset, archive_dir, chunk_size):
+        filename = f'logs-{month.strftime("%Y-%m")}-{timezone.now().strftime("%Y%m%d%H%M%S")}.jsonl.gz'
+        path = os.path.join(archive_dir, filename)
+        tmp_path = f'{path}.tmp'
+
+        row_count = 0
+        first_timestamp = last_timestamp = None
+        rows = queryset.order_by('timestamp', 'id').values_list(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size)
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive_file:
+            for row in rows:
+                record = dict(zip(ARCHIVE_FIELDS, row))
+                first_timestamp = first_timestamp or record['timestamp']
+                last_timestamp = record['timestamp']
+                record['timestamp'] = record['timestamp'].isoformat()
+                archive_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                row_count += 1
+
+        # Só publica o arquivo (e o índice) depois de gravado por completo
+        os.replace(tmp_path, path)
+        return LogArchive.objects.create(
+            month=month,
+            file_path=path,
+            row_count=row_count,
+            first_timestamp=first_timestamp,
+            last_timestamp=last_timestamp,
+            size_bytes=os.path.getsize(path),
+        )
+
+    def delete_archived(self, queryset, chunk_size):
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                Log.objects.filter(id__in=ids).delete()
+
+    # --- CONSULTA E RESTAURAÇÃO ---
+
+    def list_archives(self):
+        archives = LogArchive.objects.all()
+        if not archives:
+            self.stdout.write('Nenhum arquivo de logs encontrado.')
+            return
+        for archive in archives:
+            self.stdout.write(f'{archive.month.strftime("%Y-%m")}  {archive.row_count:>9} registro(s)  {archive.size_bytes:>12} bytes  {archive.file_path}')
+
+    def read_archive(self, archive):
+        with gzip.open(archive.file_path, 'rt', encoding='utf-8') as archive_file:
+            for line in archive_file:
+                yield json.loads(line)
+
+    def search(self, options):
+        archives = LogArchive.objects.order_by('month', 'created_at')
+        if options['month']:
+            archives = archives.filter(month=parse_month(options['month']))
+
+        text = (options['search'] or '').lower()
+        found = 0
+        for archive in archives:
+            for record in self.read_archive(archive):
+                if options['user'] is not None and record['user_id'] != options['user']:
+                    continue
+                if text and text not in record['action'].lower() and text not in (record.get('path') or '').lower():
+                    continue
+                found += 1
+                self.stdout.write(json.dumps(record, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(f'{found} registro(s) encontrado(s).'))
+
+    def restore(self, month, chunk_size):
+        archives = list(LogArchive.objects.filter(month=month))
+        if not archives:
+            raise CommandError(f'Nenhum arquivo encontrado para {month.strftime("%m/%Y")}.')
+
+        total = 0
+        for archive in archives:
+            batch = []
+            with transaction.atomic():
+                for record in self.read_archive(archive):
+                    record['timestamp'] = datetime.datetime.fromisoformat(record['timestamp'])
+                    batch.append(Log(**record))
+                    if len(batch) >= chunk_size:
+                        self.insert_batch(batch)
+                        batch = []
+                if batch:
+                    self.insert_batch(batch)
+                archive.delete()
+            os.remove(archive.file_path)
+            total += archive.row_count
+
+        self.stdout.write(self.style.SUCCESS(f'{total} log(s) de {month.strftime("%m/%Y")} restaurados.'))
+
+    def insert_batch(self, batch):
+        # Usuários excluídos depois do arquivamento ficam como NULL, como faria
+        # o SET_NULL se o log ainda estivesse no banco. O ignore_conflicts só
+        # cobre ids já restaurados, não chaves estrangeiras inválidas.
+        user_ids = {log.user_id for log in batch} | {log.acting_user_id for log in batch}
+        user_ids.discard(None)
+        existing = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        for log in batch:
+            if log.user_id not in existing:
+                log.user_id = None
+            if log.acting_user_id not in existing:
+                log.acting_user_id = None
+        Log.objects.bulk_create(batch, ignore_conflicts=True)
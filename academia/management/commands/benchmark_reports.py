@@ -0,0 +1,208 @@
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import time
+import tracemalloc
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from academia.models import AttendanceRequest, Graduation, Log, Pedido, ReportJob, User
+from academia.report_cache import bump_data_version
+from academia.reports import report_params, run_report_job
+
+# (nome, view, perfil, filtros extras). Views com o período recebem start_date/end_date.
+HTTP_CASES = [
+    ('presencas_html', 'professor_relatorio_presenca', 'professor', {}),
+    ('presencas_xlsx', 'professor_relatorio_presenca', 'professor', {'export': 'xlsx'}),
+    ('pedidos_html', 'relatorio_pedidos', 'professor', {}),
+    ('pedidos_agrupados_html', 'relatorio_pedidos', 'professor', {'group_by_aluno': '1'}),
+    ('pedidos_xlsx', 'relatorio_pedidos', 'professor', {'export': 'xlsx'}),
+    ('graduacoes_html', 'graduations_report', 'professor', {}),
+    ('graduacoes_xlsx', 'graduations_report', 'professor', {'export': 'xlsx'}),
+    ('frequencia_html', 'relatorio_frequencia', 'professor', {}),
+    ('frequencia_xlsx', 'relatorio_frequencia', 'professor', {'export': 'xlsx'}),
+    ('fila_presencas_html', 'professor_presencas', 'professor', {}),
+    ('aluno_presencas_html', 'aluno_relatorio_presenca', 'student', {}),
+    ('aluno_presencas_xlsx', 'aluno_relatorio_presenca', 'student', {'export': 'xlsx'}),
+    ('aluno_pedidos_html', 'aluno_relatorio_pedidos', 'student', {}),
+    ('aluno_pedidos_xlsx', 'aluno_relatorio_pedidos', 'student', {'export': 'xlsx'}),
+]
+
+# PDFs são gerados pelo worker; o benchmark chama a mesma função diretamente
+PDF_CASES = [
+    ('presencas_pdf', 'presenca', 'professor'),
+    ('pedidos_pdf', 'pedidos', 'professor'),
+    ('graduacoes_pdf', 'graduacoes', 'professor'),
+    ('aluno_presencas_pdf', 'aluno_presenca', 'student'),
+]
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Command(BaseCommand):
+    help = 'Mede o tempo, as consultas e o pico de memória de cada relatório/exportação e grava o resultado em JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Data inicial dos relatórios (AAAA-MM-DD). Padrão: 12 meses atrás.')
+        parser.add_argument('--end', help='Data final dos relatórios (AAAA-MM-DD). Padrão: hoje.')
+        parser.add_argument('--repeat', type=int, default=3, help='Execuções de cada caso.')
+        parser.add_argument('--warm', action='store_true', help='Mede com o cache dos relatórios já preenchido.')
+        parser.add_argument('--only', nargs='+', help='Executa apenas os casos informados.')
+        parser.add_argument('--no-pdf', action='store_true', help='Não mede a geração dos PDFs.')
+        parser.add_argument('--professor', help='Usuário (professor) usado nas requisições.')
+        parser.add_argument('--student', help='Usuário (aluno) usado nas requisições.')
+        parser.add_argument('--output', help='Arquivo JSON de saída. Padrão: benchmarks/benchmark-<data>.json.')
+        parser.add_argument('--compare', help='JSON de uma execução anterior para comparar as medianas.')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            start = datetime.date.fromisoformat(options['start']) if options['start'] else today - datetime.timedelta(days=365)
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else today
+        except ValueError:
+            raise CommandError('Datas inválidas. Use AAAA-MM-DD.')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat deve ser maior que zero.')
+        previous = self.load_previous(options['compare'])
+
+        self.period = {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+        self.warm = options['warm']
+        self.users = {
+            'professor': self.find_user(options['professor'], group_role__in=['PRO', 'ADM']),
+            'student': self.find_user(options['student'], group_role='STD'),
+        }
+        self.clients = {}
+        for role, user in self.users.items():
+            self.clients[role] = Client()
+            self.clients[role].force_login(user)
+
+        http_cases = [case for case in HTTP_CASES if not options['only'] or case[0] in options['only']]
+        pdf_cases = [] if options['no_pdf'] else [case for case in PDF_CASES if not options['only'] or case[0] in options['only']]
+
+        results = []
+        for name, view_name, role, extra in http_cases:
+            results.append(self.measure(name, options['repeat'], lambda: self.request(view_name, role, extra)))
+        for name, report_type, role in pdf_cases:
+            results.append(self.measure(name, options['repeat'], lambda: self.render_pdf(report_type, role)))
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'revision': git_revision(),
+            'database': connection.vendor,
+            'period': self.period,
+            'warm_cache': self.warm,
+            'volume': {
+                'users': User.objects.count(),
+                'attendance_requests': AttendanceRequest.objects.count(),
+                'pedidos': Pedido.objects.count(),
+                'graduations': Graduation.objects.count(),
+                'logs': Log.objects.count(),
+            },
+            'results': results,
+        }
+
+        output = options['output'] or os.path.join(settings.BASE_DIR, 'benchmarks', f"benchmark-{timezone.now():%Y%m%d-%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        for result in results:
+            line = (
+                f"{result['name']:<24} {result['median_ms']:>9.1f} ms  {result['queries']:>5} consulta(s)  "
+                f"{result['peak_memory_kb']:>9.0f} KB"
+            )
+            before = previous.get(result['name'])
+            if before:
+                line += f"  ({(result['median_ms'] - before) / before * 100:+.0f}% vs. anterior)"
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {output}.'))
+
+    def find_user(self, username, **filters):
+        users = User.objects.filter(status='ATIVO', **filters)
+        user = users.filter(username=username).first() if username else users.order_by('id').first()
+        if user is None:
+            raise CommandError(f'Nenhum usuário encontrado para {filters}. Gere dados com seed_demo_data.')
+        return user
+
+    def load_previous(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                return {result['name']: result['median_ms'] for result in json.load(f)['results']}
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Não foi possível ler {path}: {e}')
+
+    def prepare(self):
+        # Sem --warm, cada execução começa com o cache dos relatórios invalidado
+        if not self.warm:
+            bump_data_version('attendance', 'pedidos', 'graduacoes')
+
+    def measure(self, name, repeat, run):
+        """
+        Executa o caso `repeat` vezes medindo tempo e consultas. O pico de
+        memória vem de uma execução à parte, porque o tracemalloc deixa o
+        código bem mais lento.
+        """
+        if self.warm:
+            run()
+
+        timings = []
+        for _ in range(repeat):
+            self.prepare()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                extra = run()
+                timings.append((time.perf_counter() - started) * 1000)
+            # O log de consultas da conexão é zerado no início de cada requisição
+            query_count = len(queries.captured_queries)
+
+        self.prepare()
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'name': name,
+            'runs_ms': [round(t, 2) for t in timings],
+            'min_ms': round(min(timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2),
+            'queries': query_count,
+            'peak_memory_kb': round(peak / 1024, 1),
+            **extra,
+        }
+
+    def request(self, view_name, role, extra):
+        response = self.clients[role].get(reverse(view_name), dict(self.period, **extra))
+        # Respostas em streaming só terminam de ser geradas quando consumidas
+        size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+        return {'status_code': response.status_code, 'response_bytes': size}
+
+    def render_pdf(self, report_type, role):
+        job = ReportJob.objects.create(
+            user=self.users[role], report_type=report_type, params=report_params(self.period), status='EXE',
+        )
+        try:
+            run_report_job(job)
+            size = os.path.getsize(job.file_path) if job.status == 'CON' else 0
+        finally:
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            job.delete()
+        return {'status_code': 200 if job.status == 'CON' else 500, 'response_bytes': size}
@@ -1,42 +1,76 @@
+import time
+from datetime import timedelta
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
 from django.utils import timezone
-from datetime import timedelta
+from academia import stock
 from academia.models import Pedido
+from academia.report_cache import bump_data_version
+
+# Prazo da reserva de um pedido pendente
+EXPIRATION_DAYS = 15
+EXPIRATION_REASON = 'Expirado tempo para atendimento'
 
 class Command(BaseCommand):
     help = 'Cancela pedidos pendentes que expiraram (mais de 15 dias).'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Quantidade de pedidos cancelados por transação.')
+        parser.add_argument('--dry-run', action='store_true', help='Apenas informa o que seria cancelado.')
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.NOTICE('Iniciando verificação de pedidos expirados...'))
-        
-        # Define o limite de tempo (15 dias atrás)
-        expiration_limit = timezone.now() - timedelta(days=15)
-        
-        # Filtra pedidos pendentes que foram criados antes do limite de tempo
-        expired_orders = Pedido.objects.filter(
-            status='PEND',
-            data_solicitacao__lt=expiration_limit
-        )
-        
-        if not expired_orders.exists():
+        started = time.monotonic()
+
+        # Pedidos pendentes criados antes do limite de tempo
+        expiration_limit = timezone.now() - timedelta(days=EXPIRATION_DAYS)
+        expired_orders = Pedido.objects.filter(status='PEND', data_solicitacao__lt=expiration_limit)
+
+        if options['dry_run']:
+            return self.dry_run(expired_orders)
+
+        count = units = batches = 0
+        items = set()
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                # skip_locked: pedidos sendo alterados agora ficam para a próxima execução
+                rows = list(
+                    expired_orders.filter(pk__gt=last_id)
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .order_by('pk')
+                    .values_list('pk', 'quantidade', 'item__nome')[:options['batch_size']]
+                )
+                if not rows:
+                    break
+                totals = stock.bulk_cancel([row[0] for row in rows], EXPIRATION_REASON)
+
+            last_id = rows[-1][0]
+            count += len(rows)
+            units += sum(totals.values())
+            items.update(totals)
+            batches += 1
+            if options['verbosity'] >= 1:
+                for pk, quantidade, item_nome in rows:
+                    self.stdout.write(f'Pedido #{pk} para "{item_nome}" cancelado. {quantidade} unidade(s) devolvida(s) ao estoque.')
+
+        if not count:
             self.stdout.write(self.style.SUCCESS('Nenhum pedido expirado encontrado.'))
             return
 
-        count = 0
-        for pedido in expired_orders:
-            item = pedido.item
-            quantidade_reservada = pedido.quantidade
-            
-            # Devolve a quantidade ao estoque
-            item.quantidade += quantidade_reservada
-            item.save()
-            
-            # Atualiza o status do pedido
-            pedido.status = 'CANC'
-            pedido.cancellation_reason = 'Expirado tempo para atendimento'
-            pedido.save()
-            
-            count += 1
-            self.stdout.write(f'Pedido #{pedido.id} para "{item.nome}" cancelado. {quantidade_reservada} unidade(s) devolvida(s) ao estoque.')
-            
+        # update() não dispara os sinais dos pedidos
+        bump_data_version('pedidos')
+        self.stdout.write(
+            f'{units} unidade(s) devolvida(s) a {len(items)} item(ns) em {batches} lote(s), '
+            f'{time.monotonic() - started:.2f}s.'
+        )
         self.stdout.write(self.style.SUCCESS(f'Operação concluída. {count} pedido(s) expirado(s) foram cancelados.'))
+
+    def dry_run(self, expired_orders):
+        totals = expired_orders.values('item__nome').annotate(pedidos=Count('id'), unidades=Sum('quantidade')).order_by('item__nome')
+        count = 0
+        for row in totals:
+            count += row['pedidos']
+            self.stdout.write(f'"{row["item__nome"]}": {row["pedidos"]} pedido(s), {row["unidades"]} unidade(s) seriam devolvidas ao estoque.')
+        self.stdout.write(self.style.SUCCESS(f'Simulação concluída. {count} pedido(s) expirado(s) seriam cancelados.'))
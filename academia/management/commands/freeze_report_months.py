@@ -0,0 +1,56 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from academia.models import AttendanceMonthSnapshot
+from academia.snapshots import current_month, freeze_month, months_to_freeze
+
+def parse_month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Mês inválido "{value}". Use AAAA-MM.')
+
+class Command(BaseCommand):
+    help = 'Congela as presenças consolidadas dos meses fechados em snapshots lidos pelos relatórios.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', nargs='+', metavar='AAAA-MM', help='Gera (ou regera) apenas os meses informados.')
+        parser.add_argument('--rebuild', action='store_true', help='Regera todos os meses fechados, inclusive os que já têm snapshot.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Quantidade de linhas gravadas por vez.')
+        parser.add_argument('--list', action='store_true', help='Lista os snapshots existentes.')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self.list_snapshots()
+
+        if options['month']:
+            months = [parse_month(value) for value in options['month']]
+            open_months = [month for month in months if month >= current_month()]
+            if open_months:
+                raise CommandError(f'O mês {open_months[0].strftime("%m/%Y")} ainda não foi fechado.')
+        elif options['rebuild']:
+            months = list(AttendanceMonthSnapshot.objects.values_list('month', flat=True)) + months_to_freeze()
+        else:
+            months = months_to_freeze()
+
+        if not months:
+            self.stdout.write(self.style.SUCCESS('Nenhum mês para congelar.'))
+            return
+
+        for month in sorted(months):
+            snapshot = freeze_month(month, options['batch_size'])
+            self.stdout.write(
+                f'{month.strftime("%m/%Y")}: {snapshot.row_count} linha(s), {snapshot.student_count} aluno(s), '
+                f'{snapshot.credited_classes} aula(s) creditada(s).'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Operação concluída. {len(months)} mês(es) congelado(s).'))
+
+    def list_snapshots(self):
+        snapshots = AttendanceMonthSnapshot.objects.all()
+        if not snapshots:
+            self.stdout.write('Nenhum snapshot encontrado.')
+            return
+        for snapshot in snapshots:
+            self.stdout.write(
+                f'{snapshot.month.strftime("%Y-%m")}  {snapshot.row_count:>7} linha(s)  {snapshot.student_count:>5} aluno(s)  '
+                f'{snapshot.credited_classes:>7} aula(s)  gerado em {snapshot.created_at:%d/%m/%Y %H:%M}'
+            )
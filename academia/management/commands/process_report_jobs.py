@@ -0,0 +1,105 @@
+import datetime
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from academia.models import ReportJob, ReportLock
+from academia.report_cache import report_lock
+from academia.reports import process_report_job
+from academia.snapshots import freeze_closed_months
+
+# Jobs em processamento há mais tempo que isso são considerados perdidos (worker caiu)
+STALE_JOB_MINUTES = 30
+
+class Command(BaseCommand):
+    help = 'Gera em segundo plano as exportações de relatórios em PDF e remove as expiradas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Executa continuamente, aguardando novos jobs.')
+        parser.add_argument('--interval', type=int, default=2, help='Espera entre verificações no modo --loop (segundos).')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Encerra após processar N jobs (0 = sem limite).')
+        parser.add_argument('--cleanup', action='store_true', help='Apenas remove as exportações expiradas.')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.cleanup()
+            return
+
+        processed = 0
+        last_cleanup = None
+        while True:
+            if last_cleanup is None or time.monotonic() - last_cleanup >= 3600:
+                self.cleanup()
+                if settings.REPORT_SNAPSHOTS_AUTO:
+                    self.freeze_months()
+                last_cleanup = time.monotonic()
+
+            job = self.claim_next()
+            if job is not None:
+                process_report_job(job)
+                if job.status != 'PEN':
+                    processed += 1
+                    self.stdout.write(f'Job {job.pk} ({job.report_type}): {job.get_status_display()}.')
+                    if options['max_jobs'] and processed >= options['max_jobs']:
+                        break
+                    continue
+                # Outro worker gera o mesmo PDF; o job é retomado quando ele terminar
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'{processed} exportação(ões) processada(s).'))
+
+    def claim_next(self):
+        """
+        Reserva o job mais antigo da fila; skip_locked permite vários workers.
+        Jobs idênticos a um que já está em processamento aguardam na fila.
+        """
+        running = ReportJob.objects.filter(status='EXE').exclude(cache_key='').values('cache_key')
+        with transaction.atomic():
+            job = (
+                ReportJob.objects.select_for_update(skip_locked=True)
+                .filter(status='PEN')
+                .exclude(cache_key__in=running)
+                .order_by('created_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            job.status = 'EXE'
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at'])
+        return job
+
+    def cleanup(self):
+        now = timezone.now()
+        ReportJob.objects.filter(
+            status='EXE', started_at__lt=now - datetime.timedelta(minutes=STALE_JOB_MINUTES)
+        ).update(status='ERR', error='Tempo de processamento excedido.', finished_at=now)
+
+        # Locks de processos que caíram antes de liberá-los
+        ReportLock.objects.filter(expires_at__lte=now).delete()
+
+        expired = ReportJob.objects.filter(
+            status__in=['CON', 'ERR'],
+            finished_at__lt=now - datetime.timedelta(hours=settings.REPORT_JOB_RETENTION_HOURS),
+        )
+        removed = 0
+        for job in expired.only('id', 'file_path').iterator():
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+            removed += 1
+        expired.delete()
+        if removed:
+            self.stdout.write(f'{removed} exportação(ões) expirada(s) removida(s).')
+
+    def freeze_months(self):
+        """Na virada do mês, congela o mês que acabou de fechar (ver freeze_report_months)."""
+        with report_lock('snapshots', STALE_JOB_MINUTES * 60) as acquired:
+            if not acquired:
+                return
+            for snapshot in freeze_closed_months():
+                self.stdout.write(f'Snapshot de presenças de {snapshot.month.strftime("%m/%Y")} gerado.')
@@ -0,0 +1,60 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from academia.attendance import consolidate_attendance
+from academia.models import AttendanceDailySummary, AttendanceRequest, Ranking
+from academia.rankings import compute_ranking
+
+def parse_date(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Data inválida "{value}". Use AAAA-MM-DD.')
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo diário de presenças (AttendanceDailySummary) a partir das solicitações.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Data inicial (AAAA-MM-DD). Padrão: todo o histórico.')
+        parser.add_argument('--end', help='Data final (AAAA-MM-DD). Padrão: todo o histórico.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Quantidade de linhas gravadas por vez.')
+
+    def handle(self, *args, **options):
+        requests = AttendanceRequest.objects.exclude(status='CAN')
+        summaries = AttendanceDailySummary.objects.all()
+        if options['start']:
+            start = parse_date(options['start'])
+            requests = requests.filter(attendance_date__gte=start)
+            summaries = summaries.filter(date__gte=start)
+        if options['end']:
+            end = parse_date(options['end'])
+            requests = requests.filter(attendance_date__lte=end)
+            summaries = summaries.filter(date__lte=end)
+
+        rows = consolidate_attendance(requests, by_turma=True).order_by('attendance_date', 'student_id', 'turma_id')
+
+        total = 0
+        with transaction.atomic():
+            deleted, _ = summaries.delete()
+            batch = []
+            for row in rows.iterator(chunk_size=options['batch_size']):
+                batch.append(AttendanceDailySummary(
+                    student_id=row['student_id'],
+                    turma_id=row['turma_id'],
+                    date=row['attendance_date'],
+                    qty=row['qty'],
+                    status=row['final_status'],
+                ))
+                if len(batch) >= options['batch_size']:
+                    AttendanceDailySummary.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                AttendanceDailySummary.objects.bulk_create(batch)
+                total += len(batch)
+
+            # A reconstrução não passa pela atualização incremental dos rankings
+            for ranking in Ranking.objects.filter(ativo=True):
+                compute_ranking(ranking)
+
+        self.stdout.write(self.style.SUCCESS(f'Resumo reconstruído: {deleted} linha(s) removida(s), {total} linha(s) gravada(s).'))
@@ -0,0 +1,289 @@
+import datetime
+import random
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from academia import search, stock
+from academia.models import AttendanceRequest, Graduation, Item, Log, Pedido, Turma, TurmaAluno, User
+from academia.report_cache import bump_data_version
+from academia.snapshots import discard_snapshots, months_between
+
+# Prefixo dos usuários gerados; usado também por --clear
+SEED_PREFIX = 'seed_'
+
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Eduarda', 'Felipe', 'Gabriela', 'Hugo', 'Isabela', 'João',
+               'Karina', 'Lucas', 'Marina', 'Nicolas', 'Olívia', 'Pedro', 'Rafaela', 'Samuel', 'Tatiane', 'Vitor']
+LAST_NAMES = ['Almeida', 'Barbosa', 'Cardoso', 'Dias', 'Esteves', 'Ferreira', 'Gomes', 'Lima', 'Martins', 'Nogueira',
+              'Oliveira', 'Pereira', 'Ribeiro', 'Santos', 'Teixeira', 'Vieira']
+ITEMS = [('Kimono Branco', 'KIMONO', '350.00'), ('Kimono Azul', 'KIMONO', '380.00'), ('Faixa', 'FAIXA', '60.00'),
+         ('Rashguard', 'HASHGUARD', '150.00'), ('Taxa de Graduação', 'TAXA', '100.00')]
+LOG_ACTIONS = ['acessou o painel', 'solicitou presença', 'gerou relatório de presenças', 'atualizou o perfil', 'solicitou um pedido']
+
+# Dias de treino das turmas (segunda = 0); a terça tem aula com e sem kimono
+TRAINING_WEEKDAYS = (0, 1, 3)
+TUESDAY = 1
+
+class Command(BaseCommand):
+    help = 'Gera uma academia sintética (alunos, turmas, presenças, pedidos, graduações e logs) para testes de volume.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000, help='Quantidade de alunos.')
+        parser.add_argument('--turmas', type=int, default=20, help='Quantidade de turmas.')
+        parser.add_argument('--years', type=int, default=5, help='Anos de histórico de presenças até hoje.')
+        parser.add_argument('--attendance-rate', type=float, default=0.4, help='Chance de o aluno ir a cada aula (0 a 1).')
+        parser.add_argument('--orders', type=int, default=4, help='Pedidos por aluno (média).')
+        parser.add_argument('--logs', type=int, default=50, help='Logs por aluno (média).')
+        parser.add_argument('--seed', type=int, default=42, help='Semente do gerador aleatório (mesma semente, mesmos dados).')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Quantidade de linhas gravadas por vez.')
+        parser.add_argument('--clear', action='store_true', help='Remove os dados gerados anteriormente antes de gerar de novo.')
+
+    def handle(self, *args, **options):
+        if options['students'] < 1 or options['turmas'] < 1 or options['years'] < 1:
+            raise CommandError('--students, --turmas e --years devem ser maiores que zero.')
+        if not 0 <= options['attendance_rate'] <= 1:
+            raise CommandError('--attendance-rate deve estar entre 0 e 1.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.today = timezone.localdate()
+        self.start = self.today - datetime.timedelta(days=365 * options['years'])
+
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(username__startswith=SEED_PREFIX).exists():
+            raise CommandError('Já existem dados gerados. Use --clear para gerá-los de novo.')
+
+        with transaction.atomic():
+            professors = self.create_professors(max(1, options['turmas'] // 5))
+            turmas = self.create_turmas(options['turmas'], professors)
+            students = self.create_students(options['students'])
+            memberships = self.enroll(students, turmas)
+            attendance = self.create_attendance(memberships, professors, options['attendance_rate'])
+            pedidos = self.create_pedidos(students, professors, options['orders'])
+            graduations = self.create_graduations(students)
+            logs = self.create_logs(students, options['logs'])
+
+        # bulk_create não dispara sinais: resumo diário, rankings, snapshots e cache dos relatórios
+        call_command('rebuild_attendance_summary', stdout=self.stdout)
+        discard_snapshots(months_between(self.start, self.today))
+        bump_data_version('attendance', 'pedidos', 'graduacoes')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Dados gerados: {len(students)} aluno(s), {len(turmas)} turma(s), {attendance} presença(s), '
+            f'{pedidos} pedido(s), {graduations} graduação(ões) e {logs} log(s).'
+        ))
+
+    def clear(self):
+        users = User.objects.filter(username__startswith=SEED_PREFIX)
+        # Os pedidos em aberto devolvem a reserva antes de sumirem com os alunos
+        with transaction.atomic():
+            open_ids = list(Pedido.objects.select_for_update().filter(aluno__in=users, status__in=stock.RESERVED_STATUSES).values_list('pk', flat=True))
+            stock.bulk_cancel(open_ids, 'Dados de demonstração removidos', from_statuses=stock.RESERVED_STATUSES)
+        Turma.objects.filter(professor__in=users).delete()
+        deleted, _ = users.delete()
+        self.stdout.write(f'{deleted} registro(s) gerados anteriormente removido(s).')
+
+    def batches(self, objs):
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def bulk_create(self, model, objs):
+        """Grava em lotes a partir de um iterável; devolve a quantidade gravada."""
+        total = 0
+        for batch in self.batches(objs):
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        return total
+
+    def random_name(self):
+        return self.rng.choice(FIRST_NAMES), f'{self.rng.choice(LAST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+
+    def random_datetime(self, start):
+        days = (self.today - start).days
+        date = start + datetime.timedelta(days=self.rng.randint(0, max(days, 0)))
+        moment = datetime.datetime.combine(date, datetime.time(self.rng.randint(6, 21), self.rng.randint(0, 59)))
+        return timezone.make_aware(moment)
+
+    def new_users(self, count, role, label):
+        # Um único hash para todos: gerar milhares de hashes levaria minutos
+        password = make_password('senha123')
+        for i in range(count):
+            first_name, last_name = self.random_name()
+            username = f'{SEED_PREFIX}{label}{i}@example.com'
+            user = User(
+                username=username,
+                email=username,
+                password=password,
+                first_name=first_name,
+                last_name=last_name,
+                group_role=role,
+                status='ATIVO',
+                is_active=True,
+                photo='photos/default_profile.png',
+                birthday=datetime.date(self.rng.randint(1970, 2015), self.rng.randint(1, 12), self.rng.randint(1, 28)),
+                training_start_date=self.start + datetime.timedelta(days=self.rng.randint(0, 365)),
+            )
+            user.search_text = search.user_text(user)
+            yield user
+
+    def create_professors(self, count):
+        self.bulk_create(User, self.new_users(count, 'PRO', 'professor'))
+        return list(User.objects.filter(username__startswith=f'{SEED_PREFIX}professor').order_by('id'))
+
+    def create_turmas(self, count, professors):
+        Turma.objects.bulk_create([
+            Turma(nome=f'Turma {i + 1:02d}', descricao='Turma gerada para testes de volume', professor=professors[i % len(professors)])
+            for i in range(count)
+        ])
+        return list(Turma.objects.filter(professor__in=professors).order_by('id'))
+
+    def create_students(self, count):
+        self.bulk_create(User, self.new_users(count, 'STD', 'aluno'))
+        return list(User.objects.filter(username__startswith=f'{SEED_PREFIX}aluno').only('id', 'training_start_date').order_by('id'))
+
+    def enroll(self, students, turmas):
+        """Cada aluno entra em uma turma; um em cada cinco também em uma segunda."""
+        memberships = []
+        for student in students:
+            for turma in self.rng.sample(turmas, 2 if len(turmas) > 1 and self.rng.random() < 0.2 else 1):
+                memberships.append((student, turma))
+        self.bulk_create(TurmaAluno, (
+            TurmaAluno(turma=turma, aluno=student, status='APRO', data_aprovacao=timezone.now())
+            for student, turma in memberships
+        ))
+        return memberships
+
+    def create_attendance(self, memberships, professors, rate):
+        training_days = []
+        day = self.start
+        while day <= self.today:
+            if day.weekday() in TRAINING_WEEKDAYS:
+                training_days.append(day)
+            day += datetime.timedelta(days=1)
+        recent = self.today - datetime.timedelta(days=15)
+
+        def requests():
+            for student, turma in memberships:
+                for day in training_days:
+                    if day < student.training_start_date or self.rng.random() >= rate:
+                        continue
+                    if day > recent and self.rng.random() < 0.5:
+                        status = 'PEN'
+                    else:
+                        status = self.rng.choices(['APR', 'REJ', 'CAN'], weights=[90, 7, 3])[0]
+                    processed = status in ('APR', 'REJ')
+                    if day.weekday() == TUESDAY:
+                        # Na terça, às vezes o aluno fica só em uma das aulas
+                        class_types = self.rng.choices([['GI', 'NOGI'], ['GI'], ['NOGI']], weights=[70, 15, 15])[0]
+                    else:
+                        class_types = ['BOTH']
+                    for class_type in class_types:
+                        yield AttendanceRequest(
+                            student=student,
+                            turma=turma,
+                            attendance_date=day,
+                            class_type=class_type,
+                            reason='Presença gerada para testes de volume',
+                            status=status,
+                            rejection_reason='Não compareceu' if status == 'REJ' else '',
+                            processed_by=self.rng.choice(professors) if processed else None,
+                            processed_at=timezone.make_aware(datetime.datetime.combine(day, datetime.time(22))) if processed else None,
+                            notified=processed,
+                        )
+
+        return self.bulk_create(AttendanceRequest, requests())
+
+    def create_pedidos(self, students, professors, per_student):
+        items = [Item.objects.get_or_create(nome=nome, tipo=tipo, defaults={'valor': Decimal(valor), 'quantidade': 1000})[0] for nome, tipo, valor in ITEMS]
+        for item in items:
+            stock.record_count(item.pk, kind=stock.RESTOCK)
+        recent = timezone.now() - datetime.timedelta(days=15)
+
+        def pedidos():
+            for student in students:
+                for _ in range(self.rng.randint(0, per_student * 2)):
+                    item = self.rng.choice(items)
+                    quantidade = self.rng.randint(1, 2)
+                    requested_at = self.random_datetime(student.training_start_date)
+                    status = 'PEND' if requested_at > recent else self.rng.choices(['FINA', 'CANC', 'REJE', 'ENTR'], weights=[80, 10, 5, 5])[0]
+                    pedido = Pedido(
+                        aluno=student,
+                        item=item,
+                        quantidade=quantidade,
+                        status=status,
+                        final_value=item.valor * quantidade,
+                        aprovado_por=self.rng.choice(professors) if status in ('FINA', 'ENTR') else None,
+                        data_aprovacao=requested_at + datetime.timedelta(days=1) if status in ('FINA', 'ENTR') else None,
+                        rejection_reason='Fora de estoque' if status == 'REJE' else None,
+                        cancellation_reason='Cancelado pelo aluno' if status == 'CANC' else None,
+                    )
+                    pedido.search_text = search.pedido_text(pedido)
+                    pedido._requested_at = requested_at
+                    yield pedido
+
+        total = 0
+        for batch in self.batches(pedidos()):
+            Pedido.objects.bulk_create(batch)
+            # data_solicitacao é auto_now_add: a data histórica vai num segundo passo
+            for pedido in batch:
+                pedido.data_solicitacao = pedido._requested_at
+            Pedido.objects.bulk_update(batch, ['data_solicitacao'])
+            self.reserve_open(batch)
+            total += len(batch)
+        return total
+
+    def reserve_open(self, pedidos):
+        # bulk_create não passa por stock.create_order: os pedidos em aberto
+        # reservam aqui, com a movimentação no livro-razão; sem saldo, o
+        # pedido fica recusado como seria na tela
+        rejected = []
+        for pedido in pedidos:
+            if pedido.status not in stock.RESERVED_STATUSES:
+                continue
+            try:
+                stock.reserve(pedido.item_id, pedido.quantidade, pedido_id=pedido.pk)
+            except stock.InsufficientStock:
+                pedido.status = 'REJE'
+                pedido.rejection_reason = 'Fora de estoque'
+                rejected.append(pedido)
+        Pedido.objects.bulk_update(rejected, ['status', 'rejection_reason'])
+
+    def create_graduations(self, students):
+        belts = [code for code, _ in Graduation.BELT_CHOICES]
+
+        def graduations():
+            for student in students:
+                date = student.training_start_date
+                belt_index, degree = 0, 0
+                while True:
+                    date += datetime.timedelta(days=self.rng.randint(120, 360))
+                    if date > self.today:
+                        break
+                    degree += 1
+                    if degree > 4:
+                        belt_index, degree = min(belt_index + 1, len(belts) - 1), 0
+                    yield Graduation(student=student, belt=belts[belt_index], degree=degree, date=date)
+
+        return self.bulk_create(Graduation, graduations())
+
+    def create_logs(self, students, per_student):
+        def logs():
+            for student in students:
+                for _ in range(self.rng.randint(0, per_student * 2)):
+                    yield Log(
+                        user=student,
+                        action=self.rng.choice(LOG_ACTIONS),
+                        timestamp=self.random_datetime(student.training_start_date),
+                        status='SUCESSO' if self.rng.random() < 0.97 else 'FALHA',
+                    )
+
+        return self.bulk_create(Log, logs())
@@ -0,0 +1,74 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from academia import stock
+from academia.models import Item, StockMovement
+
+def parse_moment(value):
+    for fmt in ('%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            moment = datetime.datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if fmt == '%Y-%m-%d':
+            # Só a data: saldo no fim do dia
+            moment = moment.replace(hour=23, minute=59, second=59, microsecond=999999)
+        return timezone.make_aware(moment)
+    raise CommandError(f'Data inválida "{value}". Use AAAA-MM-DD ou AAAA-MM-DDTHH:MM.')
+
+class Command(BaseCommand):
+    help = 'Consulta o livro-razão do estoque: saldo em uma data, histórico de um item e conferência com Item.quantidade.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', metavar='AAAA-MM-DD[THH:MM]', help='Saldo de cada item no momento informado (padrão: agora).')
+        parser.add_argument('--item', type=int, help='ID do item consultado.')
+        parser.add_argument('--history', action='store_true', help='Lista as movimentações do item informado em --item.')
+        parser.add_argument('--limit', type=int, default=50, help='Quantidade máxima de movimentações listadas.')
+        parser.add_argument('--reconcile', action='store_true', help='Lista os itens cujo saldo difere do livro-razão.')
+        parser.add_argument('--fix', action='store_true', help='Com --reconcile, registra a diferença como ajuste.')
+
+    def handle(self, *args, **options):
+        if options['reconcile']:
+            return self.reconcile(options['fix'])
+        if options['history']:
+            if not options['item']:
+                raise CommandError('Informe o item com --item.')
+            return self.history(options['item'], options['limit'])
+
+        moment = parse_moment(options['as_of']) if options['as_of'] else None
+        items = stock.items_with_balance(moment)
+        if options['item']:
+            items = items.filter(pk=options['item'])
+        label = timezone.localtime(moment).strftime('%d/%m/%Y %H:%M') if moment else 'agora'
+        self.stdout.write(f'Saldo em {label}:')
+        for item in items:
+            balance = '-' if item.ledger_balance is None else item.ledger_balance
+            self.stdout.write(f'{item.pk:>5}  {item.nome:<40} {balance:>7}')
+
+    def history(self, item_id, limit):
+        item = Item.objects.filter(pk=item_id).first()
+        if item is None:
+            raise CommandError(f'Item {item_id} não encontrado.')
+        movements = StockMovement.objects.filter(item=item)[:limit]
+        self.stdout.write(f'{item.nome} (saldo atual: {item.quantidade if item.quantidade is not None else "-"})')
+        for movement in movements:
+            pedido = f'pedido #{movement.pedido_id}' if movement.pedido_id else ''
+            self.stdout.write(
+                f'{timezone.localtime(movement.timestamp):%d/%m/%Y %H:%M}  {movement.get_kind_display():<10} '
+                f'{movement.quantity:>+6}  saldo {movement.balance:>6}  {pedido}'
+            )
+
+    def reconcile(self, fix):
+        mismatches = stock.reconcile()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Livro-razão confere com o estoque de todos os itens.'))
+            return
+        for item in mismatches:
+            ledger = '-' if item.ledger_balance is None else item.ledger_balance
+            self.stdout.write(f'{item.pk:>5}  {item.nome:<40} estoque {item.quantidade:>6}  livro-razão {ledger:>6}')
+            if fix:
+                stock.record_count(item.pk)
+        if fix:
+            self.stdout.write(self.style.SUCCESS(f'{len(mismatches)} item(ns) ajustado(s).'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(mismatches)} item(ns) com diferença. Use --fix para registrar o ajuste.'))
@@ -1,6 +1,8 @@
-from .logs import create_log
-from .models import Log
+from .logs import audit_buffer
+from .report_cache import SINGLE_FLIGHT_RETRY_AFTER, ReportInProgress
+from django.shortcuts import render
 from django.urls import resolve
+import time
 
 class AuditLogMiddleware:
     def __init__(self, get_response):
@@ -8,16 +10,18 @@ class AuditLogMiddleware:
 
     def __call__(self, request):
         # Processa a requisição antes de chegar à view
+        started_at = time.monotonic()
         response = self.get_response(request)
+        duration_ms = int((time.monotonic() - started_at) * 1000)
         
         # Processa a resposta (após a view ter sido executada)
         # Registramos apenas se o usuário estiver autenticado
         if request.user.is_authenticated:
-            self.log_action(request, response)
+            self.log_action(request, response, duration_ms)
             
         return response
 
-    def log_action(self, request, response):
+    def log_action(self, request, response, duration_ms=None):
         # Ignora requisições para arquivos estáticos ou media, se necessário
         if request.path.startswith('/static/') or request.path.startswith('/media/'):
             return
@@ -59,19 +63,34 @@ class AuditLogMiddleware:
             status = 'FALHA'
             log_message += f" - Status Code: {status_code}"
 
-        # Verifica o último log do usuário para evitar duplicatas consecutivas
-        try:
-            last_log = Log.objects.filter(user=request.user).order_by('-timestamp').first()
-            if last_log and last_log.action == log_message and last_log.status == status:
-                # Se a ação e o status forem idênticos ao último log, não registra novamente
-                return
-        except Exception as e:
-            # Se houver erro ao verificar o último log, segue para criar o novo (melhor logar duplicado do que não logar)
-            print(f"Erro ao verificar último log: {e}")
-
-        # Cria o log
+        # Enfileira o log; a deduplicação de ações consecutivas e a gravação em
+        # lote ficam a cargo do buffer, fora do caminho crítico da requisição.
         # Usamos um try-except para garantir que o middleware não quebre a aplicação se o log falhar
         try:
-            create_log(request.user, log_message, status=status)
+            audit_buffer.enqueue(
+                request.user, log_message, status=status,
+                method=method, path=path, url_name=url_name or '',
+                status_code=status_code, duration_ms=duration_ms,
+                acting_user_id=request.session.get('original_user_id'),
+            )
         except Exception as e:
             print(f"Erro ao criar log de auditoria: {e}")
+
+class ReportInProgressMiddleware:
+    """
+    Quando o relatório pedido já está sendo calculado por outro worker
+    (ReportInProgress), responde 202 com Retry-After em vez de prender o
+    worker esperando; a página tenta de novo sozinha.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, ReportInProgress):
+            return None
+        response = render(request, 'academia/report_in_progress.html', {'retry_after': SINGLE_FLIGHT_RETRY_AFTER}, status=202)
+        response['Retry-After'] = str(SINGLE_FLIGHT_RETRY_AFTER)
+        return response
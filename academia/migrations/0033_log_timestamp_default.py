@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0032_user_actual_belt_user_actual_degree_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='log',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data e Hora'),
+        ),
+    ]
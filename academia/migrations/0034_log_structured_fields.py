@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0033_log_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='log',
+            name='acting_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='acting_logs', to=settings.AUTH_USER_MODEL, verbose_name='Conta Responsável'),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='duration_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Duração (ms)'),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='method',
+            field=models.CharField(blank=True, default='', max_length=10, verbose_name='Método'),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='Caminho'),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Código HTTP'),
+        ),
+        migrations.AddField(
+            model_name='log',
+            name='url_name',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='View'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['-timestamp'], name='log_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['user', '-timestamp'], name='log_user_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['status', '-timestamp'], name='log_status_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['url_name', '-timestamp'], name='log_url_name_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['status_code', '-timestamp'], name='log_status_code_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0034_log_structured_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='Mês')),
+                ('file_path', models.CharField(max_length=500, unique=True, verbose_name='Arquivo')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='Registros')),
+                ('first_timestamp', models.DateTimeField(blank=True, null=True, verbose_name='Primeiro Registro')),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True, verbose_name='Último Registro')),
+                ('size_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')),
+            ],
+            options={
+                'verbose_name': 'Arquivo de Logs',
+                'verbose_name_plural': 'Arquivos de Logs',
+                'ordering': ['-month', '-created_at'],
+                'indexes': [models.Index(fields=['month'], name='logarchive_month_idx')],
+            },
+        ),
+    ]
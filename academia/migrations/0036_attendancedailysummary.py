@@ -0,0 +1,87 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractWeekDay
+
+# ExtractWeekDay: 1 = domingo ... 3 = terça-feira
+TUESDAY = 3
+BATCH_SIZE = 2000
+
+
+def fill_summaries(apps, schema_editor):
+    # Mesma consolidação de academia.attendance.consolidate_attendance (por
+    # aluno, turma e data), agregada no banco e gravada em lotes.
+    AttendanceRequest = apps.get_model('academia', 'AttendanceRequest')
+    AttendanceDailySummary = apps.get_model('academia', 'AttendanceDailySummary')
+    approved = Q(status='APR')
+    rows = (
+        AttendanceRequest.objects.exclude(status='CAN')
+        .annotate(week_day=ExtractWeekDay('attendance_date'))
+        .values('student_id', 'turma_id', 'attendance_date', 'week_day')
+        .annotate(
+            apr_count=Count('id', filter=approved),
+            rej_count=Count('id', filter=Q(status='REJ')),
+            apr_both=Count('id', filter=approved & Q(class_type='BOTH')),
+            apr_gi=Count('id', filter=approved & Q(class_type='GI')),
+            apr_nogi=Count('id', filter=approved & Q(class_type='NOGI')),
+        )
+        .annotate(
+            qty=Case(
+                When(apr_count=0, then=Value(0)),
+                When(Q(week_day=TUESDAY) & (Q(apr_both__gt=0) | (Q(apr_gi__gt=0) & Q(apr_nogi__gt=0))), then=Value(2)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            final_status=Case(
+                When(apr_count__gt=0, then=Value('APR')),
+                When(rej_count__gt=0, then=Value('REJ')),
+                default=Value('PEN'),
+            ),
+        )
+        .order_by()
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(AttendanceDailySummary(
+            student_id=row['student_id'],
+            turma_id=row['turma_id'],
+            date=row['attendance_date'],
+            qty=row['qty'],
+            status=row['final_status'],
+        ))
+        if len(batch) >= BATCH_SIZE:
+            AttendanceDailySummary.objects.bulk_create(batch)
+            batch = []
+    AttendanceDailySummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0035_logarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('qty', models.PositiveSmallIntegerField(default=0, verbose_name='Aulas Creditadas')),
+                ('status', models.CharField(choices=[('PEN', 'Pendente'), ('APR', 'Aprovado'), ('REJ', 'Rejeitado'), ('CAN', 'Cancelado')], max_length=3, verbose_name='Status')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to=settings.AUTH_USER_MODEL)),
+                ('turma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='academia.turma')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Presença',
+                'verbose_name_plural': 'Resumos Diários de Presença',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['student', 'date'], name='summary_student_date_idx'), models.Index(fields=['turma', 'date'], name='summary_turma_date_idx')],
+                'unique_together': {('student', 'turma', 'date')},
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
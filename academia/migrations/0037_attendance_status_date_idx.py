@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0036_attendancedailysummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerequest',
+            index=models.Index(fields=['status', 'attendance_date', 'id'], name='attendance_status_date_idx'),
+        ),
+    ]
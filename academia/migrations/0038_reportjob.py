@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0037_attendance_status_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('presenca', 'Relatório de Presenças'), ('aluno_presenca', 'Relatório de Presenças (Aluno)'), ('pedidos', 'Relatório de Pedidos'), ('aluno_pedidos', 'Relatório de Pedidos (Aluno)'), ('graduacoes', 'Relatório de Graduações')], max_length=20, verbose_name='Relatório')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Filtros')),
+                ('status', models.CharField(choices=[('PEN', 'Na fila'), ('EXE', 'Em processamento'), ('CON', 'Concluído'), ('ERR', 'Erro')], default='PEN', max_length=3, verbose_name='Status')),
+                ('file_path', models.CharField(blank=True, max_length=500, verbose_name='Arquivo')),
+                ('filename', models.CharField(blank=True, max_length=100, verbose_name='Nome do Arquivo')),
+                ('error', models.TextField(blank=True, verbose_name='Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Solicitado em')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Exportação de Relatório',
+                'verbose_name_plural': 'Exportações de Relatórios',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx')],
+            },
+        ),
+    ]
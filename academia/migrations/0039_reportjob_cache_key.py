@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0038_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='cache_key',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Chave do Cache'),
+        ),
+        migrations.AddIndex(
+            model_name='reportjob',
+            index=models.Index(fields=['cache_key', 'status'], name='reportjob_cache_key_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0039_reportjob_cache_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Mês')),
+                ('row_count', models.PositiveIntegerField(default=0, verbose_name='Linhas')),
+                ('student_count', models.PositiveIntegerField(default=0, verbose_name='Alunos')),
+                ('credited_classes', models.PositiveIntegerField(default=0, verbose_name='Aulas Creditadas')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Gerado em')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Mensal de Presenças',
+                'verbose_name_plural': 'Snapshots Mensais de Presenças',
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceSnapshotRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attendance_date', models.DateField(verbose_name='Data da Presença')),
+                ('week_day', models.PositiveSmallIntegerField(verbose_name='Dia da Semana')),
+                ('apr_count', models.PositiveIntegerField(default=0)),
+                ('rej_count', models.PositiveIntegerField(default=0)),
+                ('apr_both', models.PositiveIntegerField(default=0)),
+                ('apr_gi', models.PositiveIntegerField(default=0)),
+                ('apr_nogi', models.PositiveIntegerField(default=0)),
+                ('first_class_type', models.CharField(max_length=4)),
+                ('apr_class_type', models.CharField(max_length=4, null=True)),
+                ('rejection_reason', models.TextField(null=True)),
+                ('qty', models.PositiveSmallIntegerField(default=0, verbose_name='Aulas Creditadas')),
+                ('final_status', models.CharField(choices=[('PEN', 'Pendente'), ('APR', 'Aprovado'), ('REJ', 'Rejeitado'), ('CAN', 'Cancelado')], max_length=3, verbose_name='Status')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='academia.attendancemonthsnapshot')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('turma', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='academia.turma')),
+            ],
+            options={
+                'verbose_name': 'Linha de Snapshot de Presenças',
+                'verbose_name_plural': 'Linhas de Snapshot de Presenças',
+                'indexes': [models.Index(fields=['turma', 'attendance_date'], name='snapshotrow_turma_date_idx'), models.Index(fields=['student', 'attendance_date'], name='snapshotrow_student_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7
+
+from django.db import migrations
+from django.db.models import F, Sum
+
+# Até aqui o estoque só era baixado na entrega. A partir desta versão o pedido
+# reserva as unidades ao ser criado (ver academia.stock), então os pedidos já
+# em aberto passam a segurar a sua reserva.
+OPEN_STATUSES = ('PEND', 'APRO')
+
+def reserve_open_orders(apps, schema_editor):
+    Item = apps.get_model('academia', 'Item')
+    Pedido = apps.get_model('academia', 'Pedido')
+    Log = apps.get_model('academia', 'Log')
+    totals = Pedido.objects.filter(status__in=OPEN_STATUSES).values('item_id').annotate(total=Sum('quantidade')).order_by()
+    for row in totals:
+        item = Item.objects.filter(pk=row['item_id']).exclude(quantidade__isnull=True).first()
+        if item is None:
+            continue
+        if item.quantidade >= row['total']:
+            Item.objects.filter(pk=item.pk).update(quantidade=F('quantidade') - row['total'])
+            continue
+        # Estoque menor que o já prometido: o saldo fica em 0 (com saldo
+        # negativo a reserva recusaria todo pedido novo) e o ajuste fica
+        # registrado no log.
+        message = (
+            f'ajuste de estoque na migração 0041: o item "{item.nome}" tinha {item.quantidade} unidade(s) '
+            f'e {row["total"]} reservada(s) em pedidos em aberto; saldo ajustado para 0 '
+            f'({row["total"] - item.quantidade} unidade(s) a repor)'
+        )
+        Item.objects.filter(pk=item.pk).update(quantidade=0)
+        Log.objects.create(user=None, action=message, status='FALHA')
+
+def release_open_orders(apps, schema_editor):
+    # Itens ajustados para 0 na ida voltam com o total reservado, não com o saldo original
+    Item = apps.get_model('academia', 'Item')
+    Pedido = apps.get_model('academia', 'Pedido')
+    totals = Pedido.objects.filter(status__in=OPEN_STATUSES).values('item_id').annotate(total=Sum('quantidade')).order_by()
+    for row in totals:
+        Item.objects.filter(pk=row['item_id']).update(quantidade=F('quantidade') + row['total'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0040_attendance_month_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(reserve_open_orders, release_open_orders),
+    ]
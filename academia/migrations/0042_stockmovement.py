@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    # Saldo de abertura do livro-razão: a quantidade atual de cada item com estoque
+    Item = apps.get_model('academia', 'Item')
+    StockMovement = apps.get_model('academia', 'StockMovement')
+    now = django.utils.timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(item_id=item_id, kind='AJU', quantity=quantidade, balance=quantidade, timestamp=now)
+        for item_id, quantidade in Item.objects.filter(quantidade__isnull=False).values_list('id', 'quantidade')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0041_reserve_open_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('RES', 'Reserva'), ('LIB', 'Liberação'), ('ENT', 'Entrega'), ('REP', 'Reposição'), ('AJU', 'Ajuste')], max_length=3, verbose_name='Tipo')),
+                ('quantity', models.IntegerField(verbose_name='Quantidade')),
+                ('balance', models.IntegerField(verbose_name='Saldo')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data e Hora')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='academia.item')),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='academia.pedido')),
+            ],
+            options={
+                'verbose_name': 'Movimentação de Estoque',
+                'verbose_name_plural': 'Movimentações de Estoque',
+                'ordering': ['-timestamp', '-id'],
+                'indexes': [models.Index(fields=['item', 'timestamp', 'id'], name='stockmovement_item_time_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
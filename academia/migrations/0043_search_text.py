@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:23
+
+import unicodedata
+from django.db import migrations, models
+
+
+def normalize(text, max_length):
+    # Cópia de academia.search.normalize da época desta migração
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(text.lower().split())[:max_length]
+
+
+def bulk_update(model, objs):
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= 2000:
+            model.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    model.objects.bulk_update(batch, ['search_text'])
+
+
+def fill_search_text(apps, schema_editor):
+    User = apps.get_model('academia', 'User')
+    Item = apps.get_model('academia', 'Item')
+    Pedido = apps.get_model('academia', 'Pedido')
+    names = {}
+    items = {}
+
+    def users():
+        for user in User.objects.only('first_name', 'last_name', 'email').iterator(chunk_size=2000):
+            names[user.pk] = f'{user.first_name} {user.last_name}'
+            user.search_text = normalize(f'{user.first_name} {user.last_name} {user.email}', 600)
+            yield user
+
+    def itens():
+        for item in Item.objects.only('nome'):
+            items[item.pk] = item.nome
+            item.search_text = normalize(item.nome, 100)
+            yield item
+
+    def pedidos():
+        for pedido in Pedido.objects.only('aluno_id', 'item_id').iterator(chunk_size=2000):
+            pedido.search_text = normalize(f'{names.get(pedido.aluno_id, "")} {items.get(pedido.item_id, "")}', 400)
+            yield pedido
+
+    bulk_update(User, users())
+    bulk_update(Item, itens())
+    bulk_update(Pedido, pedidos())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0042_stockmovement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='search_text',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100, verbose_name='Texto de Busca'),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='search_text',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=400, verbose_name='Texto de Busca'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='search_text',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=600, verbose_name='Texto de Busca'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+    ]
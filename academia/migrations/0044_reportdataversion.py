@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:42
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    # Uma linha por origem, para que bump_data_version seja um único UPDATE
+    ReportDataVersion = apps.get_model('academia', 'ReportDataVersion')
+    ReportDataVersion.objects.bulk_create(
+        [ReportDataVersion(source=source) for source in ('attendance', 'pedidos', 'graduacoes')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0043_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDataVersion',
+            fields=[
+                ('source', models.CharField(max_length=20, primary_key=True, serialize=False, verbose_name='Origem')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão dos Dados de Relatório',
+                'verbose_name_plural': 'Versões dos Dados de Relatórios',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0044_reportdataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportLock',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Nome')),
+                ('token', models.CharField(max_length=32, verbose_name='Token')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expira em')),
+            ],
+            options={
+                'verbose_name': 'Lock de Relatório',
+                'verbose_name_plural': 'Locks de Relatórios',
+            },
+        ),
+    ]
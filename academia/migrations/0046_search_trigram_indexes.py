@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:47
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academia', '0045_reportlock'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        # pg_trgm: índices GIN de trigramas atendem LIKE '%termo%' e 'termo%'
+        TrigramExtension(),
+        migrations.AlterField(
+            model_name='item',
+            name='search_text',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Texto de Busca'),
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='search_text',
+            field=models.CharField(blank=True, default='', editable=False, max_length=400, verbose_name='Texto de Busca'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='search_text',
+            field=models.CharField(blank=True, default='', editable=False, max_length=600, verbose_name='Texto de Busca'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='item_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='pedido_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_text'], name='user_search_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import time
 import os
@@ -72,10 +74,13 @@ class User(AbstractUser):
     training_start_date = models.DateField('Data de Início no Treino', null=True, blank=True)
     actual_belt = models.CharField('Faixa Atual', max_length=20, choices=BELT_CHOICES, null=True, blank=True, default='WHITE')
     actual_degree = models.IntegerField('Grau Atual', default=0, validators=[MinValueValidator(0), MaxValueValidator(6)])
+    # Nome e e-mail normalizados para a busca (ver academia.search)
+    search_text = models.CharField('Texto de Busca', max_length=600, blank=True, default='', editable=False)
     
     class Meta:
         verbose_name, verbose_name_plural = 'Usuário', 'Usuários'
         ordering = ['first_name', 'last_name']
+        indexes = [GinIndex(fields=['search_text'], name='user_search_trgm_idx', opclasses=['gin_trgm_ops'])]
     
     def save(self, *args, **kwargs):
         self.is_active = self.status == 'ATIVO'
@@ -221,10 +226,87 @@ class AttendanceRequest(models.Model):
         verbose_name, verbose_name_plural = 'Solicitação de Presença', 'Solicitações de Presença'
         ordering = ['-attendance_date']
         unique_together = ['student', 'turma', 'attendance_date', 'class_type']
+        indexes = [
+            models.Index(fields=['status', 'attendance_date', 'id'], name='attendance_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.attendance_date} - {self.get_status_display()}"
 
+class AttendanceDailySummary(models.Model):
+    """
+    Resumo diário das presenças de um aluno em uma turma, mantido a cada
+    alteração de AttendanceRequest (ver academia.attendance).
+    """
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='attendance_summaries')
+    turma = models.ForeignKey(Turma, on_delete=models.CASCADE, related_name='attendance_summaries')
+    date = models.DateField('Data')
+    qty = models.PositiveSmallIntegerField('Aulas Creditadas', default=0)
+    status = models.CharField('Status', max_length=3, choices=AttendanceRequest.STATUS_CHOICES)
+
+    class Meta:
+        verbose_name, verbose_name_plural = 'Resumo Diário de Presença', 'Resumos Diários de Presença'
+        ordering = ['-date']
+        unique_together = ['student', 'turma', 'date']
+        indexes = [
+            models.Index(fields=['student', 'date'], name='summary_student_date_idx'),
+            models.Index(fields=['turma', 'date'], name='summary_turma_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.date} - {self.qty}"
+
+class AttendanceMonthSnapshot(models.Model):
+    """
+    Presenças consolidadas de um mês já fechado, lidas pelos relatórios no
+    lugar das solicitações (ver academia.snapshots). É descartado quando uma
+    presença do mês muda e gerado de novo pelo comando freeze_report_months.
+    """
+    month = models.DateField('Mês', unique=True)
+    row_count = models.PositiveIntegerField('Linhas', default=0)
+    student_count = models.PositiveIntegerField('Alunos', default=0)
+    credited_classes = models.PositiveIntegerField('Aulas Creditadas', default=0)
+    created_at = models.DateTimeField('Gerado em', auto_now_add=True)
+
+    class Meta:
+        verbose_name, verbose_name_plural = 'Snapshot Mensal de Presenças', 'Snapshots Mensais de Presenças'
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"{self.month.strftime('%m/%Y')} - {self.row_count} linha(s)"
+
+class AttendanceSnapshotRow(models.Model):
+    """
+    Linha consolidada por (aluno, data) de um snapshot, com as mesmas colunas
+    de attendance.consolidate_attendance. Linhas sem turma consolidam todas as
+    turmas; as com turma servem ao filtro por turma.
+    """
+    snapshot = models.ForeignKey(AttendanceMonthSnapshot, on_delete=models.CASCADE, related_name='rows')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    turma = models.ForeignKey(Turma, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    attendance_date = models.DateField('Data da Presença')
+    week_day = models.PositiveSmallIntegerField('Dia da Semana')
+    apr_count = models.PositiveIntegerField(default=0)
+    rej_count = models.PositiveIntegerField(default=0)
+    apr_both = models.PositiveIntegerField(default=0)
+    apr_gi = models.PositiveIntegerField(default=0)
+    apr_nogi = models.PositiveIntegerField(default=0)
+    first_class_type = models.CharField(max_length=4)
+    apr_class_type = models.CharField(max_length=4, null=True)
+    rejection_reason = models.TextField(null=True)
+    qty = models.PositiveSmallIntegerField('Aulas Creditadas', default=0)
+    final_status = models.CharField('Status', max_length=3, choices=AttendanceRequest.STATUS_CHOICES)
+
+    class Meta:
+        verbose_name, verbose_name_plural = 'Linha de Snapshot de Presenças', 'Linhas de Snapshot de Presenças'
+        indexes = [
+            models.Index(fields=['turma', 'attendance_date'], name='snapshotrow_turma_date_idx'),
+            models.Index(fields=['student', 'attendance_date'], name='snapshotrow_student_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.attendance_date} - {self.qty}"
+
 class PlanoAula(models.Model):
     titulo = models.CharField('Título', max_length=200)
     descricao = models.TextField('Descrição')
@@ -310,6 +392,10 @@ class Item(models.Model):
     tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
     valor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     quantidade = models.IntegerField(null=True, blank=True)
+    search_text = models.CharField('Texto de Busca', max_length=100, blank=True, default='', editable=False)
+
+    class Meta:
+        indexes = [GinIndex(fields=['search_text'], name='item_search_trgm_idx', opclasses=['gin_trgm_ops'])]
 
     def __str__(self):
         return self.nome
@@ -330,33 +416,164 @@ class Pedido(models.Model):
     rejection_reason = models.TextField('Motivo da Rejeição', blank=True, null=True)
     cancellation_reason = models.TextField('Motivo do Cancelamento', blank=True, null=True)
     final_value = models.DecimalField('Valor Final', max_digits=10, decimal_places=2, null=True, blank=True)
+    # Nome do aluno e do item normalizados, para buscar sem JOIN (ver academia.search)
+    search_text = models.CharField('Texto de Busca', max_length=400, blank=True, default='', editable=False)
     
     class Meta:
         verbose_name, verbose_name_plural = 'Pedido', 'Pedidos'
         ordering = ['-data_solicitacao']
+        indexes = [GinIndex(fields=['search_text'], name='pedido_search_trgm_idx', opclasses=['gin_trgm_ops'])]
     
     def __str__(self):
         return f"{self.aluno} - {self.item.nome} - {self.get_status_display()}"
 
+class StockMovement(models.Model):
+    """
+    Movimentação de estoque (livro-razão só de inclusão), gravada por
+    academia.stock a cada alteração de Item.quantidade. `balance` é o saldo
+    disponível logo após a movimentação, o que permite saber o estoque em
+    qualquer momento com uma única consulta no índice (item, timestamp).
+    """
+    KIND_CHOICES = [
+        ('RES', 'Reserva'), ('LIB', 'Liberação'), ('ENT', 'Entrega'),
+        ('REP', 'Reposição'), ('AJU', 'Ajuste'),
+    ]
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='movements')
+    pedido = models.ForeignKey(Pedido, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    kind = models.CharField('Tipo', max_length=3, choices=KIND_CHOICES)
+    quantity = models.IntegerField('Quantidade')
+    balance = models.IntegerField('Saldo')
+    timestamp = models.DateTimeField('Data e Hora', default=timezone.now)
+
+    class Meta:
+        verbose_name, verbose_name_plural = 'Movimentação de Estoque', 'Movimentações de Estoque'
+        ordering = ['-timestamp', '-id']
+        indexes = [models.Index(fields=['item', 'timestamp', 'id'], name='stockmovement_item_time_idx')]
+
+    def __str__(self):
+        return f"{self.item} - {self.get_kind_display()} {self.quantity:+d} (saldo {self.balance})"
+
 class Log(models.Model):
     STATUS_CHOICES = [
         ('SUCESSO', 'Sucesso'),
         ('FALHA', 'Falha'),
     ]
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    acting_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='acting_logs', verbose_name='Conta Responsável')
     action = models.TextField('Ação')
-    timestamp = models.DateTimeField('Data e Hora', auto_now_add=True)
+    timestamp = models.DateTimeField('Data e Hora', default=timezone.now)
     status = models.CharField('Status', max_length=7, choices=STATUS_CHOICES, default='SUCESSO')
+    method = models.CharField('Método', max_length=10, blank=True, default='')
+    path = models.CharField('Caminho', max_length=255, blank=True, default='')
+    url_name = models.CharField('View', max_length=100, blank=True, default='')
+    status_code = models.PositiveSmallIntegerField('Código HTTP', null=True, blank=True)
+    duration_ms = models.PositiveIntegerField('Duração (ms)', null=True, blank=True)
 
     class Meta:
         verbose_name = 'Log de Ação'
         verbose_name_plural = 'Logs de Ações'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp'], name='log_timestamp_idx'),
+            models.Index(fields=['user', '-timestamp'], name='log_user_timestamp_idx'),
+            models.Index(fields=['status', '-timestamp'], name='log_status_timestamp_idx'),
+            models.Index(fields=['url_name', '-timestamp'], name='log_url_name_timestamp_idx'),
+            models.Index(fields=['status_code', '-timestamp'], name='log_status_code_timestamp_idx'),
+        ]
 
     def __str__(self):
         user_name = self.user.get_full_name() if self.user else 'Sistema'
         return f"{self.timestamp.strftime('%Y-%m-%d %H:%M:%S')} {user_name} executou {self.action}"
 
+class LogArchive(models.Model):
+    month = models.DateField('Mês')
+    file_path = models.CharField('Arquivo', max_length=500, unique=True)
+    row_count = models.PositiveIntegerField('Registros', default=0)
+    first_timestamp = models.DateTimeField('Primeiro Registro', null=True, blank=True)
+    last_timestamp = models.DateTimeField('Último Registro', null=True, blank=True)
+    size_bytes = models.PositiveBigIntegerField('Tamanho (bytes)', default=0)
+    created_at = models.DateTimeField('Arquivado em', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Arquivo de Logs'
+        verbose_name_plural = 'Arquivos de Logs'
+        ordering = ['-month', '-created_at']
+        indexes = [models.Index(fields=['month'], name='logarchive_month_idx')]
+
+    def __str__(self):
+        return f"{self.month.strftime('%m/%Y')} - {self.row_count} registro(s)"
+
+class ReportJob(models.Model):
+    """
+    Exportação de relatório em PDF gerada em segundo plano pelo comando
+    process_report_jobs. O arquivo fica em REPORT_JOBS_DIR até a limpeza.
+    """
+    STATUS_CHOICES = [('PEN', 'Na fila'), ('EXE', 'Em processamento'), ('CON', 'Concluído'), ('ERR', 'Erro')]
+    REPORT_CHOICES = [
+        ('presenca', 'Relatório de Presenças'),
+        ('aluno_presenca', 'Relatório de Presenças (Aluno)'),
+        ('pedidos', 'Relatório de Pedidos'),
+        ('aluno_pedidos', 'Relatório de Pedidos (Aluno)'),
+        ('graduacoes', 'Relatório de Graduações'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    report_type = models.CharField('Relatório', max_length=20, choices=REPORT_CHOICES)
+    params = models.JSONField('Filtros', default=dict, blank=True)
+    # Mesmo valor para pedidos com o mesmo resultado (ver report_cache.report_digest)
+    cache_key = models.CharField('Chave do Cache', max_length=64, blank=True)
+    status = models.CharField('Status', max_length=3, choices=STATUS_CHOICES, default='PEN')
+    file_path = models.CharField('Arquivo', max_length=500, blank=True)
+    filename = models.CharField('Nome do Arquivo', max_length=100, blank=True)
+    error = models.TextField('Erro', blank=True)
+    created_at = models.DateTimeField('Solicitado em', auto_now_add=True)
+    started_at = models.DateTimeField('Iniciado em', null=True, blank=True)
+    finished_at = models.DateTimeField('Concluído em', null=True, blank=True)
+
+    class Meta:
+        verbose_name, verbose_name_plural = 'Exportação de Relatório', 'Exportações de Relatórios'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reportjob_status_created_idx'),
+            models.Index(fields=['cache_key', 'status'], name='reportjob_cache_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_report_type_display()} - {self.user} - {self.get_status_display()}"
+
+class ReportDataVersion(models.Model):
+    """
+    Versão dos dados de origem dos relatórios (presenças, pedidos, graduações).
+    Incrementada na mesma transação de quem altera os dados e lida por todos os
+    workers, descarta os resultados em cache calculados com a versão anterior
+    (ver academia.report_cache).
+    """
+    source = models.CharField('Origem', max_length=20, primary_key=True)
+    version = models.PositiveBigIntegerField('Versão', default=0)
+
+    class Meta:
+        verbose_name, verbose_name_plural = 'Versão dos Dados de Relatório', 'Versões dos Dados de Relatórios'
+
+    def __str__(self):
+        return f"{self.source} v{self.version}"
+
+class ReportLock(models.Model):
+    """
+    Lock compartilhado entre os workers para gerações de relatórios (ver
+    academia.report_cache.report_lock). A chave primária garante um único
+    dono; locks vencidos são descartados por quem tenta obtê-los.
+    """
+    name = models.CharField('Nome', max_length=255, primary_key=True)
+    token = models.CharField('Token', max_length=32)
+    expires_at = models.DateTimeField('Expira em', db_index=True)
+
+    class Meta:
+        verbose_name, verbose_name_plural = 'Lock de Relatório', 'Locks de Relatórios'
+
+    def __str__(self):
+        return self.name
+
 class Graduation(models.Model):
     BELT_CHOICES = [
         ('WHITE', 'Branca'),
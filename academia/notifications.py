@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import AttendanceRequest, User
+
+# Contadores usados pelo context processor de notificações. Ficam no cache e
+# são invalidados pelos sinais de AttendanceRequest/User (ver signals.py).
+NOTIFICATION_CACHE_TIMEOUT = 60 * 60
+
+# Com LocMemCache a invalidação só limpa o cache do próprio worker; os
+# demais passam a ver a contagem nova quando ela expira, após este tempo.
+LOCAL_CACHE_TIMEOUT = 15
+
+def is_local_cache():
+    return settings.CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+def _timeout():
+    return LOCAL_CACHE_TIMEOUT if is_local_cache() else NOTIFICATION_CACHE_TIMEOUT
+
+PENDING_ATTENDANCE_KEY = 'notifications:pending_attendance'
+PENDING_USERS_KEY = 'notifications:pending_users'
+
+def approved_attendance_key(student_id):
+    return f'notifications:approved_attendance:{student_id}'
+
+def _cached_count(key, queryset):
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, _timeout())
+    return count
+
+def pending_attendance_count():
+    return _cached_count(PENDING_ATTENDANCE_KEY, AttendanceRequest.objects.filter(status='PEN'))
+
+def pending_users_count():
+    return _cached_count(PENDING_USERS_KEY, User.objects.filter(status='PENDENTE'))
+
+def approved_attendance_count(student_id):
+    return _cached_count(
+        approved_attendance_key(student_id),
+        AttendanceRequest.objects.filter(student_id=student_id, status='APR', notified=False)
+    )
+
+def _invalidate(keys):
+    # Remove já (para a própria requisição) e de novo após o commit, para que
+    # nenhuma leitura concorrente deixe no cache um valor anterior à transação.
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+def invalidate_attendance(*student_ids):
+    """
+    Invalida os contadores de presença (pendentes e aprovadas dos alunos informados).
+    Deve ser chamada após `update()`/`bulk_update()`, que não disparam sinais.
+    """
+    _invalidate([PENDING_ATTENDANCE_KEY] + [approved_attendance_key(student_id) for student_id in student_ids])
+
+def invalidate_users():
+    _invalidate([PENDING_USERS_KEY])
@@ -0,0 +1,96 @@
+import os
+from functools import lru_cache
+from io import BytesIO
+from itertools import islice
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import get_template
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.colors import HexColor
+from reportlab.lib.units import cm
+from reportlab.pdfgen.canvas import Canvas
+from xhtml2pdf import pisa
+
+# Linhas renderizadas por vez. O xhtml2pdf monta o documento inteiro em
+# memória (e fica mais lento quanto maior a tabela), então relatórios longos
+# são gerados em blocos e as partes são unidas com o pypdf.
+PDF_CHUNK_ROWS = 500
+
+# "Página X de N" é carimbado depois da união dos blocos: o <pdf:pagenumber>
+# do xhtml2pdf recomeçaria a contagem em cada bloco. Fica abaixo do rodapé
+# (@frame footer) dos templates.
+PAGE_NUMBER_Y = 0.5 * cm
+
+@lru_cache(maxsize=None)
+def _cached_template(template_name):
+    return get_template(template_name)
+
+def compiled_template(template_name):
+    """Template já compilado, reaproveitado entre os jobs do worker."""
+    if settings.DEBUG:
+        # Em desenvolvimento o template pode mudar entre um job e outro
+        return get_template(template_name)
+    return _cached_template(template_name)
+
+@lru_cache(maxsize=256)
+def resolve_uri(uri):
+    """Converte URLs de static/media em caminhos locais, sem requisições HTTP."""
+    if uri.startswith(settings.MEDIA_URL):
+        return os.path.join(settings.MEDIA_ROOT, uri[len(settings.MEDIA_URL):])
+    if uri.startswith(settings.STATIC_URL):
+        relative = uri[len(settings.STATIC_URL):]
+        return finders.find(relative) or os.path.join(settings.STATIC_ROOT, relative)
+    return uri
+
+def link_callback(uri, rel):
+    return resolve_uri(uri)
+
+def _html_to_pdf(html, dest):
+    status = pisa.CreatePDF(html, dest=dest, link_callback=link_callback)
+    if status.err:
+        raise RuntimeError(f'{status.err} erro(s) ao converter o HTML em PDF.')
+
+def _stamp_page_numbers(writer):
+    total = len(writer.pages)
+    for number, page in enumerate(writer.pages, 1):
+        width, height = float(page.mediabox.width), float(page.mediabox.height)
+        overlay = BytesIO()
+        canvas = Canvas(overlay, pagesize=(width, height))
+        canvas.setFont('Helvetica', 8)
+        canvas.setFillColor(HexColor('#999999'))
+        canvas.drawCentredString(width / 2, PAGE_NUMBER_Y, f'Página {number} de {total}')
+        canvas.save()
+        page.merge_page(PdfReader(overlay).pages[0])
+
+def write_pdf(template_name, context, dest, rows_key=None, chunk_rows=PDF_CHUNK_ROWS):
+    """
+    Renderiza o template em PDF no arquivo `dest`.
+
+    Com `rows_key`, `context[rows_key]` pode ser qualquer iterável (de
+    preferência um gerador sobre `queryset.iterator()`): o template é
+    renderizado a cada `chunk_rows` linhas, com `continuation` verdadeiro a
+    partir do segundo bloco para omitir o cabeçalho, e os PDFs parciais são
+    unidos no final. Assim a memória depende do tamanho do bloco, não do
+    relatório. Todas as páginas recebem "Página X de N" do documento inteiro.
+    """
+    template = compiled_template(template_name)
+    writer = PdfWriter()
+    if rows_key is None:
+        part = BytesIO()
+        _html_to_pdf(template.render(context), part)
+        writer.append(PdfReader(part))
+    else:
+        rows = iter(context[rows_key])
+        continuation = False
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if continuation and not chunk:
+                break
+            part = BytesIO()
+            _html_to_pdf(template.render({**context, rows_key: chunk, 'continuation': continuation}), part)
+            writer.append(PdfReader(part))
+            continuation = True
+            if len(chunk) < chunk_rows:
+                break
+    _stamp_page_numbers(writer)
+    writer.write(dest)
@@ -0,0 +1,194 @@
+from django.db.models import F, Max, Q, Sum, Value, Window
+from django.db.models.functions import Coalesce, DenseRank
+from .models import AttendanceDailySummary, PosicaoRanking, Ranking, TurmaAluno, User
+
+# Tipos calculados pela frequência; o Mini-Campeonato não depende de presenças
+ATTENDANCE_RANKING_TYPES = ('FALTAS', 'ALUNO_DESTAQUE')
+
+# Acima desta quantidade de alunos alterados de uma vez (ex.: aprovação em lote)
+# refazer todas as posições numa consulta sai mais barato que movê-los um a um
+INCREMENTAL_LIMIT = 20
+
+def is_attendance_ranking(ranking):
+    return ranking.tipo in ATTENDANCE_RANKING_TYPES
+
+def _fewer_is_better(ranking):
+    # Menos Faltas: quem tem menos faltas fica em 1º; Aluno Destaque: quem tem mais aulas
+    return ranking.tipo == 'FALTAS'
+
+def _best_first(ranking):
+    return F('pontuacao').asc() if _fewer_is_better(ranking) else F('pontuacao').desc()
+
+def _classes_given(ranking):
+    """
+    Aulas dadas no período (e na turma) do ranking: para cada data com presença
+    creditada, o maior número de aulas creditadas a um aluno nesse dia.
+    """
+    summaries = AttendanceDailySummary.objects.filter(date__gte=ranking.data_inicio, qty__gt=0)
+    if ranking.data_fim:
+        summaries = summaries.filter(date__lte=ranking.data_fim)
+    if ranking.turma_id:
+        summaries = summaries.filter(turma_id=ranking.turma_id)
+    per_day = summaries.values('date').annotate(aulas=Max('qty'))
+    return per_day.aggregate(total=Sum('aulas'))['total'] or 0
+
+def _scored_students(ranking, student_ids=None):
+    """
+    Alunos participantes do ranking anotados com a pontuação: aulas creditadas
+    no período e na turma do ranking (lidas do resumo diário) ou, no Menos
+    Faltas, as faltas (aulas dadas menos aulas creditadas).
+    """
+    students = User.objects.filter(group_role='STD', status='ATIVO')
+    summary_filter = Q(attendance_summaries__date__gte=ranking.data_inicio)
+    if ranking.data_fim:
+        summary_filter &= Q(attendance_summaries__date__lte=ranking.data_fim)
+    if ranking.turma_id:
+        students = students.filter(id__in=TurmaAluno.objects.filter(turma_id=ranking.turma_id, status='APRO').values('aluno_id'))
+        summary_filter &= Q(attendance_summaries__turma_id=ranking.turma_id)
+    if student_ids is not None:
+        students = students.filter(id__in=student_ids)
+
+    credited = Coalesce(Sum('attendance_summaries__qty', filter=summary_filter), 0)
+    if ranking.tipo == 'FALTAS':
+        return students.annotate(pontuacao=Value(_classes_given(ranking)) - credited)
+    return students.annotate(pontuacao=credited)
+
+def _rerank(ranking):
+    """Refaz todas as posições (dense rank sobre as pontuações já gravadas)."""
+    ranked = ranking.posicoes.annotate(
+        nova_posicao=Window(DenseRank(), order_by=_best_first(ranking))
+    )
+    changed = []
+    for posicao in ranked:
+        if posicao.posicao != posicao.nova_posicao:
+            posicao.posicao = posicao.nova_posicao
+            changed.append(posicao)
+    if changed:
+        PosicaoRanking.objects.bulk_update(changed, ['posicao'], batch_size=500)
+
+def _move(ranking, pk, old_score, new_score):
+    """
+    Ajusta as posições dos demais quando a pontuação de um aluno passa de
+    old_score para new_score (None: entrou ou saiu do ranking) e retorna a
+    posição dele. No dense rank só muda de posição quem está entre as duas
+    pontuações, e só se a antiga deixou de existir ou a nova passou a existir.
+    """
+    ahead, behind = ('lt', 'gt') if _fewer_is_better(ranking) else ('gt', 'lt')
+    others = ranking.posicoes.exclude(pk=pk) if pk else ranking.posicoes.all()
+    old_removed = old_score is not None and not others.filter(pontuacao=old_score).exists()
+    new_added = new_score is not None and not others.filter(pontuacao=new_score).exists()
+
+    if old_score != new_score:
+        behind_old = Q(**{f'pontuacao__{behind}': old_score}) if old_removed else None
+        behind_new = Q(**{f'pontuacao__{behind}': new_score}) if new_added else None
+        if behind_new is not None:
+            others.filter(behind_new & ~behind_old if behind_old is not None else behind_new).update(posicao=F('posicao') + 1)
+        if behind_old is not None:
+            others.filter(behind_old & ~behind_new if behind_new is not None else behind_old).update(posicao=F('posicao') - 1)
+
+    if new_score is None:
+        return None
+    return others.filter(**{f'pontuacao__{ahead}': new_score}).values('pontuacao').distinct().count() + 1
+
+def compute_ranking(ranking):
+    """
+    Calcula do zero as posições de um ranking por frequência. Posições e
+    pontuações vêm de uma única consulta com DENSE_RANK; a gravação é feita
+    com bulk_create/bulk_update e remove quem deixou de participar.
+    """
+    if not is_attendance_ranking(ranking):
+        return 0
+
+    rows = _scored_students(ranking).annotate(
+        posicao=Window(DenseRank(), order_by=_best_first(ranking))
+    ).values_list('id', 'pontuacao', 'posicao')
+
+    existing = {posicao.aluno_id: posicao for posicao in ranking.posicoes.all()}
+    to_create, to_update = [], []
+    for aluno_id, pontuacao, numero in rows:
+        posicao = existing.pop(aluno_id, None)
+        if posicao is None:
+            to_create.append(PosicaoRanking(ranking=ranking, aluno_id=aluno_id, posicao=numero, pontuacao=pontuacao))
+        elif (posicao.posicao, posicao.pontuacao) != (numero, pontuacao):
+            posicao.posicao, posicao.pontuacao = numero, pontuacao
+            to_update.append(posicao)
+
+    if existing:
+        PosicaoRanking.objects.filter(pk__in=[posicao.pk for posicao in existing.values()]).delete()
+    if to_create:
+        PosicaoRanking.objects.bulk_create(to_create, batch_size=500)
+    if to_update:
+        PosicaoRanking.objects.bulk_update(to_update, ['posicao', 'pontuacao'], batch_size=500)
+    return len(to_create) + len(to_update)
+
+def update_rankings_for_attendance(keys):
+    """
+    Atualização incremental: recebe as chaves (aluno, turma, data) cujo resumo
+    diário mudou, recalcula apenas a pontuação desses alunos nos rankings
+    ativos afetados e move só as posições entre a pontuação antiga e a nova.
+    No Menos Faltas as aulas dadas, e com elas as faltas de todos, podem ter
+    mudado; esse ranking é recalculado por inteiro.
+    """
+    if not keys:
+        return
+    dates = [key[2] for key in keys]
+    turma_ids = {key[1] for key in keys}
+
+    rankings = Ranking.objects.filter(
+        ativo=True,
+        tipo__in=ATTENDANCE_RANKING_TYPES,
+        data_inicio__lte=max(dates),
+    ).filter(
+        Q(data_fim__isnull=True) | Q(data_fim__gte=min(dates))
+    ).filter(
+        Q(turma__isnull=True) | Q(turma_id__in=turma_ids)
+    )
+
+    for ranking in rankings:
+        student_ids = {
+            student_id for student_id, turma_id, date in keys
+            if date >= ranking.data_inicio
+            and (ranking.data_fim is None or date <= ranking.data_fim)
+            and (ranking.turma_id is None or turma_id == ranking.turma_id)
+        }
+        if not student_ids:
+            continue
+        if ranking.tipo == 'FALTAS':
+            compute_ranking(ranking)
+            continue
+
+        scores = dict(_scored_students(ranking, student_ids).values_list('id', 'pontuacao'))
+        existing = {posicao.aluno_id: posicao for posicao in ranking.posicoes.filter(aluno_id__in=student_ids)}
+        # Restantes em existing depois do laço não participam mais (inativos ou fora da turma)
+        changes = []
+        for aluno_id, pontuacao in scores.items():
+            posicao = existing.pop(aluno_id, None)
+            if posicao is None or posicao.pontuacao != pontuacao:
+                changes.append((aluno_id, posicao, pontuacao))
+        removed = list(existing.values())
+
+        if len(changes) + len(removed) > INCREMENTAL_LIMIT:
+            PosicaoRanking.objects.filter(pk__in=[posicao.pk for posicao in removed]).delete()
+            PosicaoRanking.objects.bulk_create([
+                PosicaoRanking(ranking=ranking, aluno_id=aluno_id, posicao=0, pontuacao=pontuacao)
+                for aluno_id, posicao, pontuacao in changes if posicao is None
+            ])
+            to_update = [posicao for aluno_id, posicao, pontuacao in changes if posicao is not None]
+            for posicao in to_update:
+                posicao.pontuacao = scores[posicao.aluno_id]
+            PosicaoRanking.objects.bulk_update(to_update, ['pontuacao'])
+            _rerank(ranking)
+            continue
+
+        for posicao in removed:
+            posicao.delete()
+            _move(ranking, None, posicao.pontuacao, None)
+        for aluno_id, posicao, pontuacao in changes:
+            if posicao is None:
+                posicao = PosicaoRanking.objects.create(ranking=ranking, aluno_id=aluno_id, posicao=0, pontuacao=pontuacao)
+                old_score = None
+            else:
+                old_score = posicao.pontuacao
+            posicao.posicao = _move(ranking, posicao.pk, old_score, pontuacao)
+            posicao.pontuacao = pontuacao
+            posicao.save(update_fields=['posicao', 'pontuacao'])
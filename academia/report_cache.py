@@ -0,0 +1,139 @@
+import datetime
+import hashlib
+import json
+import threading
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import ReportDataVersion, ReportLock
+from .notifications import is_local_cache
+
+# Cache dos relatórios. A chave de cada resultado inclui o tipo do relatório,
+# os filtros normalizados e a versão atual das tabelas de origem. A versão
+# fica no banco (ReportDataVersion), não no cache: os sinais (ver signals.py)
+# a incrementam após o commit de quem altera presenças, pedidos ou graduações,
+# e todos os workers passam a ignorar os resultados antigos, mesmo com um
+# cache por processo.
+# Altere REPORT_CACHE_VERSION ao mudar o formato do que é guardado.
+REPORT_CACHE_VERSION = 1
+
+# Single-flight: enquanto um worker calcula um resultado, os pedidos idênticos
+# não calculam de novo nem ficam presos esperando: recebem um 202 com
+# Retry-After e buscam o resultado do cache ao repetir. O lock fica no banco
+# (ReportLock) e só é usado com um cache compartilhado (ver CACHES).
+SINGLE_FLIGHT_TIMEOUT = 60
+SINGLE_FLIGHT_RETRY_AFTER = 2
+
+# Tabelas de origem de cada relatório
+REPORT_SOURCES = {
+    'presenca': ('attendance',),
+    'aluno_presenca': ('attendance',),
+    'pedidos': ('pedidos',),
+    'aluno_pedidos': ('pedidos',),
+    'graduacoes': ('graduacoes',),
+}
+
+# Origens alteradas na transação em andamento, por thread (ver bump_data_version)
+_pending_sources = threading.local()
+
+def data_versions(sources):
+    versions = dict(ReportDataVersion.objects.filter(source__in=sources).values_list('source', 'version'))
+    return [versions.get(source, 0) for source in sources]
+
+def bump_data_version(*sources):
+    """
+    Invalida os relatórios que dependem das tabelas informadas. Deve ser
+    chamada após `update()`/`bulk_update()`, que não disparam sinais.
+
+    O incremento só acontece depois do commit de quem alterou os dados, num
+    UPDATE próprio: a linha da versão não fica travada durante a transação
+    do escritor, e várias chamadas na mesma transação viram um incremento só.
+    """
+    _pending_sources.__dict__.setdefault('sources', set()).update(sources)
+    transaction.on_commit(_apply_pending_versions)
+
+def _apply_pending_versions():
+    # O primeiro callback após o commit grava todas as origens pendentes; os
+    # demais não encontram nada. Origens de uma transação desfeita ficam para
+    # o próximo commit (um incremento a mais só descarta cache).
+    sources = _pending_sources.__dict__.pop('sources', None)
+    if not sources:
+        return
+    versions = ReportDataVersion.objects.filter(source__in=sources)
+    if versions.update(version=F('version') + 1) < len(sources):
+        # Primeira alteração de alguma origem: cria as linhas que faltam e
+        # incrementa de novo (um incremento a mais não faz diferença)
+        ReportDataVersion.objects.bulk_create([ReportDataVersion(source=source) for source in sources], ignore_conflicts=True)
+        versions.update(version=F('version') + 1)
+
+def report_digest(report_type, filters, owner_id=None):
+    """Identifica o resultado do relatório: tipo, dono, filtros e versão dos dados."""
+    payload = json.dumps(
+        [REPORT_CACHE_VERSION, report_type, owner_id, filters, data_versions(REPORT_SOURCES[report_type])],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def result_key(digest, variant):
+    return f'reports:result:{digest}:{variant}'
+
+def lock_key(name):
+    return f'reports:lock:{name}'
+
+@contextmanager
+def report_lock(name, timeout=SINGLE_FLIGHT_TIMEOUT):
+    """
+    Lock não bloqueante no banco: devolve True para quem o obteve e False se
+    outro processo já o detém. Expira sozinho após `timeout` segundos. Deve
+    ser obtido fora de transação, para que os outros workers o vejam.
+    """
+    key = lock_key(name)
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    ReportLock.objects.filter(name=key, expires_at__lte=now).delete()
+    try:
+        with transaction.atomic():
+            ReportLock.objects.create(name=key, token=token, expires_at=now + datetime.timedelta(seconds=timeout))
+        acquired = True
+    except IntegrityError:
+        acquired = False
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            ReportLock.objects.filter(name=key, token=token).delete()
+
+class ReportInProgress(Exception):
+    """Outro worker está calculando o mesmo resultado; o cliente deve tentar de novo."""
+
+@contextmanager
+def single_flight(key):
+    """
+    Devolve o valor de `key` no cache. Se ainda não existir, devolve None e
+    mantém o lock até o fim do bloco, onde quem chamou calcula e grava. Se
+    outro worker já o estiver calculando, levanta ReportInProgress em vez de
+    esperar (ver ReportInProgressMiddleware). Com um cache por processo os
+    outros workers não veriam o resultado, e o lock é dispensado.
+    """
+    value = cache.get(key)
+    if value is not None or is_local_cache():
+        yield value
+        return
+    with report_lock(key) as acquired:
+        if not acquired:
+            raise ReportInProgress(key)
+        # Pode ter sido gravado entre a leitura e o lock
+        yield cache.get(key)
+
+def cached_result(digest, variant, compute):
+    key = result_key(digest, variant)
+    with single_flight(key) as value:
+        if value is None:
+            value = compute()
+            cache.set(key, value, settings.REPORT_CACHE_TIMEOUT)
+    return value
@@ -0,0 +1,271 @@
+import datetime
+import os
+import shutil
+from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.utils import timezone
+from .attendance import describe_consolidated, get_student_stats, order_consolidated
+from .logs import create_log
+from .models import Graduation, Pedido, ReportJob
+from .pdf import write_pdf
+from .report_cache import cached_result, report_digest, report_lock
+from .snapshots import attendance_consolidated
+
+# Parâmetros da querystring que não alteram o conteúdo do relatório
+NON_FILTER_PARAMS = ('export', 'page', 'items_per_page')
+
+def report_params(query_dict):
+    """Filtros do relatório a partir do request.GET, sem paginação/exportação."""
+    return {key: value for key, value in query_dict.items() if key not in NON_FILTER_PARAMS and value != ''}
+
+def parse_period(params):
+    """Período do relatório; sem filtros, do primeiro dia do mês até hoje."""
+    today = datetime.date.today()
+    start_date_str = params.get('start_date')
+    end_date_str = params.get('end_date')
+    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today.replace(day=1)
+    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else today
+    return start_date, end_date
+
+# Filtros que alteram o conteúdo de cada relatório, com o valor padrão (o período é tratado à parte)
+REPORT_FILTERS = {
+    'presenca': {'turma': None, 'aluno': None, 'order': 'desc'},
+    'aluno_presenca': {'order': 'desc'},
+    'pedidos': {'group_by_aluno': None},
+    'aluno_pedidos': {},
+    'graduacoes': {'belt': None, 'student': None, 'start_date': None, 'end_date': None},
+}
+
+# Relatórios do próprio aluno: o resultado no cache é separado por usuário
+PER_USER_REPORTS = ('aluno_presenca', 'aluno_pedidos')
+
+def report_filters(report_type, params):
+    """Filtros normalizados do relatório, com o período já resolvido."""
+    params = report_params(params)
+    filters = {key: params.get(key, default) for key, default in REPORT_FILTERS[report_type].items()}
+    if report_type != 'graduacoes':
+        start_date, end_date = parse_period(params)
+        filters.update(start_date=start_date.isoformat(), end_date=end_date.isoformat())
+    return filters
+
+def report_cache_digest(report_type, params, user):
+    owner_id = user.pk if report_type in PER_USER_REPORTS else None
+    return report_digest(report_type, report_filters(report_type, params), owner_id)
+
+def cached_page(digest, object_list, per_page, number, transform=list):
+    """
+    Página do relatório com o total e as linhas vindos do cache; `object_list`
+    (normalmente um queryset) só é consultado quando a página não está lá.
+    """
+    paginator = Paginator(object_list, per_page)
+    paginator.count = cached_result(digest, 'count', lambda: paginator.count)
+    try:
+        page = paginator.page(number)
+    except PageNotAnInteger:
+        page = paginator.page(1)
+    except EmptyPage:
+        page = paginator.page(paginator.num_pages)
+    page.object_list = cached_result(digest, f'page:{per_page}:{page.number}', lambda: transform(page.object_list))
+    return page
+
+def _int_param(params, key):
+    value = params.get(key)
+    return int(value) if value and str(value).isdigit() else None
+
+# --- DADOS DOS RELATÓRIOS ---
+
+def presenca_data(params):
+    """Presenças consolidadas de todos os alunos (relatório do professor); meses fechados vêm dos snapshots."""
+    start_date, end_date = parse_period(params)
+    turma_id = _int_param(params, 'turma')
+    aluno_id = _int_param(params, 'aluno')
+    order = params.get('order', 'desc')
+
+    return {
+        'consolidated': order_consolidated(attendance_consolidated(start_date, end_date, turma_id, aluno_id), order),
+        'start_date': start_date,
+        'end_date': end_date,
+        'turma_id': turma_id,
+        'aluno_id': aluno_id,
+        'order': order,
+    }
+
+def aluno_presenca_data(user, params):
+    """Presenças consolidadas do próprio aluno."""
+    start_date, end_date = parse_period(params)
+    order = params.get('order', 'desc')
+
+    return {
+        'consolidated': order_consolidated(attendance_consolidated(start_date, end_date, student_id=user.pk), order, by_student=False),
+        'start_date': start_date,
+        'end_date': end_date,
+        'order': order,
+    }
+
+def pedidos_data(params):
+    """Pedidos de todos os alunos no período (relatório do professor)."""
+    start_date, end_date = parse_period(params)
+    pedidos = Pedido.objects.filter(
+        data_solicitacao__date__range=[start_date, end_date]
+    ).order_by('data_solicitacao', 'aluno__first_name', 'aluno__last_name').select_related('aluno', 'item')
+    return {'pedidos': pedidos, 'start_date': start_date, 'end_date': end_date}
+
+def aluno_pedidos_data(user, params):
+    """Pedidos do próprio aluno no período."""
+    start_date, end_date = parse_period(params)
+    pedidos = Pedido.objects.filter(
+        aluno=user,
+        data_solicitacao__date__range=[start_date, end_date]
+    ).order_by('-data_solicitacao').select_related('item')
+    return {'pedidos': pedidos, 'start_date': start_date, 'end_date': end_date}
+
+def graduacoes_data(params):
+    """Graduações filtradas por faixa, aluno e período."""
+    graduations = Graduation.objects.all().select_related('student').order_by('-date')
+    if params.get('belt'):
+        graduations = graduations.filter(belt=params['belt'])
+    if params.get('student'):
+        graduations = graduations.filter(student__id=params['student'])
+    if params.get('start_date'):
+        graduations = graduations.filter(date__gte=params['start_date'])
+    if params.get('end_date'):
+        graduations = graduations.filter(date__lte=params['end_date'])
+    return {'graduations': graduations}
+
+# --- PDF ---
+
+def _presenca_pdf(user, params):
+    data = presenca_data(params)
+    return {
+        'report_data': (describe_consolidated(row) for row in data['consolidated'].iterator(chunk_size=2000)),
+        'report_title': 'Relatório de Presenças',
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+    }
+
+def _aluno_presenca_pdf(user, params):
+    data = aluno_presenca_data(user, params)
+    return {
+        'report_data': (describe_consolidated(row) for row in data['consolidated'].iterator(chunk_size=2000)),
+        'report_title': 'Relatório de Presenças',
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'user': user,
+        'stats': get_student_stats(user, data['start_date'], data['end_date']),
+    }
+
+def _pedidos_pdf(user, params):
+    data = pedidos_data(params)
+    return {
+        'pedidos': data['pedidos'].iterator(chunk_size=2000),
+        'report_title': 'Relatório de Pedidos',
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'grouped': False,
+    }
+
+def _aluno_pedidos_pdf(user, params):
+    data = aluno_pedidos_data(user, params)
+    return {
+        'pedidos': data['pedidos'].iterator(chunk_size=2000),
+        'report_title': 'Relatório de pedidos',
+        'start_date': data['start_date'],
+        'end_date': data['end_date'],
+        'user': user,
+    }
+
+def _graduacoes_pdf(user, params):
+    return {
+        'graduations': graduacoes_data(params)['graduations'].iterator(chunk_size=2000),
+        'report_title': 'Relatório de Graduações',
+        'user': user,
+    }
+
+# Um PDF preso além disso é abandonado (mesmo limite de process_report_jobs.STALE_JOB_MINUTES)
+PDF_LOCK_TIMEOUT = 30 * 60
+
+# tipo -> (template, montagem do contexto, linhas renderizadas em blocos, nome do arquivo, texto do log)
+PDF_REPORTS = {
+    'presenca': ('academia/professor/relatorio_presenca_pdf.html', _presenca_pdf, 'report_data', 'relatorio_presencas.pdf', 'exportou relatório de presenças (PDF)'),
+    'aluno_presenca': ('academia/aluno/relatorio_presenca_pdf.html', _aluno_presenca_pdf, 'report_data', 'relatorio_presencas.pdf', 'exportou relatório de presenças (PDF)'),
+    'pedidos': ('academia/professor/relatorio_pedidos_pdf.html', _pedidos_pdf, 'pedidos', 'relatorio_pedidos.pdf', 'exportou relatório de pedidos (PDF)'),
+    'aluno_pedidos': ('academia/aluno/relatorio_pedidos_pdf.html', _aluno_pedidos_pdf, 'pedidos', 'relatorio_pedidos.pdf', 'exportou relatório de pedidos (PDF)'),
+    'graduacoes': ('academia/professor/graduations_report_pdf.html', _graduacoes_pdf, 'graduations', 'relatorio_graduacoes.pdf', 'exportou relatório de graduações (PDF)'),
+}
+
+def reuse_report_file(job):
+    """
+    Conclui o job com a cópia de um PDF já gerado para o mesmo resultado
+    (mesmo cache_key), se o arquivo ainda existir. Devolve True se reaproveitou.
+    """
+    if not job.cache_key:
+        return False
+    done = (
+        ReportJob.objects.filter(cache_key=job.cache_key, status='CON')
+        .exclude(pk=job.pk)
+        .order_by('-finished_at')
+        .first()
+    )
+    if done is None or not os.path.exists(done.file_path):
+        return False
+
+    path = os.path.join(settings.REPORT_JOBS_DIR, f'{job.pk}-{done.filename}')
+    shutil.copyfile(done.file_path, path)
+    job.status = 'CON'
+    job.file_path = path
+    job.filename = done.filename
+    job.started_at = job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'file_path', 'filename', 'started_at', 'finished_at'])
+    create_log(job.user, PDF_REPORTS[job.report_type][4])
+    return True
+
+def run_report_job(job):
+    """
+    Gera o PDF de um ReportJob já marcado como em processamento e grava o
+    resultado em REPORT_JOBS_DIR. Falhas ficam registradas no próprio job.
+    """
+    template_name, build_context, rows_key, filename, log_action = PDF_REPORTS[job.report_type]
+    os.makedirs(settings.REPORT_JOBS_DIR, exist_ok=True)
+    path = os.path.join(settings.REPORT_JOBS_DIR, f'{job.pk}-{filename}')
+    tmp_path = f'{path}.tmp'
+
+    try:
+        with open(tmp_path, 'wb') as pdf_file:
+            write_pdf(template_name, build_context(job.user, job.params), pdf_file, rows_key)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        job.status = 'ERR'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        create_log(job.user, log_action, status='FALHA')
+        return job
+
+    job.status = 'CON'
+    job.file_path = path
+    job.filename = filename
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'file_path', 'filename', 'finished_at'])
+    create_log(job.user, log_action)
+    return job
+
+def process_report_job(job):
+    """
+    Processa um job reservado pelo worker. Jobs com o mesmo cache_key são
+    coalescidos: só um gera o PDF (lock no banco, válido entre workers) e os
+    demais voltam para a fila e depois copiam o arquivo pronto.
+    """
+    if not job.cache_key:
+        return run_report_job(job)
+
+    with report_lock(f'pdf:{job.cache_key}', PDF_LOCK_TIMEOUT) as acquired:
+        if not acquired:
+            job.status = 'PEN'
+            job.started_at = None
+            job.save(update_fields=['status', 'started_at'])
+            return job
+        if reuse_report_file(job):
+            return job
+        return run_report_job(job)
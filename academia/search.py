@@ -0,0 +1,76 @@
+import unicodedata
+from django.db.models import Case, IntegerField, Value, When
+from .models import Item, Pedido, User
+
+# Busca das listagens: cada modelo pesquisável guarda em `search_text` o texto
+# já normalizado (sem acento, minúsculo, espaços simples), mantido pelos sinais
+# em signals.py. A busca compara a consulta normalizada da mesma forma com essa
+# única coluna, sem LOWER() linha a linha nem JOINs: "joao" encontra "João" e
+# os pedidos são encontrados pelo nome do aluno ou do item. No PostgreSQL a
+# coluna tem um índice GIN de trigramas (pg_trgm), que atende o LIKE '%termo%'
+# do filtro e o 'termo%' da relevância sem percorrer a tabela.
+
+def normalize(text, max_length=None):
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = ' '.join(text.lower().split())
+    return text[:max_length] if max_length else text
+
+def _max_length(model):
+    return model._meta.get_field('search_text').max_length
+
+def user_text(user):
+    return normalize(f'{user.first_name} {user.last_name} {user.email}', _max_length(User))
+
+def item_text(item):
+    return normalize(item.nome, _max_length(Item))
+
+def pedido_text(pedido):
+    aluno, item = pedido.aluno, pedido.item
+    return normalize(f'{aluno.first_name} {aluno.last_name} {item.nome}', _max_length(Pedido))
+
+# Campos que compõem o texto de busca de cada modelo
+SOURCE_FIELDS = {
+    User: {'first_name', 'last_name', 'email'},
+    Item: {'nome'},
+    Pedido: {'aluno', 'item'},
+}
+
+def text_for(instance):
+    if isinstance(instance, User):
+        return user_text(instance)
+    if isinstance(instance, Item):
+        return item_text(instance)
+    return pedido_text(instance)
+
+def search(queryset, query):
+    """
+    Filtra `queryset` pelos termos de `query` (todos precisam aparecer) e ordena
+    pela relevância: texto que começa com a consulta, depois termo no início de
+    uma palavra, depois o restante. A ordenação original desempata.
+    """
+    query = normalize(query)
+    if not query:
+        return queryset
+    for term in query.split():
+        queryset = queryset.filter(search_text__contains=term)
+    first_term = query.split()[0]
+    rank = Case(
+        When(search_text__startswith=query, then=Value(0)),
+        When(search_text__startswith=first_term, then=Value(1)),
+        When(search_text__contains=f' {first_term}', then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    return queryset.annotate(search_rank=rank).order_by('search_rank', *queryset.query.order_by)
+
+def refresh_orders(pedidos):
+    """Regrava o texto de busca dos pedidos informados (após renomear aluno ou item)."""
+    changed = []
+    for pedido in pedidos.select_related('aluno', 'item').iterator(chunk_size=2000):
+        text = pedido_text(pedido)
+        if text != pedido.search_text:
+            pedido.search_text = text
+            changed.append(pedido)
+    Pedido.objects.bulk_update(changed, ['search_text'], batch_size=500)
+    return len(changed)
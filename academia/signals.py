@@ -0,0 +1,71 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from . import notifications, search
+from .accounts import invalidate_account_snapshot
+from .attendance import refresh_daily_summary
+from .models import AttendanceRequest, Graduation, Item, Pedido, User
+from .report_cache import bump_data_version
+from .snapshots import discard_snapshots
+
+@receiver([post_save, post_delete], sender=AttendanceRequest)
+def attendance_request_changed(sender, instance, **kwargs):
+    notifications.invalidate_attendance(instance.student_id)
+    refresh_daily_summary(instance.student_id, instance.turma_id, instance.attendance_date)
+    discard_snapshots([instance.attendance_date])
+    bump_data_version('attendance')
+
+@receiver([post_save, post_delete], sender=Pedido)
+@receiver([post_save, post_delete], sender=Item)
+def pedido_changed(sender, instance, **kwargs):
+    bump_data_version('pedidos')
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Item)
+@receiver(pre_save, sender=Pedido)
+def fill_search_text(sender, instance, update_fields=None, **kwargs):
+    instance._search_text_changed = instance._search_text_pending = False
+    # Saves parciais que não tocam nos campos do texto (status, last_login)
+    # não precisam recalculá-lo nem carregar aluno e item do pedido
+    if update_fields is not None and not set(update_fields) & (search.SOURCE_FIELDS[sender] | {'search_text'}):
+        return
+    text = search.text_for(instance)
+    changed = text != instance.search_text
+    instance.search_text = text
+    # update_fields sem search_text: o texto novo é gravado no post_save
+    instance._search_text_pending = changed and update_fields is not None and 'search_text' not in update_fields
+    # Nome alterado: os pedidos guardam uma cópia dele no texto de busca
+    instance._search_text_changed = changed and instance.pk is not None and sender is not Pedido
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Item)
+@receiver(post_save, sender=Pedido)
+def save_search_text(sender, instance, **kwargs):
+    if getattr(instance, '_search_text_pending', False):
+        instance._search_text_pending = False
+        sender.objects.filter(pk=instance.pk).update(search_text=instance.search_text)
+    if getattr(instance, '_search_text_changed', False):
+        instance._search_text_changed = False
+        search.refresh_orders(instance.pedidos.all())
+
+@receiver([post_save, post_delete], sender=Graduation)
+def graduation_changed(sender, instance, **kwargs):
+    bump_data_version('graduacoes')
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    # Guarda o responsável original para invalidar também o snapshot antigo
+    # quando o dependente troca de responsável.
+    instance._loaded_responsible_id = instance.responsible_id
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # O login só atualiza last_login; não altera contagens nem snapshots.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    notifications.invalidate_users()
+    invalidate_account_snapshot(
+        instance.pk,
+        instance.responsible_id,
+        getattr(instance, '_loaded_responsible_id', None),
+    )
+    instance._loaded_responsible_id = instance.responsible_id
@@ -0,0 +1,156 @@
+import datetime
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .attendance import consolidate_attendance
+from .models import AttendanceMonthSnapshot, AttendanceRequest, AttendanceSnapshotRow
+
+# Snapshots mensais: as presenças de um mês fechado raramente mudam, então
+# freeze_month grava a consolidação do mês uma vez e os relatórios leem dali,
+# calculando na hora apenas os meses sem snapshot (o mês corrente, em geral).
+# Uma alteração tardia numa presença descarta o snapshot do mês
+# (discard_snapshots) até ele ser gerado de novo.
+
+# freeze_month e discard_snapshots do mesmo mês não podem se intercalar: uma
+# alteração feita durante o congelamento não seria vista por ele, e o descarte
+# não encontraria o snapshot ainda não gravado. Os dois travam o mês até o fim
+# da transação (advisory lock do PostgreSQL, neste namespace).
+SNAPSHOT_LOCK_NAMESPACE = 21
+
+# Colunas de consolidate_attendance guardadas em AttendanceSnapshotRow
+SNAPSHOT_COLUMNS = (
+    'week_day', 'apr_count', 'rej_count', 'apr_both', 'apr_gi', 'apr_nogi',
+    'first_class_type', 'apr_class_type', 'rejection_reason', 'qty', 'final_status',
+)
+ROW_COLUMNS = ('student_id', 'attendance_date', 'student__first_name', 'student__last_name')
+
+def month_end(month):
+    next_month = (month.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return next_month - datetime.timedelta(days=1)
+
+def months_between(start_date, end_date):
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        yield month
+        month = month_end(month) + datetime.timedelta(days=1)
+
+def current_month():
+    return timezone.localdate().replace(day=1)
+
+def month_ranges(months):
+    """Agrupa meses consecutivos em intervalos (início, fim) de datas."""
+    ranges = []
+    for month in sorted(months):
+        if ranges and ranges[-1][1] + datetime.timedelta(days=1) == month:
+            ranges[-1][1] = month_end(month)
+        else:
+            ranges.append([month, month_end(month)])
+    return [tuple(r) for r in ranges]
+
+def lock_months(months):
+    """
+    Trava os meses até o fim da transação em andamento. No SQLite as escritas
+    já são serializadas pelo próprio banco.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        # Sempre na mesma ordem, para duas transações não se travarem mutuamente
+        for month in sorted(months):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [SNAPSHOT_LOCK_NAMESPACE, month.year * 100 + month.month])
+
+def months_to_freeze():
+    """Meses fechados que têm presenças e ainda não têm snapshot."""
+    frozen = set(AttendanceMonthSnapshot.objects.values_list('month', flat=True))
+    months = AttendanceRequest.objects.filter(attendance_date__lt=current_month()).dates('attendance_date', 'month')
+    return [month for month in months if month not in frozen]
+
+def freeze_month(month, batch_size=2000):
+    """(Re)gera o snapshot de um mês fechado e devolve o AttendanceMonthSnapshot."""
+    month = month.replace(day=1)
+    requests = AttendanceRequest.objects.filter(attendance_date__range=[month, month_end(month)]).exclude(status='CAN')
+
+    with transaction.atomic():
+        # Antes de ler: espera quem está alterando presenças do mês terminar
+        lock_months([month])
+        AttendanceMonthSnapshot.objects.filter(month=month).delete()
+        snapshot = AttendanceMonthSnapshot.objects.create(month=month)
+        for by_turma in (False, True):
+            batch = []
+            for row in consolidate_attendance(requests, by_turma=by_turma).order_by().iterator(chunk_size=batch_size):
+                batch.append(AttendanceSnapshotRow(
+                    snapshot=snapshot,
+                    student_id=row['student_id'],
+                    turma_id=row['turma_id'] if by_turma else None,
+                    attendance_date=row['attendance_date'],
+                    **{column: row[column] for column in SNAPSHOT_COLUMNS},
+                ))
+                if len(batch) >= batch_size:
+                    AttendanceSnapshotRow.objects.bulk_create(batch)
+                    batch = []
+            if batch:
+                AttendanceSnapshotRow.objects.bulk_create(batch)
+
+        totals = snapshot.rows.filter(turma__isnull=True).aggregate(
+            row_count=Count('id'),
+            student_count=Count('student', distinct=True),
+            credited_classes=Coalesce(Sum('qty'), 0),
+        )
+        for field, value in totals.items():
+            setattr(snapshot, field, value)
+        snapshot.save(update_fields=list(totals))
+    return snapshot
+
+def freeze_closed_months():
+    """Gera os snapshots que faltam; chamado na virada do mês pelo worker."""
+    return [freeze_month(month) for month in months_to_freeze()]
+
+def discard_snapshots(dates):
+    """
+    Descarta os snapshots dos meses das datas informadas (presenças alteradas).
+    Deve rodar na transação de quem alterou: o mês fica travado até o commit,
+    e um congelamento em andamento termina antes do descarte.
+    """
+    open_month = current_month()
+    months = {date.replace(day=1) for date in dates if date < open_month}
+    if months:
+        with transaction.atomic():
+            lock_months(months)
+            AttendanceMonthSnapshot.objects.filter(month__in=months).delete()
+
+def attendance_consolidated(start_date, end_date, turma_id=None, student_id=None):
+    """
+    Presenças consolidadas por (aluno, data) no período, com as colunas de
+    consolidate_attendance: os meses com snapshot vêm das linhas gravadas e o
+    restante é consolidado a partir das solicitações. Ordene com
+    order_consolidated.
+    """
+    live = AttendanceRequest.objects.filter(attendance_date__range=[start_date, end_date]).exclude(status='CAN')
+    if turma_id:
+        live = live.filter(turma_id=turma_id)
+    if student_id:
+        live = live.filter(student_id=student_id)
+
+    frozen_months = list(AttendanceMonthSnapshot.objects.filter(
+        month__range=[start_date.replace(day=1), end_date]
+    ).values_list('month', flat=True))
+    if not frozen_months:
+        return consolidate_attendance(live)
+
+    frozen = Q()
+    for first_day, last_day in month_ranges(frozen_months):
+        frozen |= Q(attendance_date__range=[first_day, last_day])
+
+    rows = AttendanceSnapshotRow.objects.filter(attendance_date__range=[start_date, end_date])
+    rows = rows.filter(turma_id=turma_id) if turma_id else rows.filter(turma__isnull=True)
+    if student_id:
+        rows = rows.filter(student_id=student_id)
+    rows = rows.values(*ROW_COLUMNS, *SNAPSHOT_COLUMNS)
+
+    if set(months_between(start_date, end_date)) <= set(frozen_months):
+        return rows
+
+    # O SQLite não aceita ORDER BY dentro do UNION: a ordenação vem depois
+    live_rows = consolidate_attendance(live.exclude(frozen)).values(*ROW_COLUMNS, *SNAPSHOT_COLUMNS).order_by()
+    return rows.order_by().union(live_rows, all=True)
@@ -0,0 +1,177 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+from .models import Item, Pedido, StockMovement
+
+# Estoque dos itens: Item.quantidade é o saldo disponível, já descontadas as
+# reservas. O pedido reserva as unidades ao ser criado e as devolve se for
+# cancelado ou rejeitado; a entrega apenas consome a reserva. Toda alteração
+# passa por aqui, com UPDATEs condicionais (F()) e lock apenas na linha do
+# pedido, para que pedidos simultâneos nunca vendam além do estoque.
+# Itens com quantidade vazia (taxas, por exemplo) não controlam estoque.
+#
+# Cada alteração também grava um StockMovement com o saldo resultante. O
+# UPDATE trava a linha do item até o commit, então o saldo lido logo depois
+# é exatamente o desta movimentação.
+
+RESERVE, RELEASE, DELIVER, RESTOCK, ADJUST = 'RES', 'LIB', 'ENT', 'REP', 'AJU'
+
+# Status em que o pedido segura unidades do estoque
+RESERVED_STATUSES = ('PEND', 'APRO')
+
+# Status de destino -> status de origem permitidos
+TRANSITIONS = {
+    'APRO': ('PEND',),
+    'REJE': ('PEND',),
+    'CANC': ('PEND', 'APRO'),
+    'ENTR': ('PEND', 'APRO'),
+    'FINA': ('ENTR',),
+}
+
+class StockError(Exception):
+    pass
+
+class InsufficientStock(StockError):
+    pass
+
+class InvalidTransition(StockError):
+    pass
+
+def _record(item_id, kind, quantity, pedido_id=None):
+    balance = Item.objects.filter(pk=item_id).values_list('quantidade', flat=True).first()
+    if balance is None:
+        return None
+    return StockMovement.objects.create(item_id=item_id, pedido_id=pedido_id, kind=kind, quantity=quantity, balance=balance)
+
+def reserve(item_id, quantidade, kind=RESERVE, pedido_id=None):
+    """Retira `quantidade` do saldo do item, só se houver o suficiente."""
+    if quantidade <= 0:
+        raise ValueError('A quantidade deve ser pelo menos 1.')
+    with transaction.atomic():
+        # NULL - n continua NULL: itens sem controle de estoque sempre passam
+        updated = Item.objects.filter(
+            Q(quantidade__gte=quantidade) | Q(quantidade__isnull=True), pk=item_id
+        ).update(quantidade=F('quantidade') - quantidade)
+        if not updated:
+            available = Item.objects.filter(pk=item_id).values_list('quantidade', flat=True).first()
+            raise InsufficientStock(f'A quantidade solicitada ({quantidade}) excede o estoque disponível ({available or 0}).')
+        _record(item_id, kind, -quantidade, pedido_id)
+
+def release(item_id, quantidade, kind=RELEASE, pedido_id=None):
+    """Devolve `quantidade` ao saldo do item."""
+    with transaction.atomic():
+        Item.objects.filter(pk=item_id).update(quantidade=F('quantidade') + quantidade)
+        _record(item_id, kind, quantidade, pedido_id)
+
+def adjust(item_id, delta):
+    """Soma `delta` (positivo ou negativo) ao saldo, sem sobrescrever reservas feitas no meio tempo."""
+    if delta > 0:
+        release(item_id, delta, kind=RESTOCK)
+    elif delta < 0:
+        reserve(item_id, -delta, kind=ADJUST)
+
+def record_count(item_id, kind=ADJUST):
+    """
+    Registra no livro-razão o saldo gravado diretamente em Item.quantidade
+    (item novo ou contagem informada à mão), como diferença para o último saldo.
+    """
+    with transaction.atomic():
+        current = Item.objects.select_for_update().filter(pk=item_id).values_list('quantidade', flat=True).first()
+        if current is None:
+            return None
+        last = balance_as_of(item_id)
+        if last == current:
+            return None
+        return StockMovement.objects.create(item_id=item_id, kind=kind, quantity=current - (last or 0), balance=current)
+
+def create_order(pedido):
+    """Grava um pedido novo reservando o estoque; InsufficientStock se não houver."""
+    with transaction.atomic():
+        pedido.status = 'PEND'
+        pedido.save()
+        reserve(pedido.item_id, pedido.quantidade, pedido_id=pedido.pk)
+    return pedido
+
+def transition(pedido, status, from_statuses=None, **fields):
+    """
+    Leva o pedido ao `status` informado, gravando também `fields`, e devolve
+    ao estoque a reserva de pedidos cancelados ou rejeitados. O status atual
+    é relido com lock na linha do pedido: duas transições simultâneas do mesmo
+    pedido não devolvem a reserva duas vezes.
+    """
+    allowed = from_statuses or TRANSITIONS[status]
+    with transaction.atomic():
+        current = Pedido.objects.select_for_update().values_list('status', flat=True).get(pk=pedido.pk)
+        if current not in allowed:
+            raise InvalidTransition(
+                f'O pedido #{pedido.pk} está {dict(Pedido.STATUS_CHOICES)[current].lower()} e não pode mais ser alterado.'
+            )
+        if current in RESERVED_STATUSES and status in ('CANC', 'REJE'):
+            release(pedido.item_id, pedido.quantidade, pedido_id=pedido.pk)
+        elif status == 'ENTR':
+            # A reserva vira saída: o saldo disponível não muda
+            _record(pedido.item_id, DELIVER, 0, pedido.pk)
+
+        pedido.status = status
+        for field, value in fields.items():
+            setattr(pedido, field, value)
+        pedido.save(update_fields=['status', *fields])
+    return pedido
+
+def bulk_cancel(pedido_ids, cancellation_reason, from_statuses=('PEND',)):
+    """
+    Cancela de uma vez os pedidos informados que ainda estão em `from_statuses`
+    e devolve as reservas com um UPDATE por item. Deve rodar numa transação,
+    com as linhas dos pedidos já travadas. Devolve {item_id: unidades}.
+    """
+    pedidos = Pedido.objects.filter(pk__in=pedido_ids, status__in=from_statuses)
+    rows = list(pedidos.values_list('pk', 'item_id', 'quantidade').order_by('pk'))
+    totals = {}
+    for _, item_id, quantidade in rows:
+        totals[item_id] = totals.get(item_id, 0) + quantidade
+    pedidos.update(status='CANC', cancellation_reason=cancellation_reason)
+
+    # Sempre na mesma ordem, para lotes simultâneos não travarem um ao outro
+    balances = {}
+    for item_id in sorted(totals):
+        Item.objects.filter(pk=item_id).update(quantidade=F('quantidade') + totals[item_id])
+        balances[item_id] = Item.objects.filter(pk=item_id).values_list('quantidade', flat=True).first()
+
+    # Uma movimentação por pedido, com o saldo acumulado até ela
+    now = timezone.now()
+    movements = []
+    for item_id, balance in balances.items():
+        if balance is None:
+            continue
+        running = balance - totals[item_id]
+        for pk, row_item_id, quantidade in rows:
+            if row_item_id == item_id:
+                running += quantidade
+                movements.append(StockMovement(item_id=item_id, pedido_id=pk, kind=RELEASE, quantity=quantidade, balance=running, timestamp=now))
+    StockMovement.objects.bulk_create(movements)
+    return totals
+
+# --- CONSULTAS ---
+
+def balance_as_of(item_id, moment=None):
+    """Saldo do item em `moment` (padrão: agora), lido da última movimentação até ali."""
+    movements = StockMovement.objects.filter(item_id=item_id)
+    if moment is not None:
+        movements = movements.filter(timestamp__lte=moment)
+    return movements.order_by('-timestamp', '-id').values_list('balance', flat=True).first()
+
+def items_with_balance(moment=None):
+    """Itens anotados com `ledger_balance`, o saldo do livro-razão em `moment` (uma busca no índice por item)."""
+    movements = StockMovement.objects.filter(item=OuterRef('pk'))
+    if moment is not None:
+        movements = movements.filter(timestamp__lte=moment)
+    return Item.objects.annotate(
+        ledger_balance=Subquery(movements.order_by('-timestamp', '-id').values('balance')[:1])
+    ).order_by('nome')
+
+def reconcile():
+    """Itens cujo saldo em Item.quantidade difere do último saldo do livro-razão."""
+    return [
+        item for item in items_with_balance()
+        if item.quantidade is not None and item.quantidade != item.ledger_balance
+    ]
@@ -1,15 +1,38 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
+from django.core.cache import cache
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 from django.core.management import call_command
-from io import StringIO
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from io import BytesIO, StringIO
+from unittest import mock
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+import openpyxl
+from pypdf import PdfReader
+from xhtml2pdf import pisa
 
-from .models import User, Item, Pedido
+from .models import User, Item, Pedido, Log, LogArchive, Turma, TurmaAluno, AttendanceRequest, AttendanceDailySummary, Meta as MetaModel, Ranking, ReportJob, AttendanceMonthSnapshot, StockMovement, ReportDataVersion, ReportLock
+from .context_processors import notifications_context, account_management_context
 from .forms import PedidoForm
+from .logs import AuditLogBuffer
+from .report_cache import ReportInProgress, bump_data_version, cached_result, lock_key, report_digest, report_lock, result_key
+from .pdf import write_pdf
+from . import search, snapshots, stock
+from .attendance import consolidate_attendance, describe_consolidated, order_consolidated, refresh_daily_summaries
+from .rankings import compute_ranking
+import datetime
 
 # Dica: Rode os testes com o comando: python manage.py test academia
 
+@override_settings(AUDIT_LOG_SYNC=True)
 class ModelTests(TestCase):
     """
     Testes para os Modelos da aplicação.
@@ -20,6 +43,7 @@ class ModelTests(TestCase):
         self.assertEqual(str(item), "Kimono Azul")
         self.assertEqual(item.quantidade, 10)
 
+@override_settings(AUDIT_LOG_SYNC=True)
 class FormTests(TestCase):
     """
     Testes para os Formulários.
@@ -49,6 +73,7 @@ class FormTests(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('quantidade', form.errors)
 
+@override_settings(AUDIT_LOG_SYNC=True)
 class ViewTests(TestCase):
     """
     Testes para as Views.
@@ -96,6 +121,7 @@ class ViewTests(TestCase):
         self.item.refresh_from_db()
         self.assertEqual(self.item.quantidade, initial_stock - 1)
 
+@override_settings(AUDIT_LOG_SYNC=True)
 class ManagementCommandTests(TestCase):
     """
     Testes para os Management Commands.
@@ -150,3 +176,797 @@ class ManagementCommandTests(TestCase):
         # 7. Verifica a saída do comando
         self.assertIn(f'Pedido #{expired_order.id} para "Kimono" cancelado. 2 unidade(s) devolvida(s) ao estoque.', out.getvalue())
         self.assertIn('Operação concluída. 1 pedido(s) expirado(s) foram cancelados.', out.getvalue())
+
+    def test_cancel_expired_orders_em_lotes(self):
+        """--dry-run não altera nada; os lotes devolvem o total de cada item de uma vez."""
+        faixa = Item.objects.create(nome="Faixa", tipo="FAIXA", valor=50.00, quantidade=0)
+        for item, quantidade in [(self.item, 2), (self.item, 1), (faixa, 3)]:
+            pedido = Pedido.objects.create(aluno=self.student, item=item, quantidade=quantidade, status='PEND')
+            Pedido.objects.filter(pk=pedido.pk).update(data_solicitacao=timezone.now() - timedelta(days=20))
+
+        out = StringIO()
+        call_command('cancel_expired_orders', '--dry-run', stdout=out)
+        self.assertIn('Simulação concluída. 3 pedido(s) expirado(s) seriam cancelados.', out.getvalue())
+        self.assertEqual(Pedido.objects.filter(status='PEND').count(), 3)
+
+        out = StringIO()
+        call_command('cancel_expired_orders', '--batch-size', '2', stdout=out)
+        self.assertIn('6 unidade(s) devolvida(s) a 2 item(ns) em 2 lote(s)', out.getvalue())
+        self.assertEqual(set(Pedido.objects.values_list('status', flat=True)), {'CANC'})
+        self.assertEqual(list(Item.objects.order_by('id').values_list('quantidade', flat=True)), [13, 3])
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class StockReservationTests(TestCase):
+    """
+    Testes para a reserva de estoque dos pedidos.
+    """
+    def setUp(self):
+        self.item = Item.objects.create(nome="Kimono", tipo="KIMONO", valor=400.00, quantidade=3)
+        self.student = User.objects.create_user(username='comprador', password='123', group_role='STD')
+
+    def test_reserva_nao_vende_alem_do_estoque(self):
+        """A criação reserva as unidades; sem saldo suficiente o pedido não é gravado."""
+        stock.create_order(Pedido(aluno=self.student, item=self.item, quantidade=2))
+        with self.assertRaises(stock.InsufficientStock):
+            stock.create_order(Pedido(aluno=self.student, item=self.item, quantidade=2))
+
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.quantidade, Pedido.objects.count()), (1, 1))
+
+    def test_transicoes_devolvem_a_reserva_uma_vez(self):
+        """Cancelar devolve a reserva uma única vez; a entrega apenas consome a reserva."""
+        cancelado = stock.create_order(Pedido(aluno=self.student, item=self.item, quantidade=2))
+        entregue = stock.create_order(Pedido(aluno=self.student, item=self.item, quantidade=1))
+
+        stock.transition(cancelado, 'CANC')
+        with self.assertRaises(stock.InvalidTransition):
+            stock.transition(Pedido.objects.get(pk=cancelado.pk), 'CANC')
+        stock.transition(entregue, 'APRO')
+        stock.transition(entregue, 'ENTR')
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantidade, 2)
+
+    def test_livro_razao_registra_saldo_de_cada_movimentacao(self):
+        """Cada reserva e devolução grava o saldo resultante, consultável em qualquer momento."""
+        stock.record_count(self.item.pk, kind=stock.RESTOCK)
+        pedido = stock.create_order(Pedido(aluno=self.student, item=self.item, quantidade=2))
+        antes_do_cancelamento = timezone.now()
+        stock.transition(pedido, 'CANC')
+
+        movements = StockMovement.objects.filter(item=self.item).order_by('timestamp', 'id')
+        self.assertEqual(
+            list(movements.values_list('kind', 'quantity', 'balance')),
+            [('REP', 3, 3), ('RES', -2, 1), ('LIB', 2, 3)],
+        )
+        self.assertEqual(stock.balance_as_of(self.item.pk, antes_do_cancelamento), 1)
+        self.assertEqual(stock.balance_as_of(self.item.pk), 3)
+
+    def test_reconcile_aponta_alteracao_fora_do_livro_razao(self):
+        """Uma quantidade gravada direto no item aparece na conferência até ser registrada."""
+        stock.record_count(self.item.pk, kind=stock.RESTOCK)
+        Item.objects.filter(pk=self.item.pk).update(quantidade=10)
+        self.assertEqual([item.pk for item in stock.reconcile()], [self.item.pk])
+
+        stock.record_count(self.item.pk)
+        self.assertEqual(stock.reconcile(), [])
+        self.assertEqual(stock.balance_as_of(self.item.pk), 10)
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class SearchTests(TestCase):
+    """
+    Testes para a busca normalizada das listagens.
+    """
+    def setUp(self):
+        self.joao = User.objects.create_user(username='joao', password='123', first_name='João', last_name='Conceição', email='joao@example.com', group_role='STD')
+        self.ana = User.objects.create_user(username='ana', password='123', first_name='Ana', last_name='Joanópolis', email='ana@example.com', group_role='STD')
+        self.item = Item.objects.create(nome="Faixa Preta", tipo="FAIXA", valor=80.00)
+
+    def test_busca_ignora_acentos_e_ordena_por_relevancia(self):
+        """A busca não diferencia acentos nem maiúsculas; quem começa com o termo vem primeiro."""
+        alunos = search.search(User.objects.filter(group_role='STD').order_by('first_name'), 'JOÁ')
+        self.assertEqual(list(alunos), [self.joao, self.ana])
+        self.assertEqual(list(search.search(User.objects.all(), 'joão conceicao')), [self.joao])
+
+    def test_pedido_acompanha_renomeacao_do_aluno(self):
+        """Renomear o aluno atualiza o texto de busca dos seus pedidos."""
+        pedido = Pedido.objects.create(aluno=self.ana, item=self.item)
+        self.assertEqual(list(search.search(Pedido.objects.all(), 'faixa preta')), [pedido])
+
+        self.ana.first_name = 'Anaís'
+        self.ana.save()
+        self.assertEqual(list(search.search(Pedido.objects.all(), 'anais')), [pedido])
+
+    def test_renomear_item_pela_edicao_atualiza_a_busca(self):
+        """A edição com quantidade controlada grava só alguns campos, mas o texto de busca acompanha o nome."""
+        kimono = Item.objects.create(nome="Kimono Azul", tipo="KIMONO", valor=400.00, quantidade=5)
+        pedido = Pedido.objects.create(aluno=self.ana, item=kimono)
+        professor = User.objects.create_user(username='prof', password='123', group_role='PRO', status='ATIVO')
+        self.client.force_login(professor)
+
+        response = self.client.post(reverse('professor_item_editar', args=[kimono.pk]), {
+            'nome': 'Faixa Preta Bordada', 'tipo': 'FAIXA', 'valor': '90.00', 'quantidade': 5, 'quantidade_exibida': 5,
+        })
+        self.assertRedirects(response, reverse('professor_itens'), fetch_redirect_response=False)
+        kimono.refresh_from_db()
+        self.assertEqual(kimono.search_text, 'faixa preta bordada')
+        self.assertEqual(list(search.search(Pedido.objects.all(), 'bordada')), [pedido])
+        self.assertEqual(list(search.search(Item.objects.all(), 'kimono')), [])
+
+class AuditLogBufferTests(TestCase):
+    """
+    Testes para o buffer de logs de auditoria.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='auditado', password='123', group_role='STD')
+        self.buffer = AuditLogBuffer()
+
+    @override_settings(AUDIT_LOG_SYNC=False, AUDIT_LOG_BATCH_SIZE=3, AUDIT_LOG_FLUSH_INTERVAL=3600)
+    def test_logs_sao_gravados_em_lote(self):
+        """Os logs só são gravados quando o lote enche ou no flush explícito."""
+        self.buffer.enqueue(self.user, 'Acessou /a [GET]')
+        self.buffer.enqueue(self.user, 'Acessou /b [GET]')
+        self.assertEqual(Log.objects.count(), 0)
+
+        self.buffer.enqueue(self.user, 'Acessou /c [GET]')
+        self.assertEqual(Log.objects.count(), 3)
+
+        self.buffer.enqueue(self.user, 'Acessou /d [GET]')
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(Log.objects.count(), 4)
+
+    @override_settings(AUDIT_LOG_SYNC=False, AUDIT_LOG_BATCH_SIZE=10, AUDIT_LOG_FLUSH_INTERVAL=3600)
+    def test_registro_invalido_nao_descarta_o_lote(self):
+        """Se o lote falha, os logs são gravados um a um e só o inválido é descartado."""
+        self.buffer.enqueue(self.user, 'Acessou /a [GET]')
+        self.buffer.enqueue(self.user, 'Acessou /b [GET]', duration_ms=-1)
+        self.buffer.enqueue(self.user, 'Acessou /c [GET]')
+
+        with self.assertLogs('academia.logs', level='ERROR'):
+            self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(
+            sorted(Log.objects.filter(user=self.user).values_list('action', flat=True)),
+            ['Acessou /a [GET]', 'Acessou /c [GET]'],
+        )
+
+    @override_settings(AUDIT_LOG_SYNC=True)
+    def test_acoes_consecutivas_identicas_nao_sao_duplicadas(self):
+        """Uma ação idêntica à anterior do mesmo usuário é descartada."""
+        self.assertTrue(self.buffer.enqueue(self.user, 'Acessou /a [GET]'))
+        self.assertFalse(self.buffer.enqueue(self.user, 'Acessou /a [GET]'))
+        self.assertTrue(self.buffer.enqueue(self.user, 'Acessou /a [GET]', status='FALHA'))
+        self.assertEqual(Log.objects.filter(user=self.user).count(), 2)
+
+        # Um novo processo continua a deduplicação a partir do último log gravado
+        self.assertFalse(AuditLogBuffer().enqueue(self.user, 'Acessou /a [GET]', status='FALHA'))
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class AuditLogMiddlewareTests(TestCase):
+    """
+    Testes para o registro estruturado de logs e os filtros da listagem.
+    """
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin@teste.com', email='admin@teste.com', password='123', group_role='ADM', status='ATIVO')
+        self.client.force_login(self.admin)
+
+    def test_middleware_grava_colunas_estruturadas(self):
+        """O middleware registra método, caminho, view, código HTTP e duração."""
+        self.client.get(reverse('logs'))
+        log = Log.objects.get(user=self.admin, url_name='logs')
+        self.assertEqual(log.method, 'GET')
+        self.assertEqual(log.path, reverse('logs'))
+        self.assertEqual(log.status_code, 200)
+        self.assertIsNotNone(log.duration_ms)
+
+    def test_log_list_filtra_por_view_e_codigo(self):
+        """A listagem filtra pelas colunas view, código HTTP e conta."""
+        Log.objects.create(user=self.admin, action='Acessou /x', url_name='dashboard', status_code=200)
+        Log.objects.create(user=self.admin, action='Acessou /y', url_name='dashboard', status_code=404, status='FALHA')
+
+        response = self.client.get(reverse('logs'), {'view': 'dashboard', 'status_code': '404', 'user': 'admin@teste.com'})
+        self.assertEqual([log.action for log in response.context['logs']], ['Acessou /y'])
+
+    def test_log_list_exporta_csv_em_streaming(self):
+        """A exportação respeita os filtros e é transmitida em streaming."""
+        Log.objects.create(user=self.admin, action='Exportável', status='FALHA')
+        Log.objects.create(user=self.admin, action='Filtrado', status='SUCESSO')
+
+        response = self.client.get(reverse('logs'), {'export': 'csv', 'status': 'FALHA'})
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8')
+        self.assertIn('Exportável', content)
+        self.assertNotIn('Filtrado', content)
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class ArchiveLogsCommandTests(TestCase):
+    """
+    Testes para o comando de arquivamento de logs.
+    """
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.user = User.objects.create_user(username='arquivado', password='123')
+        Log.objects.create(user=self.user, action='log antigo', timestamp=timezone.now() - timedelta(days=400))
+        Log.objects.create(user=self.user, action='log recente')
+
+    def test_arquiva_e_restaura_logs_antigos(self):
+        """Logs fora da janela vão para o arquivo compactado e podem ser restaurados."""
+        out = StringIO()
+        call_command('archive_logs', days=180, archive_dir=self.archive_dir, stdout=out)
+
+        self.assertEqual(list(Log.objects.values_list('action', flat=True)), ['log recente'])
+        archive = LogArchive.objects.get()
+        self.assertEqual(archive.row_count, 1)
+
+        out = StringIO()
+        call_command('archive_logs', search='antigo', stdout=out)
+        self.assertIn('1 registro(s) encontrado(s).', out.getvalue())
+
+        call_command('archive_logs', restore=archive.month.strftime('%Y-%m'), stdout=StringIO())
+        self.assertEqual(Log.objects.count(), 2)
+        self.assertFalse(LogArchive.objects.exists())
+
+    def test_restaura_logs_de_usuario_excluido(self):
+        """Logs de um usuário excluído após o arquivamento voltam sem o usuário."""
+        admin = User.objects.create_user(username='responsavel', password='123')
+        Log.objects.filter(action='log antigo').update(acting_user=admin)
+        call_command('archive_logs', days=180, archive_dir=self.archive_dir, stdout=StringIO())
+        self.user.delete()
+
+        call_command('archive_logs', restore=LogArchive.objects.get().month.strftime('%Y-%m'), stdout=StringIO())
+        restored = Log.objects.get(action='log antigo')
+        self.assertIsNone(restored.user_id)
+        self.assertEqual(restored.acting_user_id, admin.pk)
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class NotificationCounterTests(TestCase):
+    """
+    Testes para os contadores de notificação em cache.
+    """
+    def setUp(self):
+        cache.clear()
+        self.professor = User.objects.create_user(username='prof', password='123', group_role='PRO', status='ATIVO', first_name='Prof')
+        self.student = User.objects.create_user(username='aluno', password='123', group_role='STD', status='ATIVO')
+        self.turma = Turma.objects.create(nome='Adulto', professor=self.professor)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.professor
+
+    def test_contadores_em_cache_e_invalidados_por_sinal(self):
+        """Após a primeira leitura não há consultas; uma nova solicitação invalida o contador."""
+        notifications_context(self.request)
+        with self.assertNumQueries(0):
+            context = notifications_context(self.request)
+        self.assertNotIn('Solicitação de Presença', [n['title'] for n in context['notifications']])
+
+        AttendanceRequest.objects.create(student=self.student, turma=self.turma, attendance_date=timezone.localdate(), reason='teste')
+        context = notifications_context(self.request)
+        self.assertIn('1 solicitação(ões) pendente(s).', [n['text'] for n in context['notifications']])
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class AccountSnapshotTests(TestCase):
+    """
+    Testes para o snapshot de dependentes usado no menu de troca de conta.
+    """
+    def setUp(self):
+        cache.clear()
+        self.responsible = User.objects.create_user(username='pai', password='123', status='ATIVO', first_name='Pai')
+        self.dependent = User.objects.create_user(username='filho', password='123', status='ATIVO', first_name='Filho', responsible=self.responsible)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.responsible
+        self.request.session = {}
+
+    def test_snapshot_em_cache_e_invalidado_ao_alterar_dependente(self):
+        """O menu não consulta o banco após a primeira leitura e reflete alterações nos dependentes."""
+        account_management_context(self.request)
+        with self.assertNumQueries(0):
+            context = account_management_context(self.request)
+        self.assertEqual([d['name'] for d in context['dependents_list']], ['Filho'])
+
+        self.dependent.first_name = 'Filha'
+        self.dependent.save()
+        context = account_management_context(self.request)
+        self.assertEqual([d['name'] for d in context['dependents_list']], ['Filha'])
+
+        self.dependent.responsible = None
+        self.dependent.save()
+        self.assertEqual(account_management_context(self.request)['dependents_list'], [])
+
+    def test_troca_de_conta_nao_depende_do_snapshot(self):
+        """Um dependente recém-vinculado em outro worker (snapshot ainda antigo) já pode ser gerenciado."""
+        account_management_context(self.request)
+        novo = User.objects.create_user(username='filha', password='123', status='ATIVO', first_name='Filha')
+        User.objects.filter(pk=novo.pk).update(responsible=self.responsible)
+
+        self.client.force_login(self.responsible)
+        response = self.client.get(reverse('switch_account', args=[novo.pk]))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(self.client.session['original_user_id'], self.responsible.pk)
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class AttendanceConsolidationTests(TestCase):
+    """
+    Testes para a consolidação de presenças por aluno e dia.
+    """
+    def setUp(self):
+        cache.clear()
+        self.professor = User.objects.create_user(username='prof', password='123', group_role='PRO', status='ATIVO', first_name='Prof')
+        self.student = User.objects.create_user(username='aluno', password='123', group_role='STD', status='ATIVO', first_name='Ana')
+        self.turma = Turma.objects.create(nome='Adulto', professor=self.professor)
+        self.tuesday = datetime.date(2026, 3, 3)
+        self.wednesday = datetime.date(2026, 3, 4)
+        self.next_tuesday = datetime.date(2026, 3, 10)
+
+    def add(self, date, class_type, status, rejection_reason=''):
+        return AttendanceRequest.objects.create(
+            student=self.student, turma=self.turma, attendance_date=date,
+            class_type=class_type, status=status, reason='teste', rejection_reason=rejection_reason
+        )
+
+    def test_regras_da_terca_e_dias_comuns(self):
+        """Terça com as duas aulas vale 2; rejeições trazem o motivo."""
+        self.add(self.tuesday, 'GI', 'APR')
+        self.add(self.tuesday, 'NOGI', 'APR')
+        self.add(self.wednesday, 'BOTH', 'REJ', 'Não compareceu')
+        self.add(self.next_tuesday, 'GI', 'APR')
+        self.add(self.next_tuesday, 'NOGI', 'REJ', 'Saiu cedo')
+
+        rows = [describe_consolidated(row) for row in order_consolidated(consolidate_attendance(AttendanceRequest.objects.all()), 'asc')]
+        self.assertEqual([(r['data'], r['qty'], r['status'], r['motivo']) for r in rows], [
+            (self.tuesday, 2, 'Aprovado', 'Integral'),
+            (self.wednesday, 0, 'Rejeitado', 'Integral - Ausente (Não compareceu)'),
+            (self.next_tuesday, 1, 'Aprovado', 'Presente apenas na aula com Kimono'),
+        ])
+        self.assertEqual(rows[0]['aluno'], 'Ana')
+
+    def test_meses_fechados_lidos_do_snapshot(self):
+        """Meses congelados vêm do snapshot; o restante é calculado e alterar o mês descarta o snapshot."""
+        self.add(self.tuesday, 'GI', 'APR')
+        self.add(self.tuesday, 'NOGI', 'APR')
+        wednesday = self.add(self.wednesday, 'BOTH', 'REJ', 'Não compareceu')
+        call_command('freeze_report_months', '--month', '2026-03', stdout=StringIO())
+        self.assertEqual(AttendanceMonthSnapshot.objects.get().credited_classes, 2)
+        self.client.force_login(self.professor)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('professor_relatorio_presenca'), {'start_date': '2026-03-01', 'end_date': '2026-03-31'})
+        # O contador de pendentes do menu também lê a tabela, mas sem filtrar por data
+        self.assertFalse([q for q in queries.captured_queries if '"academia_attendancerequest"."attendance_date"' in q['sql']])
+        self.assertEqual([(r['qty'], r['motivo']) for r in response.context['report_data']], [(0, 'Integral - Ausente (Não compareceu)'), (2, 'Integral')])
+
+        self.add(datetime.date(2026, 4, 6), 'BOTH', 'APR')
+        response = self.client.get(reverse('professor_relatorio_presenca'), {'start_date': '2026-03-01', 'end_date': '2026-04-30', 'order': 'asc'})
+        self.assertEqual([r['data'] for r in response.context['report_data']], [self.tuesday, self.wednesday, datetime.date(2026, 4, 6)])
+
+        wednesday.status = 'APR'
+        wednesday.save()
+        self.assertFalse(AttendanceMonthSnapshot.objects.exists())
+
+    def test_relatorios_paginam_linhas_consolidadas(self):
+        """Os relatórios de professor e aluno usam as linhas consolidadas."""
+        self.add(self.tuesday, 'BOTH', 'APR')
+        self.add(self.wednesday, 'BOTH', 'PEN')
+        params = {'start_date': '2026-03-01', 'end_date': '2026-03-31', 'items_per_page': 1}
+
+        self.client.force_login(self.professor)
+        response = self.client.get(reverse('professor_relatorio_presenca'), params)
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertEqual(response.context['report_data'][0]['data'], self.wednesday)
+
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('aluno_relatorio_presenca'), dict(params, order='asc'))
+        self.assertEqual(response.context['report_data'][0]['motivo'], 'Integral')
+        self.assertEqual(response.context['report_data'][0]['qty'], 2)
+
+    def test_resumo_diario_acompanha_aprovacao_divisao_e_exclusao(self):
+        """O resumo diário é atualizado ao aprovar, dividir a terça e excluir."""
+        request_both = self.add(self.tuesday, 'BOTH', 'PEN')
+        summary = AttendanceDailySummary.objects.get(student=self.student, date=self.tuesday)
+        self.assertEqual((summary.qty, summary.status), (0, 'PEN'))
+
+        self.client.force_login(self.professor)
+        self.client.post(reverse('professor_presenca_rejeitar', args=[request_both.id]), {'rejection_scope': 'first', 'rejection_reason': 'Atrasou'})
+        summary.refresh_from_db()
+        self.assertEqual((summary.qty, summary.status), (1, 'APR'))
+
+        wednesday = self.add(self.wednesday, 'BOTH', 'PEN')
+        self.client.post(reverse('professor_presenca_aprovar', args=[wednesday.id]))
+        self.assertEqual(AttendanceDailySummary.objects.get(date=self.wednesday).qty, 1)
+
+        wednesday.delete()
+        self.assertFalse(AttendanceDailySummary.objects.filter(date=self.wednesday).exists())
+
+    def test_rebuild_attendance_summary(self):
+        """O comando reconstrói o resumo a partir das solicitações."""
+        self.add(self.tuesday, 'GI', 'APR')
+        self.add(self.tuesday, 'NOGI', 'APR')
+        self.add(self.wednesday, 'BOTH', 'CAN')
+        AttendanceDailySummary.objects.all().delete()
+
+        call_command('rebuild_attendance_summary', stdout=StringIO())
+        self.assertEqual(list(AttendanceDailySummary.objects.values_list('date', 'qty', 'status')), [(self.tuesday, 2, 'APR')])
+
+    def test_aprovacao_e_rejeicao_em_lote(self):
+        """O lote ignora alunos desativados, divide as terças e grava um único log."""
+        inactive = User.objects.create_user(username='inativo', password='123', group_role='STD', status='INATIVO', first_name='Bia')
+        tuesday = self.add(self.tuesday, 'BOTH', 'PEN')
+        wednesday = self.add(self.wednesday, 'BOTH', 'PEN')
+        blocked = AttendanceRequest.objects.create(student=inactive, turma=self.turma, attendance_date=self.wednesday, class_type='BOTH', reason='teste')
+        self.client.force_login(self.professor)
+
+        self.client.post(reverse('professor_presencas_lote'), {'action': 'approve', 'request_ids': [wednesday.id, blocked.id]})
+        self.client.post(reverse('professor_presencas_lote'), {'action': 'reject', 'rejection_scope': 'second', 'request_ids': [tuesday.id]})
+
+        for attendance_request in (tuesday, wednesday, blocked):
+            attendance_request.refresh_from_db()
+        self.assertEqual((wednesday.status, blocked.status), ('APR', 'PEN'))
+        self.assertEqual((tuesday.status, tuesday.class_type), ('APR', 'GI'))
+        self.assertTrue(AttendanceRequest.objects.filter(attendance_date=self.tuesday, class_type='NOGI', status='REJ').exists())
+        self.assertEqual(AttendanceDailySummary.objects.get(date=self.tuesday).qty, 1)
+        self.assertEqual(Log.objects.filter(action__contains='em lote').count(), 2)
+
+    def test_fila_de_pendentes_paginada_por_chave(self):
+        """A fila de pendentes filtra e pagina por (data, id), com parcial XHR."""
+        self.add(self.tuesday, 'BOTH', 'PEN')
+        self.add(self.wednesday, 'BOTH', 'PEN')
+        self.add(self.next_tuesday, 'BOTH', 'PEN')
+        self.add(self.next_tuesday, 'GI', 'APR')
+        self.client.force_login(self.professor)
+
+        response = self.client.get(reverse('professor_presencas'), {'items_per_page': 2})
+        page = response.context['page']
+        self.assertEqual([r.attendance_date for r in page['object_list']], [self.next_tuesday, self.wednesday])
+        self.assertTrue(page['has_next'])
+
+        response = self.client.get(reverse('professor_presencas'), {'items_per_page': 2, 'after': page['next_cursor']}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertTemplateUsed(response, 'academia/professor/partials/presencas_list.html')
+        self.assertEqual([r.attendance_date for r in response.context['page']['object_list']], [self.tuesday])
+        self.assertTrue(response.context['page']['has_previous'])
+
+        response = self.client.get(reverse('professor_presencas'), {'start_date': '2026-03-04', 'end_date': '2026-03-09', 'aluno': 'ana'})
+        self.assertEqual([r.attendance_date for r in response.context['pending_requests']], [self.wednesday])
+
+        # Parâmetros malformados são ignorados; a página tem ao menos 1 item
+        response = self.client.get(reverse('professor_presencas'), {'items_per_page': -5, 'turma': 'abc', 'start_date': '2026-13-45', 'end_date': 'ontem'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.context['items_per_page'], response.context['total_pending']), (1, 3))
+
+    def test_calendario_do_aluno_por_mes_com_etag(self):
+        """O calendário devolve apenas o mês pedido e responde 304 quando nada mudou."""
+        self.add(self.tuesday, 'BOTH', 'APR')
+        self.add(datetime.date(2026, 4, 7), 'BOTH', 'PEN')
+        self.client.force_login(self.student)
+
+        response = self.client.get(reverse('aluno_calendario_presenca'), {'month': '2026-03'})
+        self.assertEqual(list(response.json()['days']), ['2026-03-03'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        response = self.client.get(reverse('aluno_calendario_presenca'), {'month': '2026-03'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_marcar_presenca_em_lote_reaproveita_canceladas(self):
+        """O envio de várias datas cria as novas e reativa as canceladas de uma vez."""
+        TurmaAluno.objects.create(aluno=self.student, turma=self.turma, status='APRO')
+        today = timezone.localdate()
+        cancelled = self.add(today - timedelta(days=1), 'BOTH', 'CAN')
+        approved = self.add(today - timedelta(days=2), 'BOTH', 'APR')
+        dates = [(today - timedelta(days=n)).strftime('%Y-%m-%d') for n in range(0, 4)]
+        self.client.force_login(self.student)
+
+        self.client.post(reverse('aluno_marcar_presenca'), {'turma_id': self.turma.id, 'dates': dates})
+
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'PEN')
+        self.assertEqual(AttendanceRequest.objects.filter(student=self.student).count(), 4)
+        self.assertEqual(AttendanceRequest.objects.get(pk=approved.pk).status, 'APR')
+        self.assertEqual(AttendanceDailySummary.objects.filter(student=self.student, status='PEN').count(), 3)
+
+    def test_marcar_presenca_informa_apenas_o_que_foi_gravado(self):
+        """Datas gravadas em paralelo ou reenviadas não são informadas como solicitadas nem invalidam caches."""
+        TurmaAluno.objects.create(aluno=self.student, turma=self.turma, status='APRO')
+        today = timezone.localdate()
+        dates = [(today - timedelta(days=n)).strftime('%Y-%m-%d') for n in range(0, 2)]
+        self.client.force_login(self.student)
+
+        real_bulk_create = AttendanceRequest.objects.bulk_create
+        def concurrent_bulk_create(objs, **kwargs):
+            self.add(today, 'BOTH', 'REJ')  # gravada por outra requisição antes do INSERT
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(AttendanceRequest.objects, 'bulk_create', side_effect=concurrent_bulk_create):
+            response = self.client.post(reverse('aluno_marcar_presenca'), {'turma_id': self.turma.id, 'dates': dates}, follow=True)
+        success = [str(m) for m in response.context['messages'] if m.level_tag == 'success']
+        self.assertEqual(success, [f'Presença para {(today - timedelta(days=1)).strftime("%d/%m/%Y")} solicitada com sucesso!'])
+
+        with mock.patch('academia.views.bump_data_version') as bump:
+            response = self.client.post(reverse('aluno_marcar_presenca'), {'turma_id': self.turma.id, 'dates': dates}, follow=True)
+        self.assertFalse(bump.called)
+        self.assertFalse([m for m in response.context['messages'] if m.level_tag == 'success'])
+
+    def test_relatorio_de_frequencia_da_turma(self):
+        """A frequência da turma soma as aulas creditadas de cada aluno frente à meta."""
+        other = User.objects.create_user(username='outro', password='123', group_role='STD', status='ATIVO', first_name='Caio')
+        for student in (self.student, other):
+            TurmaAluno.objects.create(aluno=student, turma=self.turma, status='APRO')
+        MetaModel.objects.create(professor=self.professor, titulo='Março', data_inicio=datetime.date(2026, 3, 1), data_fim=datetime.date(2026, 3, 31), meta_aulas=4, minimo_aulas=2, minimo_frequencia=50)
+        self.add(self.tuesday, 'BOTH', 'APR')
+        self.add(self.wednesday, 'BOTH', 'APR')
+        self.client.force_login(self.professor)
+
+        response = self.client.get(reverse('relatorio_frequencia'), {'turma': self.turma.id, 'sort': '-presencas'})
+        roster = response.context['roster']
+        self.assertEqual([(r['student'], r['total_presencas'], r['porcentagem'], r['situacao']) for r in roster], [
+            (self.student, 3, 75.0, 'Satisfatório'),
+            (other, 0, 0, 'Insatisfatório'),
+        ])
+
+        response = self.client.get(reverse('relatorio_frequencia'), {'export': 'xlsx'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="relatorio_frequencia.xlsx"')
+
+        self.assertEqual(self.client.get(reverse('relatorio_frequencia'), {'meta': 'abc'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('relatorio_frequencia'), {'turma': '1 OR 1=1'}).status_code, 404)
+
+    def test_ranking_por_frequencia_com_atualizacao_incremental(self):
+        """O ranking usa dense rank e é atualizado quando uma presença é aprovada."""
+        other = User.objects.create_user(username='outro', password='123', group_role='STD', status='ATIVO', first_name='Caio')
+        for student in (self.student, other):
+            TurmaAluno.objects.create(aluno=student, turma=self.turma, status='APRO')
+        self.add(self.tuesday, 'BOTH', 'APR')
+        self.client.force_login(self.professor)
+
+        self.client.post(reverse('professor_ranking_novo'), {
+            'titulo': 'Março', 'tipo': 'FALTAS', 'turma': self.turma.id,
+            'data_inicio': '2026-03-01', 'data_fim': '2026-03-31', 'ativo': 'on',
+        })
+        ranking = Ranking.objects.get(titulo='Março')
+        positions = lambda: list(ranking.posicoes.order_by('aluno__first_name').values_list('aluno__first_name', 'posicao', 'pontuacao'))
+        # Menos Faltas: a pontuação são as faltas e quem tem menos fica em 1º
+        self.assertEqual(positions(), [('Ana', 1, 0), ('Caio', 2, 2)])
+
+        pending = AttendanceRequest.objects.create(student=other, turma=self.turma, attendance_date=self.next_tuesday, class_type='BOTH', reason='teste')
+        self.client.post(reverse('professor_presenca_aprovar', args=[pending.id]))
+        self.assertEqual(positions(), [('Ana', 1, 2), ('Caio', 1, 2)])
+
+    def test_ranking_destaque_move_so_as_posicoes_afetadas(self):
+        """As posições atualizadas a cada presença batem com o cálculo completo."""
+        students = [self.student] + [
+            User.objects.create_user(username=f'aluno{n}', password='123', group_role='STD', status='ATIVO', first_name=f'Aluno {n}')
+            for n in range(3)
+        ]
+        for student in students:
+            TurmaAluno.objects.create(aluno=student, turma=self.turma, status='APRO')
+        ranking = Ranking.objects.create(titulo='Destaque', tipo='ALUNO_DESTAQUE', turma=self.turma, data_inicio=datetime.date(2026, 3, 1))
+        compute_ranking(ranking)
+
+        days = [datetime.date(2026, 3, day) for day in (2, 4, 5, 6, 9)]
+        for student, day in [(0, 0), (1, 0), (1, 1), (2, 2), (0, 1), (3, 3), (3, 4), (2, 3), (1, 2)]:
+            AttendanceRequest.objects.create(student=students[student], turma=self.turma, attendance_date=days[day], class_type='BOTH', reason='teste', status='APR')
+            self.assertEqual(compute_ranking(ranking), 0)
+
+        AttendanceRequest.objects.filter(student=students[1]).update(status='CAN')
+        refresh_daily_summaries(AttendanceRequest.objects.filter(student=students[1]))
+        self.assertEqual(compute_ranking(ranking), 0)
+        self.assertEqual(ranking.posicoes.get(aluno=students[1]).posicao, 2)
+
+    def test_exportacao_xlsx_do_aluno_tem_colunas_consistentes(self):
+        """O XLSX do aluno sai em streaming, com uma coluna por cabeçalho e o dia da semana certo."""
+        friday = datetime.date(2026, 3, 6)
+        self.add(friday, 'BOTH', 'APR')
+        self.client.force_login(self.student)
+
+        response = self.client.get(reverse('aluno_relatorio_presenca'), {'start_date': '2026-03-01', 'end_date': '2026-03-31', 'export': 'xlsx'})
+        self.assertTrue(response.streaming)
+        workbook = openpyxl.load_workbook(BytesIO(b''.join(response.streaming_content)))
+        rows = list(workbook.active.values)
+        self.assertEqual(rows, [('Data', 'Status', 'Motivo', 'Quantidade'), ('06/03/2026 Sex', 'Aprovado', 'Integral', 1)])
+
+    def test_exportacao_pdf_em_segundo_plano(self):
+        """O PDF entra na fila, é gerado pelo worker e fica disponível só para quem pediu."""
+        self.add(self.tuesday, 'BOTH', 'APR')
+        self.client.force_login(self.student)
+
+        response = self.client.get(reverse('aluno_relatorio_presenca'), {'start_date': '2026-03-01', 'end_date': '2026-03-31', 'export': 'pdf'})
+        job = ReportJob.objects.get()
+        self.assertRedirects(response, reverse('report_job_status', args=[job.id]))
+        self.assertEqual((job.status, job.params), ('PEN', {'start_date': '2026-03-01', 'end_date': '2026-03-31'}))
+
+        with override_settings(REPORT_JOBS_DIR=tempfile.mkdtemp()):
+            call_command('process_report_jobs', stdout=StringIO())
+            status = self.client.get(reverse('report_job_status', args=[job.id]), {'format': 'json'}).json()
+            self.assertEqual(status['status'], 'CON')
+            response = self.client.get(status['download_url'])
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        self.client.force_login(self.professor)
+        self.assertEqual(self.client.get(reverse('report_job_status', args=[job.id])).status_code, 404)
+
+    def test_relatorio_em_cache_ate_os_dados_mudarem(self):
+        """Relatórios idênticos vêm do cache; alterar uma presença troca a versão dos dados."""
+        req = self.add(self.tuesday, 'BOTH', 'APR')
+        self.client.force_login(self.professor)
+        params = {'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+
+        self.client.get(reverse('professor_relatorio_presenca'), params)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('professor_relatorio_presenca'), dict(params, order='desc', turma=''))
+        self.assertFalse([q for q in queries.captured_queries if 'academia_attendancerequest' in q['sql']])
+        self.assertEqual(response.context['report_data'][0]['status'], 'Aprovado')
+
+        req.status = 'REJ'
+        with self.captureOnCommitCallbacks(execute=True):
+            req.save()
+        response = self.client.get(reverse('professor_relatorio_presenca'), params)
+        self.assertEqual(response.context['report_data'][0]['status'], 'Rejeitado')
+
+        with override_settings(REPORT_JOBS_DIR=tempfile.mkdtemp()):
+            self.client.get(reverse('professor_relatorio_presenca'), dict(params, export='pdf'))
+            call_command('process_report_jobs', stdout=StringIO())
+            self.client.get(reverse('professor_relatorio_presenca'), dict(params, export='pdf'))
+        self.assertEqual(list(ReportJob.objects.values_list('status', flat=True)), ['CON', 'CON'])
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Concorrência entre conexões; o SQLite serializa as escritas.')
+@override_settings(AUDIT_LOG_SYNC=True)
+class SnapshotConcurrencyTests(TransactionTestCase):
+    """
+    Testes para o congelamento de meses concorrente com alterações de presença.
+    """
+    def test_alteracao_durante_o_congelamento_descarta_o_snapshot(self):
+        """Uma presença alterada enquanto o mês é congelado não deixa um snapshot desatualizado."""
+        professor = User.objects.create_user(username='prof', password='123', group_role='PRO', status='ATIVO')
+        student = User.objects.create_user(username='aluno', password='123', group_role='STD', status='ATIVO')
+        turma = Turma.objects.create(nome='Adulto', professor=professor)
+        req = AttendanceRequest.objects.create(student=student, turma=turma, attendance_date=datetime.date(2026, 3, 3), reason='teste', status='REJ')
+
+        consolidate = snapshots.consolidate_attendance
+        def slow_consolidate(*args, **kwargs):
+            time.sleep(1)  # a alteração acontece enquanto o mês está sendo lido
+            return consolidate(*args, **kwargs)
+
+        def freeze():
+            with mock.patch.object(snapshots, 'consolidate_attendance', side_effect=slow_consolidate):
+                snapshots.freeze_month(datetime.date(2026, 3, 1))
+            connections.close_all()
+
+        freezer = threading.Thread(target=freeze)
+        freezer.start()
+        time.sleep(0.3)
+        with transaction.atomic():
+            req.status = 'APR'
+            req.save()
+        freezer.join()
+        self.assertFalse(AttendanceMonthSnapshot.objects.exists())
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class ReportSingleFlightTests(TestCase):
+    """
+    Testes para a coalescência de gerações idênticas de relatórios.
+    """
+    def setUp(self):
+        cache.clear()
+        self.professor = User.objects.create_user(username='prof', password='123', group_role='PRO', status='ATIVO', first_name='Prof')
+
+    def test_pedido_identico_recebe_202_enquanto_outro_calcula(self):
+        """Com o lock de outro worker o pedido não espera nem recalcula: recebe 202 com Retry-After."""
+        key = result_key('abc', 'count')
+        ReportLock.objects.create(name=lock_key(key), token='outro-worker', expires_at=timezone.now() + datetime.timedelta(minutes=1))
+        computed = []
+        with mock.patch('academia.report_cache.is_local_cache', return_value=False):
+            with self.assertRaises(ReportInProgress):
+                cached_result('abc', 'count', lambda: computed.append(1) or 0)
+            self.assertEqual(computed, [])
+
+            self.client.force_login(self.professor)
+            with mock.patch('academia.report_cache.report_lock') as lock:
+                lock.return_value.__enter__.return_value = False
+                response = self.client.get(reverse('graduations_report'))
+            self.assertEqual((response.status_code, response['Retry-After']), (202, '2'))
+
+        # Com cache por processo os outros workers não veriam o resultado; calcula direto
+        self.assertEqual(cached_result('abc', 'count', lambda: computed.append(1) or 0), 0)
+        self.assertEqual(computed, [1])
+
+    def test_lock_vencido_e_assumido(self):
+        """Um lock de worker que caiu não impede novas gerações após expirar."""
+        ReportLock.objects.create(name=lock_key('x'), token='caiu', expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        with report_lock('x') as acquired:
+            self.assertTrue(acquired)
+            with report_lock('x') as again:
+                self.assertFalse(again)
+        self.assertFalse(ReportLock.objects.exists())
+
+    def test_versao_dos_dados_fica_no_banco(self):
+        """A versão só muda após o commit de quem altera os dados, uma vez por transação."""
+        inicial = report_digest('pedidos', {})
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version('pedidos')
+            bump_data_version('pedidos')
+            # Durante a transação do escritor a linha da versão não é tocada
+            self.assertEqual(report_digest('pedidos', {}), inicial)
+        self.assertEqual(ReportDataVersion.objects.get(source='pedidos').version, 1)
+        self.assertNotEqual(report_digest('pedidos', {}), inicial)
+
+        # Outro worker só altera o banco; nada muda no cache deste processo
+        atual = report_digest('pedidos', {})
+        ReportDataVersion.objects.filter(source='pedidos').update(version=F('version') + 1)
+        self.assertNotEqual(report_digest('pedidos', {}), atual)
+
+        atual = report_digest('pedidos', {})
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                bump_data_version('pedidos')
+                raise RuntimeError
+        self.assertEqual(report_digest('pedidos', {}), atual)
+
+    def test_pdfs_identicos_renderizados_uma_vez(self):
+        """Jobs com o mesmo cache_key geram um único PDF; os demais copiam o arquivo."""
+        for _ in range(3):
+            ReportJob.objects.create(user=self.professor, report_type='graduacoes', cache_key='mesmo-resultado')
+
+        with override_settings(REPORT_JOBS_DIR=tempfile.mkdtemp()), \
+                mock.patch('academia.pdf.pisa.CreatePDF', wraps=pisa.CreatePDF) as create_pdf:
+            call_command('process_report_jobs', stdout=StringIO())
+
+        self.assertEqual(create_pdf.call_count, 1)
+        self.assertEqual(set(ReportJob.objects.values_list('status', flat=True)), {'CON'})
+
+    def test_pdf_grande_gerado_em_blocos(self):
+        """As linhas são renderizadas em blocos unidos num só PDF, com o cabeçalho apenas no primeiro."""
+        rows = ({'data': datetime.date(2026, 3, 3), 'aluno': f'Aluno {i}', 'status': 'Aprovado', 'motivo': 'Integral'} for i in range(5))
+        dest = BytesIO()
+        with mock.patch('academia.pdf.pisa.CreatePDF', wraps=pisa.CreatePDF) as create_pdf:
+            write_pdf('academia/professor/relatorio_presenca_pdf.html', {'report_title': 'Presenças', 'report_data': rows}, dest, 'report_data', chunk_rows=2)
+
+        html = [call.args[0] for call in create_pdf.call_args_list]
+        self.assertEqual(len(html), 3)
+        self.assertEqual([('<h1>' in part) for part in html], [True, False, False])
+        self.assertIn('Aluno 4', html[2])
+        self.assertGreaterEqual(len(PdfReader(BytesIO(dest.getvalue())).pages), 3)
+
+    def test_pdf_em_blocos_numera_as_paginas_do_documento_inteiro(self):
+        """Cada página tem um rodapé e o número contado sobre o documento unido, não sobre o bloco."""
+        rows = [{'data': datetime.date(2026, 3, 3), 'aluno': f'Aluno {i}', 'status': 'Aprovado', 'motivo': 'Integral'} for i in range(120)]
+        dest = BytesIO()
+        write_pdf('academia/professor/relatorio_presenca_pdf.html', {'report_title': 'Presenças', 'report_data': rows}, dest, 'report_data', chunk_rows=50)
+
+        pages = [page.extract_text() for page in PdfReader(BytesIO(dest.getvalue())).pages]
+        self.assertGreater(len(pages), 3)
+        for number, text in enumerate(pages, 1):
+            self.assertEqual(text.count('Página'), 1)
+            self.assertIn(f'Página {number} de {len(pages)}', text)
+            self.assertEqual(text.count('Gerado em'), 1)
+
+@override_settings(AUDIT_LOG_SYNC=True)
+class BenchmarkCommandTests(TestCase):
+    """
+    Testes para a geração de dados sintéticos e o benchmark dos relatórios.
+    """
+    def test_seed_e_benchmark_gravam_json(self):
+        """Os dados gerados alimentam o benchmark, que grava tempo, consultas e memória por caso."""
+        call_command('seed_demo_data', students=4, turmas=2, years=1, orders=1, logs=1, stdout=StringIO())
+        self.assertEqual(User.objects.filter(username__startswith='seed_aluno').count(), 4)
+        self.assertTrue(AttendanceRequest.objects.filter(class_type='NOGI').exists())
+        self.assertEqual(
+            AttendanceDailySummary.objects.count(),
+            consolidate_attendance(AttendanceRequest.objects.exclude(status='CAN'), by_turma=True).count(),
+        )
+
+        output = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+        call_command('benchmark_reports', repeat=1, no_pdf=True, only=['presencas_html', 'aluno_pedidos_xlsx'], output=output, stdout=StringIO())
+        with open(output, encoding='utf-8') as f:
+            report = json.load(f)
+        self.assertEqual([r['name'] for r in report['results']], ['presencas_html', 'aluno_pedidos_xlsx'])
+        self.assertEqual({r['status_code'] for r in report['results']}, {200})
+        self.assertTrue(all(r['queries'] > 0 and r['peak_memory_kb'] > 0 for r in report['results']))
+
+    def test_seed_reserva_pedidos_em_aberto(self):
+        """Os pedidos em aberto gerados seguram a reserva no livro-razão e a devolvem ao remover os dados."""
+        call_command('seed_demo_data', students=4, turmas=1, years=1, orders=30, logs=0, stdout=StringIO())
+        open_orders = Pedido.objects.filter(status__in=stock.RESERVED_STATUSES)
+        self.assertTrue(open_orders.exists())
+        for item in Item.objects.all():
+            reserved = open_orders.filter(item=item)
+            self.assertEqual(item.quantidade, 1000 - sum(reserved.values_list('quantidade', flat=True)))
+            self.assertEqual(StockMovement.objects.filter(item=item, kind=stock.RESERVE).count(), reserved.count())
+        self.assertEqual(stock.reconcile(), [])
+
+        call_command('seed_demo_data', students=1, turmas=1, years=1, orders=0, logs=0, clear=True, stdout=StringIO())
+        self.assertEqual(set(Item.objects.values_list('quantidade', flat=True)), {1000})
+        self.assertEqual(stock.reconcile(), [])
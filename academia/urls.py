@@ -36,6 +36,8 @@ urlpatterns = [
     
     # Perfil
     path('perfil/', views.perfil, name='perfil'),
+    path('relatorios/exportacoes/<int:job_id>/', views.report_job_status, name='report_job_status'),
+    path('relatorios/exportacoes/<int:job_id>/download/', views.report_job_download, name='report_job_download'),
     path('perfil/editar/', views.perfil_editar, name='perfil_editar'),
     path('perfil/photo/update/', views.perfil_photo_update, name='perfil_photo_update'), # New URL for photo update
     
@@ -45,6 +47,7 @@ urlpatterns = [
     # Painel do Aluno
     path('aluno/marcar-presenca/', views.aluno_marcar_presenca, name='aluno_marcar_presenca'),
     path('aluno/get-attendance-details/', views.get_attendance_details, name='get_attendance_details'),
+    path('aluno/calendario-presenca/', views.aluno_calendario_presenca, name='aluno_calendario_presenca'),
     path('aluno/cancelar-presenca/<int:request_id>/', views.aluno_cancelar_presenca, name='aluno_cancelar_presenca'),
     path('aluno/presencas/', views.aluno_presencas, name='aluno_presencas'),
     path('aluno/relatorios/', views.aluno_relatorios, name='aluno_relatorios'),
@@ -75,6 +78,7 @@ urlpatterns = [
 
     # Painel do Professor - Presenças
     path('professor/presencas/', views.professor_presencas, name='professor_presencas'),
+    path('professor/presencas/lote/', views.professor_presencas_lote, name='professor_presencas_lote'),
     path('professor/presenca/<int:request_id>/aprovar/', views.professor_presenca_aprovar, name='professor_presenca_aprovar'),
     path('professor/presenca/<int:request_id>/rejeitar/', views.professor_presenca_rejeitar, name='professor_presenca_rejeitar'),
 
@@ -100,6 +104,8 @@ urlpatterns = [
     # Painel do Professor - Rankings
     path('professor/rankings/', views.professor_rankings, name='professor_rankings'),
     path('professor/rankings/novo/', views.professor_ranking_novo, name='professor_ranking_novo'),
+    path('professor/rankings/<int:ranking_id>/', views.professor_ranking_detalhe, name='professor_ranking_detalhe'),
+    path('professor/rankings/<int:ranking_id>/recalcular/', views.professor_ranking_recalcular, name='professor_ranking_recalcular'),
 
     # Painel do Professor - Metas
     path('professor/metas/', views.professor_metas, name='professor_metas'),
@@ -111,6 +117,7 @@ urlpatterns = [
     path('professor/relatorios/', views.professor_relatorios, name='professor_relatorios'),
     path('professor/relatorios/pedidos/', views.relatorio_pedidos, name='relatorio_pedidos'),
     path('professor/relatorios/presenca/', views.relatorio_presenca, name='professor_relatorio_presenca'),
+    path('professor/relatorios/frequencia/', views.relatorio_frequencia, name='relatorio_frequencia'),
     path('professor/relatorios/graduacoes/', views.graduations_report, name='graduations_report'),
 ]
 
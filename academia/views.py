@@ -1,4 +1,6 @@
+import csv
 import datetime
+import hashlib
 import json
 from collections import defaultdict
 from datetime import timedelta
@@ -8,79 +10,86 @@ from django.contrib import messages
 from django.contrib.auth import login as auth_login, logout as auth_logout, authenticate
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponse
+from django.http import FileResponse, Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.db import transaction
 from django.db.models import Q, Case, When, Count
-from .models import User, Turma, AttendanceRequest, TurmaAluno, PlanoAula, Pedido, Item, Meta as MetaModel, Log, Graduation
-from .forms import ItemForm, PedidoForm, TurmaForm, SolicitacaoAcessoForm, PerfilEditForm, MetaForm
+from .models import User, Turma, AttendanceRequest, TurmaAluno, PlanoAula, Pedido, Item, Meta as MetaModel, Log, Graduation, Ranking, ReportJob
+from .forms import ItemForm, PedidoForm, TurmaForm, SolicitacaoAcessoForm, PerfilEditForm, MetaForm, RankingForm
 import calendar
-import openpyxl
-from openpyxl.utils import get_column_letter
-from xhtml2pdf import pisa
-from django.template.loader import get_template
 from io import BytesIO
 import uuid
 import os
 import time
 from django.conf import settings
 from .logs import create_log
+from .exports import xlsx_response
+from .notifications import invalidate_attendance
+from .rankings import compute_ranking, is_attendance_ranking
+from .accounts import get_account_snapshot
+from .attendance import classify_frequency, credited_classes, describe_consolidated, refresh_daily_summaries, roster_frequency
+from .report_cache import bump_data_version, cached_result, result_key
+from .snapshots import discard_snapshots
+from . import search, stock
+from .reports import (
+    aluno_pedidos_data, aluno_presenca_data, cached_page, graduacoes_data,
+    pedidos_data, presenca_data, report_cache_digest, report_params, reuse_report_file,
+)
 from PIL import Image
 from django.core.files.base import ContentFile
 from django.views.decorators.http import require_POST
 from django.contrib.auth.views import PasswordResetConfirmView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 
 # --- HELPERS ---
 
-WEEKDAYS = ['Seg', 'Ter', 'Qua', 'Qui', 'Sáb', 'Dom']
+WEEKDAYS = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+
+# Maior página aceita pelas listagens paginadas por cursor
+MAX_ITEMS_PER_PAGE = 100
+
+def _parse_cursor(cursor):
+    try:
+        date_str, pk = cursor.split('_')
+        return datetime.date.fromisoformat(date_str), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+def _make_cursor(obj):
+    return f'{obj.attendance_date.isoformat()}_{obj.pk}'
+
+def keyset_page(queryset, after=None, before=None, per_page=20):
+    """
+    Paginação por chave (attendance_date, id), do mais recente para o mais
+    antigo. Evita o OFFSET: cada página parte do último item da anterior.
+    """
+    after, before = _parse_cursor(after), _parse_cursor(before)
+
+    if before:
+        date, pk = before
+        rows = list(queryset.filter(
+            Q(attendance_date__gt=date) | Q(attendance_date=date, id__gt=pk)
+        ).order_by('attendance_date', 'id')[:per_page + 1])
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    else:
+        if after:
+            date, pk = after
+            queryset = queryset.filter(Q(attendance_date__lt=date) | Q(attendance_date=date, id__lt=pk))
+        rows = list(queryset.order_by('-attendance_date', '-id')[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = bool(after)
 
-def get_student_stats(student, start_date, end_date):
-    presencas_qs = AttendanceRequest.objects.filter(
-        student=student,
-        status='APR',
-        attendance_date__range=[start_date, end_date]
-    )
-    
-    total_presencas = 0
-    for p in presencas_qs:
-        if p.attendance_date.weekday() == 1:
-            if p.class_type == 'BOTH':
-                total_presencas += 2
-            else:
-                total_presencas += 1
-        else:
-            total_presencas += 1
-    
-    meta = MetaModel.objects.filter(
-        data_inicio__lte=end_date,
-        data_fim__gte=start_date
-    ).first()
-    
-    total_aulas = 0
-    total_ausencias = 0
-    porcentagem = 0
-    situacao = 'N/A'
-    
-    if meta:
-        total_aulas = meta.meta_aulas
-        if total_aulas > 0:
-            porcentagem = (total_presencas / total_aulas) * 100
-        
-        total_ausencias = total_aulas - total_presencas
-        if total_ausencias < 0: total_ausencias = 0
-        
-        if porcentagem < 20: situacao = 'Insatisfatório'
-        elif porcentagem < 40: situacao = 'Regular'
-        elif porcentagem < 60: situacao = 'Bom'
-        elif porcentagem < 80: situacao = 'Satisfatório'
-        else: situacao = 'Excelente'
-        
     return {
-        'total_aulas': total_aulas,
-        'total_presencas': total_presencas,
-        'total_ausencias': total_ausencias,
-        'porcentagem': round(porcentagem, 1),
-        'situacao': situacao
+        'object_list': rows,
+        'has_next': has_next and bool(rows),
+        'has_previous': has_previous and bool(rows),
+        'next_cursor': _make_cursor(rows[-1]) if rows else None,
+        'previous_cursor': _make_cursor(rows[0]) if rows else None,
     }
 
 def extract_class_type(reason):
@@ -89,11 +98,55 @@ def extract_class_type(reason):
     if '[TYPE: BOTH]' in reason: return 'As duas aulas'
     return 'N/A'
 
-def get_class_description(class_type):
-    if class_type == 'BOTH': return 'Integral'
-    if class_type == 'GI': return 'Gi'
-    if class_type == 'NOGI': return 'NoGi'
-    return '-'
+def month_window(year, month):
+    """Primeiro e último dia do mês."""
+    return datetime.date(year, month, 1), datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+def build_attendance_calendar(student, start_date, end_date):
+    """
+    Dados do calendário de presenças do aluno no período, agrupados por data,
+    em uma única consulta (turma e professor vêm no mesmo SELECT).
+    """
+    attendance_requests = AttendanceRequest.objects.filter(
+        student=student,
+        attendance_date__range=[start_date, end_date]
+    ).select_related('turma', 'processed_by').order_by('attendance_date', 'id')
+
+    attendance_data = defaultdict(list)
+    for req in attendance_requests:
+        attendance_data[req.attendance_date.strftime('%Y-%m-%d')].append({
+            'status': req.status,
+            'turma': req.turma.nome,
+            'reason': req.reason,
+            'processed_by': req.processed_by.get_full_name() if req.processed_by else None,
+            'processed_at': req.processed_at.strftime('%Y-%m-%d %H:%M') if req.processed_at else None,
+            'rejection_reason': req.rejection_reason,
+            'class_type': extract_class_type(req.reason),
+        })
+    return dict(attendance_data)
+
+def enqueue_pdf_report(request, report_type):
+    """
+    Enfileira a exportação em PDF para o worker (process_report_jobs) e
+    devolve na hora a página/JSON de acompanhamento do job. Se o mesmo
+    resultado já foi gerado e os dados não mudaram, o PDF é reaproveitado.
+    """
+    job = ReportJob.objects.create(
+        user=request.user,
+        report_type=report_type,
+        params=report_params(request.GET),
+        cache_key=report_cache_digest(report_type, request.GET, request.user),
+    )
+    if not reuse_report_file(job):
+        create_log(request.user, f'solicitou a exportação do {job.get_report_type_display().lower()} (PDF)')
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'id': job.id, 'status_url': reverse('report_job_status', args=[job.id])}, status=202)
+    return redirect('report_job_status', job_id=job.id)
+
+def get_view_names():
+    from .urls import urlpatterns
+    return sorted(p.name for p in urlpatterns if getattr(p, 'name', None))
 
 # --- VIEWS GERAIS ---
 
@@ -285,7 +338,7 @@ def switch_account(request, user_id):
 @login_required
 def switch_account_back(request):
     original_user_id = request.session.get('original_user_id')
-    if original_user_id:
+    if original_user_id and get_account_snapshot(original_user_id):
         original_user = get_object_or_404(User, id=original_user_id)
         
         create_log(original_user, f'encerrou o gerenciamento da conta de {request.user.get_full_name()}')
@@ -350,30 +403,11 @@ def dashboard(request):
         
         meta_ativa = MetaModel.objects.filter(data_inicio__lte=today, data_fim__gte=today).first()
         if meta_ativa:
-            presencas_no_periodo = AttendanceRequest.objects.filter(
-                student=request.user,
-                status='APR',
-                attendance_date__range=[meta_ativa.data_inicio, meta_ativa.data_fim]
-            ).count()
+            presencas_no_periodo = credited_classes(request.user, meta_ativa.data_inicio, meta_ativa.data_fim)
             
             percentual_presenca = (presencas_no_periodo / meta_ativa.meta_aulas) * 100 if meta_ativa.meta_aulas > 0 else 0
-            
-            if percentual_presenca < 20:
-                classificacao = 'Insatisfatório'
-                cor_classificacao = 'danger'
-            elif percentual_presenca < 40:
-                classificacao = 'Regular'
-                cor_classificacao = 'warning'
-            elif percentual_presenca < 60:
-                classificacao = 'Bom'
-                cor_classificacao = 'info'
-            elif percentual_presenca < 80:
-                classificacao = 'Satisfatório'
-                cor_classificacao = 'primary'
-            else:
-                classificacao = 'Excelente'
-                cor_classificacao = 'success'
-                
+            classificacao, cor_classificacao = classify_frequency(percentual_presenca)
+
             context.update({
                 'meta_ativa': meta_ativa,
                 'presencas_meta': presencas_no_periodo,
@@ -524,55 +558,96 @@ def aluno_marcar_presenca(request):
 
         limit_date = timezone.localdate() - timedelta(days=15)
 
+        # (data, tipo de aula) -> motivo, já validados e sem duplicatas
+        requested = {}
         for date_str in dates:
             try:
                 attendance_date = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
-                
-                if attendance_date < limit_date:
-                    messages.error(request, f'Não é possível solicitar presença para {attendance_date.strftime("%d/%m/%Y")}. O limite é de 15 dias retroativos.')
-                    continue
+            except ValueError:
+                messages.error(request, f'Formato de data inválido para {date_str}.')
+                continue
 
-                class_type_val = 'BOTH'
-                if attendance_date.weekday() == 1: # Tuesday
-                    class_type_val = request.POST.get(f'class_type_{date_str}', 'BOTH')
-                
-                reason_text = "Solicitação de presença pelo aluno."
-                if class_type_val != 'BOTH':
-                    reason_text += f" [TYPE: {class_type_val}]"
-                elif attendance_date.weekday() == 1:
-                    reason_text += " [TYPE: BOTH]"
+            if attendance_date < limit_date:
+                messages.error(request, f'Não é possível solicitar presença para {attendance_date.strftime("%d/%m/%Y")}. O limite é de 15 dias retroativos.')
+                continue
+
+            class_type_val = 'BOTH'
+            if attendance_date.weekday() == 1: # Tuesday
+                class_type_val = request.POST.get(f'class_type_{date_str}', 'BOTH')
+
+            reason_text = "Solicitação de presença pelo aluno."
+            if class_type_val != 'BOTH':
+                reason_text += f" [TYPE: {class_type_val}]"
+            elif attendance_date.weekday() == 1:
+                reason_text += " [TYPE: BOTH]"
+
+            requested[(attendance_date, class_type_val)] = reason_text
 
-                existing_request = AttendanceRequest.objects.filter(
+        with transaction.atomic():
+            # Envios simultâneos do mesmo aluno (duplo clique) passam um de cada vez
+            list(User.objects.select_for_update().filter(pk=request.user.pk).values_list('pk', flat=True))
+
+            # Uma consulta para todas as datas; as linhas ficam travadas até o fim
+            existing_requests = {
+                (req.attendance_date, req.class_type): req
+                for req in AttendanceRequest.objects.select_for_update().filter(
                     student=request.user,
                     turma=turma,
-                    attendance_date=attendance_date,
-                    class_type=class_type_val
-                ).first()
+                    attendance_date__in={key[0] for key in requested}
+                )
+            }
 
-                if existing_request:
-                    if existing_request.status == 'CAN':
-                        existing_request.status = 'PEN'
-                        existing_request.reason = reason_text
-                        existing_request.class_type = class_type_val
-                        existing_request.processed_by = None
-                        existing_request.processed_at = None
-                        existing_request.rejection_reason = ""
-                        existing_request.notified = False
-                        existing_request.save()
-                        messages.success(request, f'Presença para {attendance_date.strftime("%d/%m/%Y")} solicitada com sucesso!')
-                    else:
-                        messages.warning(request, f'Já existe uma solicitação de presença ({existing_request.get_status_display()}) para {attendance_date.strftime("%d/%m/%Y")} nesta turma.')
-                else:
-                    AttendanceRequest.objects.create(
+            to_create, to_revive = [], []
+            for (attendance_date, class_type_val), reason_text in sorted(requested.items()):
+                existing_request = existing_requests.get((attendance_date, class_type_val))
+                if existing_request is None:
+                    to_create.append(AttendanceRequest(
                         student=request.user, turma=turma,
                         attendance_date=attendance_date,
                         reason=reason_text,
                         class_type=class_type_val
-                    )
-                    messages.success(request, f'Presença para {attendance_date.strftime("%d/%m/%Y")} solicitada com sucesso!')
-            except ValueError:
-                messages.error(request, f'Formato de data inválido para {date_str}.')
-                continue
+                    ))
+                elif existing_request.status == 'CAN':
+                    existing_request.status = 'PEN'
+                    existing_request.reason = reason_text
+                    existing_request.processed_by = None
+                    existing_request.processed_at = None
+                    existing_request.rejection_reason = ""
+                    existing_request.notified = False
+                    to_revive.append(existing_request)
+                else:
+                    messages.warning(request, f'Já existe uma solicitação de presença ({existing_request.get_status_display()}) para {attendance_date.strftime("%d/%m/%Y")} nesta turma.')
+
+            if to_revive:
+                AttendanceRequest.objects.bulk_update(to_revive, ['status', 'reason', 'processed_by', 'processed_at', 'rejection_reason', 'notified'])
+            inserted = []
+            if to_create:
+                # ignore_conflicts: uma linha gravada em paralelo (ex.: pelo professor)
+                # não derruba o lote, mas é descartada em silêncio; relê o que foi
+                # de fato inserido para informar só essas datas.
+                AttendanceRequest.objects.bulk_create(to_create, ignore_conflicts=True)
+                new_keys = {(req.attendance_date, req.class_type) for req in to_create}
+                inserted = [
+                    req for req in AttendanceRequest.objects.filter(
+                        student=request.user,
+                        turma=turma,
+                        attendance_date__in={key[0] for key in new_keys},
+                        status='PEN',
+                    ).exclude(pk__in=[req.pk for req in existing_requests.values()])
+                    if (req.attendance_date, req.class_type) in new_keys
+                ]
+                for attendance_date, class_type_val in sorted(new_keys - {(req.attendance_date, req.class_type) for req in inserted}):
+                    messages.warning(request, f'Já existe uma solicitação de presença para {attendance_date.strftime("%d/%m/%Y")} nesta turma.')
+
+            changed = inserted + to_revive
+            if changed:
+                refresh_daily_summaries(changed)
+                discard_snapshots(req.attendance_date for req in changed)
+                invalidate_attendance(request.user.pk)
+                bump_data_version('attendance')
+
+        for req in sorted(changed, key=lambda req: req.attendance_date):
+            messages.success(request, f'Presença para {req.attendance_date.strftime("%d/%m/%Y")} solicitada com sucesso!')
         
         create_log(request.user, f'solicitou/alterou presença para {len(dates)} dia(s) na turma "{turma.nome}"')
         return redirect('aluno_presencas')
@@ -582,22 +657,8 @@ def aluno_marcar_presenca(request):
     month = today.month
     limit_date = today - timedelta(days=15)
 
-    all_attendance_requests = AttendanceRequest.objects.filter(student=request.user)
-    
-    attendance_data = {}
-    for req in all_attendance_requests:
-        date_str = req.attendance_date.strftime('%Y-%m-%d')
-        if date_str not in attendance_data:
-            attendance_data[date_str] = []
-        attendance_data[date_str].append({
-            'status': req.status,
-            'turma': req.turma.nome,
-            'reason': req.reason,
-            'processed_by': req.processed_by.get_full_name() if req.processed_by else None,
-            'processed_at': req.processed_at.strftime('%Y-%m-%d %H:%M') if req.processed_at else None,
-            'rejection_reason': req.rejection_reason,
-            'class_type': extract_class_type(req.reason),
-        })
+    # Apenas o mês atual vai embutido na página; os demais são buscados sob demanda
+    attendance_data = build_attendance_calendar(request.user, *month_window(year, month))
 
     turmas_aluno = TurmaAluno.objects.filter(aluno=request.user, status='APRO').select_related('turma')
     context = {
@@ -606,11 +667,54 @@ def aluno_marcar_presenca(request):
         'current_year': year,
         'current_month': month,
         'attendance_data_json': json.dumps(attendance_data),
+        'loaded_month': f'{year:04d}-{month:02d}',
         'limit_date': limit_date.strftime('%Y-%m-%d'),
         'today': today.strftime('%Y-%m-%d'),
     }
     return render(request, 'academia/aluno/marcar_presenca.html', context)
 
+@login_required
+def aluno_calendario_presenca(request):
+    """
+    JSON do calendário de presenças para um mês (?month=AAAA-MM) ou uma janela
+    (?start=AAAA-MM-DD&end=AAAA-MM-DD, até 93 dias). Responde com ETag para
+    que o navegador revalide e receba 304 quando nada mudou.
+    """
+    if not request.user.is_student():
+        return JsonResponse({'error': 'Permissão negada'}, status=403)
+
+    try:
+        if request.GET.get('start') or request.GET.get('end'):
+            start_date = datetime.datetime.strptime(request.GET.get('start', ''), '%Y-%m-%d').date()
+            end_date = datetime.datetime.strptime(request.GET.get('end', ''), '%Y-%m-%d').date()
+        else:
+            month = request.GET.get('month') or timezone.localdate().strftime('%Y-%m')
+            month_date = datetime.datetime.strptime(month, '%Y-%m').date()
+            start_date, end_date = month_window(month_date.year, month_date.month)
+    except ValueError:
+        return JsonResponse({'error': 'Período inválido'}, status=400)
+
+    if end_date < start_date or (end_date - start_date).days > 92:
+        return JsonResponse({'error': 'O período deve ter no máximo 93 dias'}, status=400)
+
+    payload = {
+        'start': start_date.strftime('%Y-%m-%d'),
+        'end': end_date.strftime('%Y-%m-%d'),
+        'days': build_attendance_calendar(request.user, start_date, end_date),
+    }
+    body = json.dumps(payload)
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    # Os dados mudam quando o professor processa as solicitações: o navegador
+    # guarda a resposta, mas sempre revalida (barato, via 304).
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
 @login_required
 def get_attendance_details(request):
     if not request.user.is_student():
@@ -670,7 +774,8 @@ def aluno_presencas(request):
     if not request.user.is_student():
         raise PermissionDenied
     
-    AttendanceRequest.objects.filter(student=request.user, status='APR', notified=False).update(notified=True)
+    if AttendanceRequest.objects.filter(student=request.user, status='APR', notified=False).update(notified=True):
+        invalidate_attendance(request.user.pk)
     
     attendance_requests_list = AttendanceRequest.objects.filter(student=request.user).exclude(status='CAN').select_related('turma').order_by('-attendance_date')
 
@@ -715,11 +820,15 @@ def aluno_pedido_novo(request):
             
             pedido.aluno = request.user
             pedido.final_value = item.valor * pedido.quantidade if item.valor else None
-            pedido.save()
-            
-            create_log(request.user, f'realizou pedido de {pedido.quantidade}x {item.nome}')
-            messages.success(request, f'Pedido de "{item.nome}" realizado com sucesso! O item está reservado para você por 15 dias.')
-            return redirect('aluno_pedidos')
+            try:
+                stock.create_order(pedido)
+            except stock.InsufficientStock as e:
+                # Outro pedido levou o estoque entre a validação e a reserva
+                form.add_error('quantidade', str(e))
+            else:
+                create_log(request.user, f'realizou pedido de {pedido.quantidade}x {item.nome}')
+                messages.success(request, f'Pedido de "{item.nome}" realizado com sucesso! O item está reservado para você por 15 dias.')
+                return redirect('aluno_pedidos')
     else:
         form = PedidoForm()
 
@@ -734,17 +843,13 @@ def aluno_pedido_cancelar(request, pedido_id):
     if request.method == 'POST':
         pedido = get_object_or_404(Pedido, id=pedido_id, aluno=request.user)
 
-        if pedido.status == 'PEND':
-            item = pedido.item
-            item.quantidade += pedido.quantidade
-            item.save()
-
-            pedido.status = 'CANC'
-            pedido.save()
-            create_log(request.user, f'cancelou pedido de {item.nome}')
-            messages.success(request, 'Pedido cancelado com sucesso e item devolvido ao estoque.')
-        else:
+        try:
+            stock.transition(pedido, 'CANC', from_statuses=('PEND',))
+        except stock.InvalidTransition:
             messages.error(request, 'Apenas pedidos pendentes podem ser cancelados.')
+        else:
+            create_log(request.user, f'cancelou pedido de {pedido.item.nome}')
+            messages.success(request, 'Pedido cancelado com sucesso e item devolvido ao estoque.')
 
     return redirect('aluno_pedidos')
 
@@ -807,150 +912,26 @@ def aluno_relatorio_presenca(request):
     if not request.user.is_student():
         raise PermissionDenied
 
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date')
     export_format = request.GET.get('export')
-    order = request.GET.get('order', 'desc')
-
-    today = datetime.date.today()
-    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today.replace(day=1)
-    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else today
-
-    presencas = AttendanceRequest.objects.filter(
-        student=request.user,
-        attendance_date__range=[start_date, end_date]
-    ).exclude(status='CAN').order_by('attendance_date')
-
-    grouped_data = {}
-    for presenca in presencas:
-        date_key = presenca.attendance_date
-        if date_key not in grouped_data:
-            grouped_data[date_key] = []
-        grouped_data[date_key].append(presenca)
-
-    report_data = []
-    for date_key, presencas_list in grouped_data.items():
-        is_tuesday = date_key.weekday() == 1
-        
-        status_final = 'APR'
-        motivo_final = ""
-        qty_final = 0
-        
-        apr_count = 0
-        rej_count = 0
-        types_apr = []
-        
-        for p in presencas_list:
-            if p.status == 'APR':
-                apr_count += 1
-                types_apr.append(p.class_type)
-            elif p.status == 'REJ':
-                rej_count += 1
-        
-        if is_tuesday:
-            if apr_count > 0:
-                if 'BOTH' in types_apr or ('GI' in types_apr and 'NOGI' in types_apr):
-                    qty_final = 2
-                    motivo_final = "Integral"
-                    status_final = 'APR'
-                elif 'GI' in types_apr:
-                    qty_final = 1
-                    motivo_final = "Presente apenas na aula com Kimono"
-                    status_final = 'APR'
-                elif 'NOGI' in types_apr:
-                    qty_final = 1
-                    motivo_final = "Presente apenas na aula sem Kimono"
-                    status_final = 'APR'
-                else:
-                    qty_final = 1
-                    motivo_final = get_class_description(types_apr[0])
-                    status_final = 'APR'
-            else:
-                qty_final = 0
-                motivo_final = "Aluno ausente neste dia"
-                if rej_count > 0:
-                    first_rej = next((p for p in presencas_list if p.status == 'REJ'), None)
-                    status_final = 'REJ'
-                    if first_rej and first_rej.rejection_reason:
-                         motivo_final += f" ({first_rej.rejection_reason})"
-                else:
-                     status_final = 'PEN'
-        else:
-            if apr_count > 0:
-                qty_final = 1
-                motivo_final = get_class_description(presencas_list[0].class_type)
-                status_final = 'APR'
-            else:
-                qty_final = 0
-                p = presencas_list[0]
-                descricao_aula = get_class_description(p.class_type)
-                if p.status == 'REJ':
-                    status_final = 'REJ'
-                    if p.rejection_reason:
-                        motivo_final = f"{descricao_aula} - Ausente ({p.rejection_reason})"
-                    else:
-                        motivo_final = f"{descricao_aula} - Ausente"
-                else:
-                    status_final = p.status
-                    motivo_final = descricao_aula
-
-        report_data.append({
-            'data': date_key,
-            'status': dict(AttendanceRequest.STATUS_CHOICES).get(status_final, status_final),
-            'motivo': motivo_final,
-            'qty': qty_final
-        })
-        
-    reverse = True if order == 'desc' else False
-    report_data.sort(key=lambda x: x['data'], reverse=reverse)
+    data = aluno_presenca_data(request.user, request.GET)
+    cache_digest = report_cache_digest('aluno_presenca', request.GET, request.user)
+    start_date, end_date, order = data['start_date'], data['end_date'], data['order']
+    consolidated = data['consolidated']
 
     if export_format == 'pdf':
-        create_log(request.user, 'exportou relatório de presenças (PDF)')
-        
-        stats = get_student_stats(request.user, start_date, end_date)
-        
-        template = get_template('academia/aluno/relatorio_presenca_pdf.html')
-        context = {
-            'report_data': report_data,
-            'report_title': 'Relatório de Presenças',
-            'start_date': start_date,
-            'end_date': end_date,
-            'user': request.user,
-            'stats': stats
-        }
-        html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_presencas.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err:
-            return HttpResponse('We had some errors <pre>' + html + '</pre>')
-        return response
+        return enqueue_pdf_report(request, 'aluno_presenca')
 
     if export_format == 'xlsx':
         create_log(request.user, 'exportou relatório de presenças (XLSX)')
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_presencas.xlsx"'
-
-        workbook = openpyxl.Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Relatório de Presenças'
-
-        headers = ["Data", "Status", "Motivo", "Quantidade"]
-        for col_num, header_title in enumerate(headers, 1):
-            cell = worksheet.cell(row=1, column=col_num)
-            cell.value = header_title
-            worksheet.column_dimensions[get_column_letter(col_num)].width = 20
-
-        for row_num, data in enumerate(report_data, 2):
-            weekday = WEEKDAYS[data['data'].weekday()]
-            worksheet.cell(row=row_num, column=1, value=f"{data['data'].strftime('%d/%m/%Y')} {weekday}")
-            worksheet.cell(row=row_num, column=2, value=data['aluno'])
-            worksheet.cell(row=row_num, column=3, value=data['status'])
-            worksheet.cell(row=row_num, column=4, value=data['motivo'])
-            worksheet.cell(row=row_num, column=5, value=data['qty'])
-
-        workbook.save(response)
-        return response
+        report_data = (describe_consolidated(row) for row in consolidated.iterator(chunk_size=2000))
+        return xlsx_response(
+            'relatorio_presencas.xlsx',
+            'Relatório de Presenças',
+            ["Data", "Status", "Motivo", "Quantidade"],
+            ([f"{data['data'].strftime('%d/%m/%Y')} {WEEKDAYS[data['data'].weekday()]}", data['status'], data['motivo'], data['qty']] for data in report_data),
+            column_width=20,
+            cache_key=result_key(cache_digest, 'xlsx'),
+        )
 
     items_per_page = request.GET.get('items_per_page', 10)
     try:
@@ -958,14 +939,10 @@ def aluno_relatorio_presenca(request):
     except ValueError:
         items_per_page = 10
 
-    paginator = Paginator(report_data, items_per_page)
-    page = request.GET.get('page')
-    try:
-        report_data_page = paginator.page(page)
-    except PageNotAnInteger:
-        report_data_page = paginator.page(1)
-    except EmptyPage:
-        report_data_page = paginator.page(paginator.num_pages)
+    report_data_page = cached_page(
+        cache_digest, consolidated, items_per_page, request.GET.get('page'),
+        lambda rows: [describe_consolidated(row) for row in rows],
+    )
 
     context = {
         'report_data': report_data_page,
@@ -982,64 +959,30 @@ def aluno_relatorio_pedidos(request):
     if not request.user.is_student():
         raise PermissionDenied
     
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date')
     export_format = request.GET.get('export')
-
-    today = datetime.date.today()
-    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today.replace(day=1)
-    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else today
-
-    pedidos = Pedido.objects.filter(
-        aluno=request.user,
-        data_solicitacao__date__range=[start_date, end_date]
-    ).order_by('-data_solicitacao')
+    data = aluno_pedidos_data(request.user, request.GET)
+    cache_digest = report_cache_digest('aluno_pedidos', request.GET, request.user)
+    start_date, end_date, pedidos = data['start_date'], data['end_date'], data['pedidos']
 
     if export_format == 'pdf':
-        create_log(request.user, 'exportou relatório de pedidos (PDF)')
-        template = get_template('academia/aluno/relatorio_pedidos_pdf.html')
-        context = {
-            'pedidos': pedidos,
-            'report_title': 'Relatório de pedidos',
-            'start_date': start_date,
-            'end_date': end_date,
-            'user': request.user
-        }
-        html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_pedidos.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err:
-            return HttpResponse('We had some errors <pre>' + html + '</pre>')
-        return response
+        return enqueue_pdf_report(request, 'aluno_pedidos')
 
     if export_format == 'xlsx':
         create_log(request.user, 'exportou relatório de pedidos (XLSX)')
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_pedidos.xlsx"'
-        
-        workbook = openpyxl.Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Relatório de Pedidos'
-        
-        headers = ["Data do pedido", "Produto", "Quantidade", "Valor Total", "Status", "Desfecho"]
-        for col_num, header_title in enumerate(headers, 1):
-            cell = worksheet.cell(row=1, column=col_num)
-            cell.value = header_title
-            worksheet.column_dimensions[get_column_letter(col_num)].width = 25
-
-        for row_num, pedido in enumerate(pedidos, 2):
-            desfecho = pedido.rejection_reason or pedido.cancellation_reason or "-"
-            worksheet.cell(row=row_num, column=1, value=pedido.data_solicitacao.strftime('%d/%m/%Y %H:%M'))
-            worksheet.cell(row=row_num, column=2, value=pedido.aluno.get_full_name())
-            worksheet.cell(row=row_num, column=3, value=pedido.item.nome)
-            worksheet.cell(row=row_num, column=4, value=pedido.quantidade)
-            worksheet.cell(row=row_num, column=5, value=pedido.final_value)
-            worksheet.cell(row=row_num, column=6, value=pedido.get_status_display())
-            worksheet.cell(row=row_num, column=7, value=desfecho)
-
-        workbook.save(response)
-        return response
+        return xlsx_response(
+            'relatorio_pedidos.xlsx',
+            'Relatório de Pedidos',
+            ["Data do pedido", "Produto", "Quantidade", "Valor Total", "Status", "Desfecho"],
+            ([
+                pedido.data_solicitacao.strftime('%d/%m/%Y %H:%M'),
+                pedido.item.nome,
+                pedido.quantidade,
+                pedido.final_value,
+                pedido.get_status_display(),
+                pedido.rejection_reason or pedido.cancellation_reason or "-",
+            ] for pedido in pedidos.iterator(chunk_size=2000)),
+            cache_key=result_key(cache_digest, 'xlsx'),
+        )
 
     items_per_page = request.GET.get('items_per_page', 10)
     try:
@@ -1047,14 +990,7 @@ def aluno_relatorio_pedidos(request):
     except ValueError:
         items_per_page = 10
 
-    paginator = Paginator(pedidos, items_per_page)
-    page = request.GET.get('page')
-    try:
-        pedidos_page = paginator.page(page)
-    except PageNotAnInteger:
-        pedidos_page = paginator.page(1)
-    except EmptyPage:
-        pedidos_page = paginator.page(paginator.num_pages)
+    pedidos_page = cached_page(cache_digest, pedidos, items_per_page, request.GET.get('page'))
 
     context = {
         'pedidos': pedidos_page,
@@ -1065,6 +1001,30 @@ def aluno_relatorio_pedidos(request):
     }
     return render(request, 'academia/aluno/relatorio_pedidos.html', context)
 
+# --- EXPORTAÇÕES EM SEGUNDO PLANO ---
+
+@login_required
+def report_job_status(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.GET.get('format') == 'json':
+        return JsonResponse({
+            'id': job.id,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'download_url': reverse('report_job_download', args=[job.id]) if job.status == 'CON' else None,
+            'error': job.error or None,
+        })
+
+    return render(request, 'academia/report_job.html', {'job': job})
+
+@login_required
+def report_job_download(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id, user=request.user, status='CON')
+    if not os.path.exists(job.file_path):
+        raise Http404('O arquivo deste relatório expirou.')
+    return FileResponse(open(job.file_path, 'rb'), as_attachment=True, filename=job.filename, content_type='application/pdf')
+
 # --- PAINEL DO PROFESSOR ---
 
 @login_required
@@ -1209,11 +1169,7 @@ def professor_alunos(request):
     
     query = request.GET.get('q')
     if query:
-        alunos_list = alunos_list.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query)
-        )
+        alunos_list = search.search(alunos_list, query)
     
     items_per_page = request.GET.get('items_per_page', 10)
     try:
@@ -1254,11 +1210,7 @@ def promover_aluno(request):
     
     query = request.GET.get('q')
     if query:
-        alunos_list = alunos_list.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query)
-        )
+        alunos_list = search.search(alunos_list, query)
     
     items_per_page = request.GET.get('items_per_page', 10)
     try:
@@ -1393,11 +1345,78 @@ def professor_presencas(request):
         raise PermissionDenied
 
     query = AttendanceRequest.objects.filter(status='PEN')
-    
-    pending_requests = query.select_related('student', 'turma').order_by('-attendance_date')
-    return render(request, 'academia/professor/presencas.html', {'pending_requests': pending_requests})
+
+    turma_id = request.GET.get('turma', '')
+    aluno = request.GET.get('aluno', '').strip()
+    start_date = request.GET.get('start_date', '')
+    end_date = request.GET.get('end_date', '')
+
+    # Filtros inválidos na URL são ignorados em vez de virar erro 500
+    if not turma_id.isdigit():
+        turma_id = ''
+    try:
+        if start_date:
+            datetime.datetime.strptime(start_date, '%Y-%m-%d')
+    except ValueError:
+        start_date = ''
+    try:
+        if end_date:
+            datetime.datetime.strptime(end_date, '%Y-%m-%d')
+    except ValueError:
+        end_date = ''
+
+    if turma_id:
+        query = query.filter(turma_id=turma_id)
+    if aluno:
+        query = query.filter(
+            Q(student__first_name__icontains=aluno) |
+            Q(student__last_name__icontains=aluno) |
+            Q(student__username__icontains=aluno)
+        )
+    if start_date:
+        query = query.filter(attendance_date__gte=start_date)
+    if end_date:
+        query = query.filter(attendance_date__lte=end_date)
+
+    items_per_page = request.GET.get('items_per_page', 20)
+    try:
+        items_per_page = min(max(int(items_per_page), 1), MAX_ITEMS_PER_PAGE)
+    except ValueError:
+        items_per_page = 20
+
+    page = keyset_page(
+        query.select_related('student', 'turma'),
+        request.GET.get('after'),
+        request.GET.get('before'),
+        items_per_page,
+    )
+
+    # Parâmetros do filtro atual, sem o cursor, para montar os links de navegação
+    filters = request.GET.copy()
+    for key in ('after', 'before'):
+        filters.pop(key, None)
+
+    context = {
+        'pending_requests': page['object_list'],
+        'page': page,
+        'total_pending': query.count(),
+        'filters': filters.urlencode(),
+        'turmas': Turma.objects.order_by('nome'),
+        'turma_id': turma_id,
+        'aluno': aluno,
+        'start_date': start_date,
+        'end_date': end_date,
+        'items_per_page': items_per_page,
+        'is_partial': request.headers.get('x-requested-with') == 'XMLHttpRequest',
+    }
+
+    if context['is_partial']:
+        return render(request, 'academia/professor/partials/presencas_list.html', context)
+
+    return render(request, 'academia/professor/presencas.html', context)
 
 @login_required
+@transaction.atomic
 def professor_presenca_aprovar(request, request_id):
     if not request.user.is_professor_or_admin():
         raise PermissionDenied
@@ -1421,6 +1440,7 @@ def professor_presenca_aprovar(request, request_id):
     return redirect('professor_presencas')
 
 @login_required
+@transaction.atomic
 def professor_presenca_rejeitar(request, request_id):
     if not request.user.is_professor_or_admin():
         raise PermissionDenied
@@ -1496,6 +1516,118 @@ def professor_presenca_rejeitar(request, request_id):
     
     return redirect('professor_presencas')
 
+@login_required
+@require_POST
+def professor_presencas_lote(request):
+    """
+    Aprova ou rejeita várias solicitações pendentes de uma vez, com a mesma
+    regra de divisão da terça-feira usada em professor_presenca_rejeitar.
+    """
+    if not request.user.is_professor_or_admin():
+        raise PermissionDenied
+
+    action = request.POST.get('action')
+    if action not in ('approve', 'reject'):
+        messages.error(request, 'Ação em lote inválida.')
+        return redirect('professor_presencas')
+
+    request_ids = [int(value) for value in request.POST.getlist('request_ids') if value.isdigit()]
+    if not request_ids:
+        messages.warning(request, 'Nenhuma solicitação selecionada.')
+        return redirect('professor_presencas')
+
+    reason = request.POST.get('rejection_reason') or 'Sem motivo especificado.'
+    rejection_scope = request.POST.get('rejection_scope', 'both')
+    now = timezone.now()
+
+    with transaction.atomic():
+        pending = list(
+            AttendanceRequest.objects.select_for_update(of=('self',))
+            .filter(id__in=request_ids, status='PEN')
+            .select_related('student')
+        )
+
+        skipped = []
+        if action == 'approve':
+            # Status dos alunos já veio no select_related: checado uma única vez por lote
+            inactive = {req.student_id for req in pending if req.student.status != 'ATIVO'}
+            skipped = sorted({req.student.get_full_name() for req in pending if req.student_id in inactive})
+            pending = [req for req in pending if req.student_id not in inactive]
+
+        created = []
+        split_count = 0
+        for req in pending:
+            req.processed_by = request.user
+            req.processed_at = now
+            if action == 'approve':
+                req.status = 'APR'
+                req.notified = False
+                continue
+
+            is_split = (
+                rejection_scope in ('first', 'second')
+                and req.attendance_date.weekday() == 1
+                and req.class_type == 'BOTH'
+            )
+            if is_split:
+                rejected_type, approved_type = ('GI', 'NOGI') if rejection_scope == 'first' else ('NOGI', 'GI')
+                created.append(AttendanceRequest(
+                    student_id=req.student_id,
+                    turma_id=req.turma_id,
+                    attendance_date=req.attendance_date,
+                    reason=f"Solicitação de presença pelo aluno. [TYPE: {rejected_type}]",
+                    class_type=rejected_type,
+                    status='REJ',
+                    rejection_reason=reason,
+                    processed_by=request.user,
+                    processed_at=now,
+                ))
+                req.reason = f"Solicitação de presença pelo aluno. [TYPE: {approved_type}]"
+                req.class_type = approved_type
+                req.status = 'APR'
+                req.notified = False
+                split_count += 1
+            else:
+                req.status = 'REJ'
+                req.rejection_reason = reason
+
+        if pending:
+            AttendanceRequest.objects.bulk_update(
+                pending,
+                ['status', 'class_type', 'reason', 'rejection_reason', 'processed_by', 'processed_at', 'notified'],
+                batch_size=500,
+            )
+        if created:
+            AttendanceRequest.objects.bulk_create(created, batch_size=500)
+
+        # bulk_update/bulk_create não disparam sinais
+        refresh_daily_summaries(pending)
+        discard_snapshots(req.attendance_date for req in pending)
+        invalidate_attendance(*{req.student_id for req in pending})
+        bump_data_version('attendance')
+
+        if pending:
+            if action == 'approve':
+                summary = f'aprovou {len(pending)} presença(s) em lote'
+            else:
+                summary = f'rejeitou {len(pending) - split_count} presença(s) em lote'
+                if split_count:
+                    aula = '1ª' if rejection_scope == 'first' else '2ª'
+                    summary += f' e rejeitou apenas a {aula} aula de {split_count} presença(s) de terça'
+            dates = sorted({req.attendance_date for req in pending})
+            summary += f' ({dates[0].strftime("%d/%m/%Y")} a {dates[-1].strftime("%d/%m/%Y")})'
+            create_log(request.user, summary)
+
+    if pending:
+        verb = 'aprovada(s)' if action == 'approve' else 'processada(s)'
+        messages.success(request, f'{len(pending)} solicitação(ões) de presença {verb}.')
+    else:
+        messages.warning(request, 'Nenhuma solicitação pendente foi processada.')
+    if skipped:
+        messages.error(request, f'Não é possível aprovar a presença de alunos desativados: {", ".join(skipped)}.')
+
+    return redirect('professor_presencas')
+
 @login_required
 def professor_planos_aula(request):
     if not request.user.is_professor_or_admin():
@@ -1522,13 +1654,53 @@ def professor_plano_aula_editar(request, plano_id):
 def professor_rankings(request):
     if not request.user.is_professor_or_admin():
         raise PermissionDenied
-    return render(request, 'academia/professor/rankings.html', {'rankings': []})
+    rankings = Ranking.objects.select_related('turma').annotate(participantes=Count('posicoes'))
+    return render(request, 'academia/professor/rankings.html', {'rankings': rankings})
 
 @login_required
 def professor_ranking_novo(request):
     if not request.user.is_professor_or_admin():
         raise PermissionDenied
-    return render(request, 'academia/professor/ranking_form.html')
+
+    if request.method == 'POST':
+        form = RankingForm(request.POST)
+        if form.is_valid():
+            with transaction.atomic():
+                ranking = form.save()
+                compute_ranking(ranking)
+            create_log(request.user, f'criou o ranking "{ranking.titulo}"')
+            messages.success(request, 'Ranking criado com sucesso!')
+            return redirect('professor_ranking_detalhe', ranking_id=ranking.id)
+    else:
+        form = RankingForm()
+
+    return render(request, 'academia/professor/ranking_form.html', {'form': form, 'turmas': Turma.objects.order_by('nome')})
+
+@login_required
+def professor_ranking_detalhe(request, ranking_id):
+    if not request.user.is_professor_or_admin():
+        raise PermissionDenied
+
+    ranking = get_object_or_404(Ranking.objects.select_related('turma'), id=ranking_id)
+    posicoes = ranking.posicoes.select_related('aluno').order_by('posicao', 'aluno__first_name', 'aluno__last_name')
+    return render(request, 'academia/professor/ranking_detalhe.html', {
+        'ranking': ranking,
+        'posicoes': posicoes,
+        'calculado': is_attendance_ranking(ranking),
+    })
+
+@login_required
+@require_POST
+def professor_ranking_recalcular(request, ranking_id):
+    if not request.user.is_professor_or_admin():
+        raise PermissionDenied
+
+    ranking = get_object_or_404(Ranking, id=ranking_id)
+    with transaction.atomic():
+        compute_ranking(ranking)
+    create_log(request.user, f'recalculou o ranking "{ranking.titulo}"')
+    messages.success(request, 'Ranking recalculado com sucesso!')
+    return redirect('professor_ranking_detalhe', ranking_id=ranking.id)
 
 @login_required
 def professor_pedidos(request):
@@ -1539,11 +1711,7 @@ def professor_pedidos(request):
 
     query = request.GET.get('q')
     if query:
-        pedidos_list = pedidos_list.filter(
-            Q(aluno__first_name__icontains=query) |
-            Q(aluno__last_name__icontains=query) |
-            Q(item__nome__icontains=query)
-        )
+        pedidos_list = search.search(pedidos_list, query)
 
     items_per_page = request.GET.get('items_per_page', 10)
     try:
@@ -1575,12 +1743,13 @@ def professor_pedido_aprovar(request, pedido_id):
     
     pedido = get_object_or_404(Pedido, pk=pedido_id)
     if request.method == 'POST':
-        pedido.status = 'APRO'
-        pedido.aprovado_por = request.user
-        pedido.data_aprovacao = timezone.now()
-        pedido.save()
-        create_log(request.user, f'aprovou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
-        messages.success(request, 'Pedido atendido com sucesso!')
+        try:
+            stock.transition(pedido, 'APRO', aprovado_por=request.user, data_aprovacao=timezone.now())
+        except stock.InvalidTransition as e:
+            messages.error(request, str(e))
+        else:
+            create_log(request.user, f'aprovou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
+            messages.success(request, 'Pedido atendido com sucesso!')
     
     return redirect('professor_pedidos')
 
@@ -1591,16 +1760,13 @@ def professor_pedido_rejeitar(request, pedido_id):
     
     pedido = get_object_or_404(Pedido, pk=pedido_id)
     if request.method == 'POST':
-        if pedido.status == 'PEND':
-            item = pedido.item
-            item.quantidade += pedido.quantidade
-            item.save()
-
-        pedido.status = 'REJE'
-        pedido.rejection_reason = request.POST.get('rejection_reason', 'Sem motivo especificado.')
-        pedido.save()
-        create_log(request.user, f'rejeitou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
-        messages.success(request, 'Pedido rejeitado e estoque atualizado.')
+        try:
+            stock.transition(pedido, 'REJE', rejection_reason=request.POST.get('rejection_reason', 'Sem motivo especificado.'))
+        except stock.InvalidTransition as e:
+            messages.error(request, str(e))
+        else:
+            create_log(request.user, f'rejeitou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
+            messages.success(request, 'Pedido rejeitado e estoque atualizado.')
 
     return redirect('professor_pedidos')
 
@@ -1611,11 +1777,13 @@ def professor_pedido_cancelar(request, pedido_id):
     
     pedido = get_object_or_404(Pedido, pk=pedido_id)
     if request.method == 'POST':
-        pedido.status = 'CANC'
-        pedido.cancellation_reason = request.POST.get('cancellation_reason', 'Sem motivo especificado.')
-        pedido.save()
-        create_log(request.user, f'cancelou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
-        messages.success(request, 'Pedido cancelado com sucesso!')
+        try:
+            stock.transition(pedido, 'CANC', cancellation_reason=request.POST.get('cancellation_reason', 'Sem motivo especificado.'))
+        except stock.InvalidTransition as e:
+            messages.error(request, str(e))
+        else:
+            create_log(request.user, f'cancelou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
+            messages.success(request, 'Pedido cancelado com sucesso!')
 
     return redirect('professor_pedidos')
 
@@ -1626,20 +1794,15 @@ def professor_pedido_entregar(request, pedido_id):
     
     pedido = get_object_or_404(Pedido, pk=pedido_id)
     if request.method == 'POST':
-        if pedido.item.quantidade is not None:
-            if pedido.quantidade > pedido.item.quantidade:
-                messages.error(request, 'Não há estoque suficiente para entregar este pedido.')
-                return redirect('professor_pedidos')
-            pedido.item.quantidade -= pedido.quantidade
-            pedido.item.save()
-        
-        if final_value := request.POST.get('final_value'):
-            pedido.final_value = final_value
-        
-        pedido.status = 'ENTR'
-        pedido.save()
-        create_log(request.user, f'marcou como entregue o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
-        messages.success(request, 'Pedido marcado como entregue!')
+        # As unidades já estão reservadas desde a criação do pedido
+        fields = {'final_value': final_value} if (final_value := request.POST.get('final_value')) else {}
+        try:
+            stock.transition(pedido, 'ENTR', **fields)
+        except stock.InvalidTransition as e:
+            messages.error(request, str(e))
+        else:
+            create_log(request.user, f'marcou como entregue o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
+            messages.success(request, 'Pedido marcado como entregue!')
 
     return redirect('professor_pedidos')
 
@@ -1650,10 +1813,13 @@ def professor_pedido_finalizar(request, pedido_id):
     
     pedido = get_object_or_404(Pedido, pk=pedido_id)
     if request.method == 'POST':
-        pedido.status = 'FINA'
-        pedido.save()
-        create_log(request.user, f'finalizou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
-        messages.success(request, 'Pedido finalizado com sucesso!')
+        try:
+            stock.transition(pedido, 'FINA')
+        except stock.InvalidTransition as e:
+            messages.error(request, str(e))
+        else:
+            create_log(request.user, f'finalizou o pedido de {pedido.aluno.get_full_name()} ({pedido.item.nome})')
+            messages.success(request, 'Pedido finalizado com sucesso!')
 
     return redirect('professor_pedidos')
 
@@ -1666,9 +1832,7 @@ def professor_itens(request):
 
     query = request.GET.get('q')
     if query:
-        itens_list = itens_list.filter(
-            Q(nome__icontains=query)
-        )
+        itens_list = search.search(itens_list, query)
     
     items_per_page = request.GET.get('items_per_page', 10)
     try:
@@ -1701,6 +1865,7 @@ def professor_item_novo(request):
         form = ItemForm(request.POST)
         if form.is_valid():
             item = form.save()
+            stock.record_count(item.pk, kind=stock.RESTOCK)
             create_log(request.user, f'criou o item "{item.nome}"')
             messages.success(request, 'Item criado com sucesso!')
             return redirect('professor_itens')
@@ -1716,10 +1881,22 @@ def professor_item_editar(request, item_id):
     if request.method == 'POST':
         form = ItemForm(request.POST, instance=item)
         if form.is_valid():
-            form.save()
-            create_log(request.user, f'editou o item "{item.nome}"')
-            messages.success(request, 'Item atualizado com sucesso!')
-            return redirect('professor_itens')
+            shown, typed = form.cleaned_data['quantidade_exibida'], form.cleaned_data['quantidade']
+            item = form.save(commit=False)
+            try:
+                with transaction.atomic():
+                    if shown is None or typed is None:
+                        item.save()
+                        stock.record_count(item.pk)
+                    else:
+                        item.save(update_fields=['nome', 'tipo', 'valor'])
+                        stock.adjust(item.pk, typed - shown)
+            except stock.InsufficientStock as e:
+                form.add_error('quantidade', str(e))
+            else:
+                create_log(request.user, f'editou o item "{item.nome}"')
+                messages.success(request, 'Item atualizado com sucesso!')
+                return redirect('professor_itens')
     else:
         form = ItemForm(instance=item)
     return render(request, 'academia/professor/item_form.html', {'form': form})
@@ -1744,72 +1921,91 @@ def professor_relatorios(request):
     return render(request, 'academia/professor/relatorios.html')
 
 @login_required
-def relatorio_pedidos(request):
+def relatorio_frequencia(request):
+    """
+    Frequência de todos os alunos ativos (ou de uma turma) frente a uma meta,
+    ordenável por nome ou presenças, com exportação XLSX.
+    """
     if not request.user.is_professor_or_admin():
         raise PermissionDenied
 
-    base_query = Pedido.objects.all()
-
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date')
-    group_by_aluno = request.GET.get('group_by_aluno')
+    metas = MetaModel.objects.all()
+    meta_id = request.GET.get('meta')
+    turma_id = request.GET.get('turma')
+    sort = request.GET.get('sort', 'nome')
     export_format = request.GET.get('export')
 
-    today = datetime.date.today()
-    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today.replace(day=1)
-    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else today
+    # IDs não numéricos não existem: 404 em vez do ValueError da consulta
+    if (meta_id and not meta_id.isdigit()) or (turma_id and not turma_id.isdigit()):
+        raise Http404
+    if meta_id:
+        meta = get_object_or_404(MetaModel, id=meta_id)
+    else:
+        today = timezone.localdate()
+        meta = metas.filter(data_inicio__lte=today, data_fim__gte=today).first() or metas.first()
+
+    turma = get_object_or_404(Turma, id=turma_id) if turma_id else None
+    roster = roster_frequency(meta, turma, sort) if meta else []
+
+    if export_format == 'xlsx' and meta:
+        create_log(request.user, f'exportou relatório de frequência da meta "{meta.titulo}" (XLSX)')
+        return xlsx_response(
+            'relatorio_frequencia.xlsx',
+            'Frequência',
+            ["Aluno", "Total de Aulas", "Presenças", "Ausências", "Frequência (%)", "Situação"],
+            ([
+                row['student'].get_full_name(),
+                row['total_aulas'],
+                row['total_presencas'],
+                row['total_ausencias'],
+                row['porcentagem'],
+                row['situacao'],
+            ] for row in roster),
+        )
+
+    context = {
+        'roster': roster,
+        'meta': meta,
+        'metas': metas,
+        'turma': turma,
+        'turmas': Turma.objects.order_by('nome'),
+        'sort': sort,
+    }
+    return render(request, 'academia/professor/relatorio_frequencia.html', context)
+
+@login_required
+def relatorio_pedidos(request):
+    if not request.user.is_professor_or_admin():
+        raise PermissionDenied
 
-    pedidos = base_query.filter(
-        data_solicitacao__date__range=[start_date, end_date]
-    ).order_by('data_solicitacao', 'aluno__first_name', 'aluno__last_name').select_related('aluno', 'item')
+    group_by_aluno = request.GET.get('group_by_aluno')
+    export_format = request.GET.get('export')
+    data = pedidos_data(request.GET)
+    cache_digest = report_cache_digest('pedidos', request.GET, request.user)
+    start_date, end_date, pedidos = data['start_date'], data['end_date'], data['pedidos']
 
     if export_format == 'pdf':
-        create_log(request.user, 'exportou relatório de pedidos (PDF)')
-        template = get_template('academia/professor/relatorio_pedidos_pdf.html')
-        context = {
-            'pedidos': pedidos,
-            'report_title': 'Relatório de Pedidos',
-            'start_date': start_date,
-            'end_date': end_date,
-            'grouped': False
-        }
-        html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_pedidos.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err:
-            return HttpResponse('We had some errors <pre>' + html + '</pre>')
-        return response
+        return enqueue_pdf_report(request, 'pedidos')
 
     if export_format == 'xlsx':
         create_log(request.user, 'exportou relatório de pedidos (XLSX)')
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_pedidos.xlsx"'
-        
-        workbook = openpyxl.Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Relatório de Pedidos'
-        
-        headers = ["Data do pedido", "Aluno", "Produto", "Quantidade", "Valor Total", "Status", "Desfecho"]
-        for col_num, header_title in enumerate(headers, 1):
-            cell = worksheet.cell(row=1, column=col_num)
-            cell.value = header_title
-            worksheet.column_dimensions[get_column_letter(col_num)].width = 25
-
-        for row_num, pedido in enumerate(pedidos, 2):
-            desfecho = pedido.rejection_reason or pedido.cancellation_reason or "-"
-            worksheet.cell(row=row_num, column=1, value=pedido.data_solicitacao.strftime('%d/%m/%Y %H:%M'))
-            worksheet.cell(row=row_num, column=2, value=pedido.aluno.get_full_name())
-            worksheet.cell(row=row_num, column=3, value=pedido.item.nome)
-            worksheet.cell(row=row_num, column=4, value=pedido.quantidade)
-            worksheet.cell(row=row_num, column=5, value=pedido.final_value)
-            worksheet.cell(row=row_num, column=6, value=pedido.get_status_display())
-            worksheet.cell(row=row_num, column=7, value=desfecho)
-
-        workbook.save(response)
-        return response
-
-    pedidos_data = pedidos
+        return xlsx_response(
+            'relatorio_pedidos.xlsx',
+            'Relatório de Pedidos',
+            ["Data do pedido", "Aluno", "Produto", "Quantidade", "Valor Total", "Status", "Desfecho"],
+            ([
+                pedido.data_solicitacao.strftime('%d/%m/%Y %H:%M'),
+                pedido.aluno.get_full_name(),
+                pedido.item.nome,
+                pedido.quantidade,
+                pedido.final_value,
+                pedido.get_status_display(),
+                pedido.rejection_reason or pedido.cancellation_reason or "-",
+            ] for pedido in pedidos.iterator(chunk_size=2000)),
+            cache_key=result_key(cache_digest, 'xlsx'),
+        )
+
+    pedidos_exibidos = pedidos
     page_obj = None
 
     items_per_page = request.GET.get('items_per_page', 10)
@@ -1819,38 +2015,23 @@ def relatorio_pedidos(request):
         items_per_page = 10
 
     if group_by_aluno:
-        pedidos_agrupados = defaultdict(list)
-        for pedido in pedidos:
-            pedidos_agrupados[pedido.aluno.get_full_name()].append(pedido)
-        
-        pedidos_list = list(dict(pedidos_agrupados).items())
-        
-        paginator = Paginator(pedidos_list, items_per_page)
-        page = request.GET.get('page')
-        try:
-            pedidos_page = paginator.page(page)
-        except PageNotAnInteger:
-            pedidos_page = paginator.page(1)
-        except EmptyPage:
-            pedidos_page = paginator.page(paginator.num_pages)
-            
-        pedidos_data = dict(pedidos_page.object_list)
+        def group_pedidos():
+            pedidos_agrupados = defaultdict(list)
+            for pedido in pedidos:
+                pedidos_agrupados[pedido.aluno.get_full_name()].append(pedido)
+            return list(dict(pedidos_agrupados).items())
+
+        pedidos_list = cached_result(cache_digest, 'grouped', group_pedidos)
+        pedidos_page = cached_page(cache_digest, pedidos_list, items_per_page, request.GET.get('page'))
+        pedidos_exibidos = dict(pedidos_page.object_list)
         page_obj = pedidos_page
     else:
-        paginator = Paginator(pedidos_data, items_per_page)
-        page = request.GET.get('page')
-        try:
-            pedidos_page = paginator.page(page)
-        except PageNotAnInteger:
-            pedidos_page = paginator.page(1)
-        except EmptyPage:
-            pedidos_page = paginator.page(paginator.num_pages)
-        
-        pedidos_data = pedidos_page
+        pedidos_page = cached_page(cache_digest, pedidos_exibidos, items_per_page, request.GET.get('page'))
+        pedidos_exibidos = pedidos_page
         page_obj = pedidos_page
 
     context = {
-        'pedidos': pedidos_data,
+        'pedidos': pedidos_exibidos,
         'page_obj': page_obj,
         'start_date': start_date.strftime('%Y-%m-%d'),
         'end_date': end_date.strftime('%Y-%m-%d'),
@@ -1868,166 +2049,26 @@ def relatorio_presenca(request):
 
     turmas = Turma.objects.all()
     alunos = User.objects.filter(group_role='STD', status='ATIVO').order_by('first_name', 'last_name')
-    base_query = AttendanceRequest.objects.all()
-
-    turma_id = request.GET.get('turma')
-    aluno_id = request.GET.get('aluno')
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date')
     export_format = request.GET.get('export')
-    order = request.GET.get('order', 'desc')
-
-    today = datetime.date.today()
-    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date() if start_date_str else today.replace(day=1)
-    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else today
-
-    query = base_query.filter(attendance_date__range=[start_date, end_date]).exclude(status='CAN')
-
-    if turma_id and turma_id.isdigit():
-        query = query.filter(turma_id=turma_id)
-        turma_id = int(turma_id)
-    else:
-        turma_id = None
-
-    if aluno_id and aluno_id.isdigit():
-        query = query.filter(student_id=aluno_id)
-        aluno_id = int(aluno_id)
-    else:
-        aluno_id = None
-
-    presencas = query.order_by('attendance_date', 'student__first_name', 'student__last_name').select_related('student')
-
-    grouped_data = {}
-    for presenca in presencas:
-        key = (presenca.attendance_date, presenca.student)
-        if key not in grouped_data:
-            grouped_data[key] = []
-        grouped_data[key].append(presenca)
-
-    report_data = []
-    for (date_key, student), presencas_list in grouped_data.items():
-        is_tuesday = date_key.weekday() == 1
-        
-        status_final = 'APR'
-        motivo_final = ""
-        qty_final = 0
-        
-        apr_count = 0
-        rej_count = 0
-        types_apr = []
-        
-        for p in presencas_list:
-            if p.status == 'APR':
-                apr_count += 1
-                types_apr.append(p.class_type)
-            elif p.status == 'REJ':
-                rej_count += 1
-        
-        if is_tuesday:
-            if apr_count > 0:
-                if 'BOTH' in types_apr or ('GI' in types_apr and 'NOGI' in types_apr):
-                    qty_final = 2
-                    motivo_final = "Integral"
-                    status_final = 'APR'
-                elif 'GI' in types_apr:
-                    qty_final = 1
-                    motivo_final = "Presente apenas na aula com Kimono"
-                    status_final = 'APR'
-                elif 'NOGI' in types_apr:
-                    qty_final = 1
-                    motivo_final = "Presente apenas na aula sem Kimono"
-                    status_final = 'APR'
-                else:
-                    qty_final = 1
-                    motivo_final = get_class_description(types_apr[0])
-                    status_final = 'APR'
-            else:
-                qty_final = 0
-                motivo_final = "Aluno ausente neste dia"
-                if rej_count > 0:
-                    first_rej = next((p for p in presencas_list if p.status == 'REJ'), None)
-                    status_final = 'REJ'
-                    if first_rej and first_rej.rejection_reason:
-                         motivo_final += f" ({first_rej.rejection_reason})"
-                else:
-                     status_final = 'PEN'
-        else:
-            if apr_count > 0:
-                qty_final = 1
-                motivo_final = get_class_description(presencas_list[0].class_type)
-                status_final = 'APR'
-            else:
-                qty_final = 0
-                p = presencas_list[0]
-                descricao_aula = get_class_description(p.class_type)
-                if p.status == 'REJ':
-                    status_final = 'REJ'
-                    if p.rejection_reason:
-                        motivo_final = f"{descricao_aula} - Ausente ({p.rejection_reason})"
-                    else:
-                        motivo_final = f"{descricao_aula} - Ausente"
-                else:
-                    status_final = p.status
-                    motivo_final = descricao_aula
-
-        report_data.append({
-            'data': date_key,
-            'aluno': student.get_full_name(),
-            'student_obj': student,
-            'status': dict(AttendanceRequest.STATUS_CHOICES).get(status_final, status_final),
-            'motivo': motivo_final,
-            'qty': qty_final
-        })
-        
-    reverse = True if order == 'desc' else False
-    report_data.sort(key=lambda x: (x['data'], x['aluno']), reverse=reverse)
+    data = presenca_data(request.GET)
+    cache_digest = report_cache_digest('presenca', request.GET, request.user)
+    start_date, end_date, order = data['start_date'], data['end_date'], data['order']
+    turma_id, aluno_id = data['turma_id'], data['aluno_id']
+    consolidated = data['consolidated']
 
     if export_format == 'pdf':
-        create_log(request.user, 'exportou relatório de presenças (PDF)')
-        
-        stats = get_student_stats(request.user, start_date, end_date)
-        
-        template = get_template('academia/professor/relatorio_presenca_pdf.html')
-        context = {
-            'report_data': report_data,
-            'report_title': 'Relatório de Presenças',
-            'start_date': start_date,
-            'end_date': end_date
-        }
-
-        html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_presencas.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err:
-            return HttpResponse('We had some errors <pre>' + html + '</pre>')
-        return response
+        return enqueue_pdf_report(request, 'presenca')
 
     if export_format == 'xlsx':
         create_log(request.user, 'exportou relatório de presenças (XLSX)')
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_presencas.xlsx"'
-
-        workbook = openpyxl.Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Relatório de Presenças'
-
-        headers = ["Data", "Aluno", "Status", "Motivo", "Quantidade"]
-        for col_num, header_title in enumerate(headers, 1):
-            cell = worksheet.cell(row=1, column=col_num)
-            cell.value = header_title
-            worksheet.column_dimensions[get_column_letter(col_num)].width = 25
-
-        for row_num, data in enumerate(report_data, 2):
-            weekday = WEEKDAYS[data['data'].weekday()]
-            worksheet.cell(row=row_num, column=1, value=f"{data['data'].strftime('%d/%m/%Y')} {weekday}")
-            worksheet.cell(row=row_num, column=2, value=data['aluno'])
-            worksheet.cell(row=row_num, column=3, value=data['status'])
-            worksheet.cell(row=row_num, column=4, value=data['motivo'])
-            worksheet.cell(row=row_num, column=5, value=data['qty'])
-
-        workbook.save(response)
-        return response
+        report_data = (describe_consolidated(row) for row in consolidated.iterator(chunk_size=2000))
+        return xlsx_response(
+            'relatorio_presencas.xlsx',
+            'Relatório de Presenças',
+            ["Data", "Aluno", "Status", "Motivo", "Quantidade"],
+            ([f"{data['data'].strftime('%d/%m/%Y')} {WEEKDAYS[data['data'].weekday()]}", data['aluno'], data['status'], data['motivo'], data['qty']] for data in report_data),
+            cache_key=result_key(cache_digest, 'xlsx'),
+        )
 
     items_per_page = request.GET.get('items_per_page', 10)
     try:
@@ -2035,14 +2076,11 @@ def relatorio_presenca(request):
     except ValueError:
         items_per_page = 10
 
-    paginator = Paginator(report_data, items_per_page)
-    page = request.GET.get('page')
-    try:
-        report_data_page = paginator.page(page)
-    except PageNotAnInteger:
-        report_data_page = paginator.page(1)
-    except EmptyPage:
-        report_data_page = paginator.page(paginator.num_pages)
+    # Paginação no banco: só as linhas consolidadas da página são materializadas
+    report_data_page = cached_page(
+        cache_digest, consolidated, items_per_page, request.GET.get('page'),
+        lambda rows: [describe_consolidated(row) for row in rows],
+    )
 
     context = {
         'turmas': turmas,
@@ -2139,11 +2177,25 @@ def log_list(request):
     status_filter = request.GET.get('status')
     start_date_str = request.GET.get('start_date')
     end_date_str = request.GET.get('end_date')
+    user_filter = (request.GET.get('user') or '').strip()
+    view_filter = (request.GET.get('view') or '').strip()
+    status_code_filter = (request.GET.get('status_code') or '').strip()
 
-    logs_list = Log.objects.all().order_by('-timestamp')
+    logs_list = Log.objects.select_related('user', 'acting_user').order_by('-timestamp')
     
     if status_filter:
         logs_list = logs_list.filter(status=status_filter)
+
+    # Os filtros abaixo usam colunas indexadas junto com o timestamp
+    if user_filter:
+        user_ids = User.objects.filter(Q(username__iexact=user_filter) | Q(email__iexact=user_filter)).values_list('id', flat=True)
+        logs_list = logs_list.filter(user_id__in=list(user_ids))
+
+    if view_filter:
+        logs_list = logs_list.filter(url_name=view_filter)
+
+    if status_code_filter.isdigit():
+        logs_list = logs_list.filter(status_code=int(status_code_filter))
     
     if start_date_str:
         try:
@@ -2160,6 +2212,10 @@ def log_list(request):
         except ValueError:
             pass
     
+    export_format = request.GET.get('export')
+    if export_format in ('csv', 'jsonl'):
+        return export_logs(logs_list, export_format)
+
     paginator = Paginator(logs_list, items_per_page)
     page = request.GET.get('page')
     
@@ -2175,9 +2231,64 @@ def log_list(request):
         'items_per_page': items_per_page,
         'status_filter': status_filter,
         'start_date': start_date_str,
-        'end_date': end_date_str
+        'end_date': end_date_str,
+        'user_filter': user_filter,
+        'view_filter': view_filter,
+        'status_code_filter': status_code_filter,
+        'view_names': get_view_names(),
     })
 
+LOG_EXPORT_FIELDS = [
+    ('id', 'ID'),
+    ('timestamp', 'Data Hora'),
+    ('user__email', 'Conta'),
+    ('acting_user__email', 'Conta Responsável'),
+    ('action', 'Ação'),
+    ('status', 'Status'),
+    ('method', 'Método'),
+    ('path', 'Caminho'),
+    ('url_name', 'View'),
+    ('status_code', 'Código HTTP'),
+    ('duration_ms', 'Duração (ms)'),
+]
+
+class Echo:
+    """Pseudo-buffer para o csv.writer devolver cada linha em vez de acumulá-la."""
+    def write(self, value):
+        return value
+
+def export_logs(logs_list, export_format):
+    """
+    Exporta os logs filtrados em CSV ou JSONL via streaming, lendo o banco em blocos.
+    """
+    fields = [field for field, _ in LOG_EXPORT_FIELDS]
+    rows = logs_list.order_by('-timestamp', '-id').values_list(*fields).iterator(chunk_size=2000)
+    filename = f'logs_{timezone.localdate().strftime("%Y%m%d")}.{export_format}'
+
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+
+        def stream():
+            yield writer.writerow([label for _, label in LOG_EXPORT_FIELDS])
+            for row in rows:
+                row = list(row)
+                row[1] = timezone.localtime(row[1]).strftime('%d/%m/%Y %H:%M:%S')
+                yield writer.writerow(row)
+
+        content_type = 'text/csv; charset=utf-8'
+    else:
+        def stream():
+            for row in rows:
+                record = dict(zip(fields, row))
+                record['timestamp'] = record['timestamp'].isoformat()
+                yield json.dumps(record, ensure_ascii=False) + '\n'
+
+        content_type = 'application/x-ndjson; charset=utf-8'
+
+    response = StreamingHttpResponse(stream(), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 # --- VIEWS DE ERRO ---
 
 def error_404(request, exception):
@@ -2312,74 +2423,41 @@ def graduations_report(request):
     if not request.user.is_professor_or_admin():
         raise PermissionDenied
         
-    belt_filter = request.GET.get('belt')
-    student_filter = request.GET.get('student')
-    start_date_str = request.GET.get('start_date')
-    end_date_str = request.GET.get('end_date')
     export_format = request.GET.get('export')
-    
-    graduations = Graduation.objects.all().select_related('student').order_by('-date')
-    
-    if belt_filter:
-        graduations = graduations.filter(belt=belt_filter)
-    if student_filter:
-        graduations = graduations.filter(student__id=student_filter)
-    if start_date_str:
-        graduations = graduations.filter(date__gte=start_date_str)
-    if end_date_str:
-        graduations = graduations.filter(date__lte=end_date_str)
-        
-    # Chart Data
-    belt_counts = graduations.values('belt').annotate(count=Count('belt'))
-    chart_labels = []
-    chart_data = []
-    belt_names = dict(Graduation.BELT_CHOICES)
-    
-    for entry in belt_counts:
-        chart_labels.append(belt_names.get(entry['belt'], entry['belt']))
-        chart_data.append(entry['count'])
-        
+    graduations = graduacoes_data(request.GET)['graduations']
+    cache_digest = report_cache_digest('graduacoes', request.GET, request.user)
+
     if export_format == 'pdf':
-        create_log(request.user, 'exportou relatório de graduações (PDF)')
-        template = get_template('academia/professor/graduations_report_pdf.html')
-        context = {
-            'graduations': graduations,
-            'report_title': 'Relatório de Graduações',
-            'user': request.user
-        }
-        html = template.render(context)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_graduacoes.pdf"'
-        pisa_status = pisa.CreatePDF(html, dest=response)
-        if pisa_status.err:
-            return HttpResponse('We had some errors <pre>' + html + '</pre>')
-        return response
+        return enqueue_pdf_report(request, 'graduacoes')
         
     if export_format == 'xlsx':
         create_log(request.user, 'exportou relatório de graduações (XLSX)')
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = 'attachment; filename="relatorio_graduacoes.xlsx"'
-        
-        workbook = openpyxl.Workbook()
-        worksheet = workbook.active
-        worksheet.title = 'Graduações'
-        
-        headers = ["Aluno", "Faixa", "Grau", "Data"]
-        for col_num, header_title in enumerate(headers, 1):
-            cell = worksheet.cell(row=1, column=col_num)
-            cell.value = header_title
-            
-        for row_num, grad in enumerate(graduations, 2):
-            worksheet.cell(row=row_num, column=1, value=grad.student.get_full_name())
-            worksheet.cell(row=row_num, column=2, value=grad.get_belt_display())
-            worksheet.cell(row=row_num, column=3, value=grad.degree)
-            worksheet.cell(row=row_num, column=4, value=grad.date.strftime('%d/%m/%Y'))
-            
-        workbook.save(response)
-        return response
+        return xlsx_response(
+            'relatorio_graduacoes.xlsx',
+            'Graduações',
+            ["Aluno", "Faixa", "Grau", "Data"],
+            ([
+                grad.student.get_full_name(),
+                grad.get_belt_display(),
+                grad.degree,
+                grad.date.strftime('%d/%m/%Y'),
+            ] for grad in graduations.iterator(chunk_size=2000)),
+            cache_key=result_key(cache_digest, 'xlsx'),
+        )
+
+    def build_chart():
+        # Chart Data
+        belt_names = dict(Graduation.BELT_CHOICES)
+        belt_counts = list(graduations.order_by().values('belt').annotate(count=Count('belt')))
+        return (
+            [belt_names.get(entry['belt'], entry['belt']) for entry in belt_counts],
+            [entry['count'] for entry in belt_counts],
+        )
+
+    chart_labels, chart_data = cached_result(cache_digest, 'chart', build_chart)
 
     context = {
-        'graduations': graduations,
+        'graduations': cached_result(cache_digest, 'rows', lambda: list(graduations)),
         'belt_choices': Graduation.BELT_CHOICES,
         'students': User.objects.filter(group_role='STD'),
         'chart_labels': json.dumps(chart_labels),
@@ -56,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'academia.middleware.AuditLogMiddleware',
+    'academia.middleware.ReportInProgressMiddleware',
 ]
 
 ROOT_URLCONF = 'jiujitsu_academy.urls'
@@ -94,6 +95,18 @@ DATABASES = {
     }
 }
 
+# Cache
+# Em produção com vários workers use um backend compartilhado (ex.: Redis ou
+# FileBasedCache) para que a invalidação dos contadores valha para todos. Com
+# LocMemCache (padrão) cada worker tem o seu cache, e os contadores do menu
+# expiram em poucos segundos para não ficarem desatualizados nos demais.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='academia'),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -169,6 +182,29 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 
+# Logs de auditoria: gravados em lote pelo AuditLogMiddleware.
+# Em modo síncrono cada log é gravado imediatamente (os testes ativam com override_settings).
+AUDIT_LOG_SYNC = config('AUDIT_LOG_SYNC', default=False, cast=bool)
+AUDIT_LOG_BATCH_SIZE = config('AUDIT_LOG_BATCH_SIZE', default=50, cast=int)
+AUDIT_LOG_FLUSH_INTERVAL = config('AUDIT_LOG_FLUSH_INTERVAL', default=5, cast=int)  # segundos
+
+# Retenção de logs: registros mais antigos que LOG_RETENTION_DAYS são movidos
+# para arquivos JSONL compactados pelo comando archive_logs.
+LOG_RETENTION_DAYS = config('LOG_RETENTION_DAYS', default=180, cast=int)
+LOG_ARCHIVE_DIR = config('LOG_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'logs'))
+
+# Exportações em PDF geradas em segundo plano (python manage.py process_report_jobs).
+# Os arquivos ficam em REPORT_JOBS_DIR e são removidos após REPORT_JOB_RETENTION_HOURS.
+REPORT_JOBS_DIR = config('REPORT_JOBS_DIR', default=str(BASE_DIR / 'reports'))
+REPORT_JOB_RETENTION_HOURS = config('REPORT_JOB_RETENTION_HOURS', default=24, cast=int)
+
+# Resultados dos relatórios em cache; são descartados antes disso quando os dados mudam
+REPORT_CACHE_TIMEOUT = config('REPORT_CACHE_TIMEOUT', default=60 * 60, cast=int)
+
+# Meses fechados são lidos de snapshots (python manage.py freeze_report_months).
+# Com REPORT_SNAPSHOTS_AUTO, o worker de process_report_jobs gera os que faltam.
+REPORT_SNAPSHOTS_AUTO = config('REPORT_SNAPSHOTS_AUTO', default=True, cast=bool)
+
 MESSAGE_TAGS = {
     messages.DEBUG: 'secondary',
     messages.INFO: 'info',